@@ -1,5 +1,7 @@
 import { create } from 'zustand'
-import type { Facility, FacilityManifestEntry, UnitType } from '../types/facility'
+import type {
+  Facility, FacilityManifestEntry, OccupancyDelta, OccupancyIndex, OccupancySnapshot, UnitType,
+} from '../types/facility'
 
 type AppPhase = 'landing' | 'map' | 'checkout'
 
@@ -56,6 +58,44 @@ interface FacilityState {
   goToMap: () => void
 }
 
+// Facility list; ?manifest= swaps in another one, e.g. the synthetic
+// facilities from tools/generate-facilities.py
+const MANIFEST_URL =
+  new URLSearchParams(window.location.search).get('manifest') ?? '/data/facilities.json'
+
+async function getJson<T>(url: string): Promise<T> {
+  const res = await fetch(url)
+  return res.json()
+}
+
+// Loads a facility from its occupancy feed: cacheable geometry plus the
+// latest snapshot and the deltas since, or the single dataUrl document
+async function fetchFacility(entry: FacilityManifestEntry): Promise<Facility> {
+  if (!entry.feedUrl) return getJson<Facility>(entry.dataUrl)
+
+  const base = `${entry.feedUrl}/${entry.id}`
+  const latest = await getJson<OccupancyIndex>(`${base}.occupancy/latest.json`)
+  const [facility, snapshot, deltas] = await Promise.all([
+    getJson<Facility>(`${base}.geometry.${latest.geometry}.json`),
+    getJson<OccupancySnapshot>(`${base}.occupancy/snapshot-${latest.snapshot}.json`),
+    Promise.all(latest.deltas.map(v => getJson<OccupancyDelta>(`${base}.occupancy/delta-${v}.json`))),
+  ])
+
+  for (const floor of facility.floors) {
+    const bits = atob(snapshot.floors[floor.id] ?? '')
+    floor.units.forEach((u, i) => { u.occ = (bits.charCodeAt(i >> 3) >> (i & 7)) & 1 })
+  }
+  for (const delta of deltas) {
+    for (const [floorId, change] of Object.entries(delta.floors)) {
+      const floor = facility.floors.find(f => f.id === floorId)
+      if (!floor) continue
+      change.occupied?.forEach(i => { floor.units[i].occ = 1 })
+      change.vacated?.forEach(i => { floor.units[i].occ = 0 })
+    }
+  }
+  return facility
+}
+
 export const useFacilityStore = create<FacilityState>((set, get) => ({
   facilities: [],
   currentFacility: null,
@@ -75,7 +115,7 @@ export const useFacilityStore = create<FacilityState>((set, get) => ({
   loadFacilities: async () => {
     set({ loading: true, error: null })
     try {
-      const res = await fetch('/data/facilities.json')
+      const res = await fetch(MANIFEST_URL)
       const data: FacilityManifestEntry[] = await res.json()
       set({ facilities: data, loading: false })
     } catch {
@@ -89,8 +129,7 @@ export const useFacilityStore = create<FacilityState>((set, get) => ({
     if (!entry || !entry.hasMap) return
     set({ loading: true })
     try {
-      const res = await fetch(entry.dataUrl)
-      const data: Facility = await res.json()
+      const data = await fetchFacility(entry)
       const floorId = data.floors[0]?.id || 'floor-1'
       const floor = data.floors.find(f => f.id === floorId)
 
@@ -37,6 +37,25 @@ export interface SiteFeature {
   h: number
 }
 
+// Walking distances from a floor's elevator/stairs/office (tools/wayfinding.py).
+// Arrays are per source; unit indexes refer to Floor.units.
+export interface Wayfinding {
+  sources: { type: SiteFeature['type']; feature: number }[]
+  distance: number[][]  // floor units per unit, -1 when unreachable
+  nearest: number[][]   // reachable unit indexes, nearest first
+  routes: string[][]    // encoded polyline (integer precision) per unit, feature to door
+}
+
+// Wall-sharing neighbors and aisle rows (tools/adjacency.py), as CSR index
+// arrays into Floor.units: the neighbors of unit i are
+// neighbors[offsets[i]..offsets[i + 1]), row k is rows[rowOffsets[k]..rowOffsets[k + 1])
+export interface Adjacency {
+  offsets: number[]
+  neighbors: number[]
+  rowOffsets: number[]
+  rows: number[]
+}
+
 export interface Floor {
   id: string
   name: string
@@ -44,6 +63,8 @@ export interface Floor {
   height: number
   units: UnitData[]
   siteFeatures: SiteFeature[]
+  adjacency?: Adjacency
+  wayfinding?: Wayfinding
 }
 
 export interface FacilityHours {
@@ -51,6 +72,24 @@ export interface FacilityHours {
   gate: string
 }
 
+// Unit ID lookup (tools/search_index.py). ids are sorted case-insensitively;
+// entry k is floors[floor[k]].units[offset[k]]. prefixes maps every lowercase
+// ID prefix of up to 2 characters to its [start, end) range in ids, so
+// type-ahead binary-searches that range instead of scanning every floor.
+export interface SearchIndex {
+  ids: string[]
+  floor: number[]
+  offset: number[]
+  prefixes: Record<string, [number, number]>
+}
+
+// Across facilities (build-facility-json.py --portfolio-index); facility[k]
+// indexes facilities
+export interface PortfolioSearchIndex extends SearchIndex {
+  facilities: string[]
+  facility: number[]
+}
+
 export interface Facility {
   id: string
   name: string
@@ -59,6 +98,7 @@ export interface Facility {
   hours: string
   officeHours: FacilityHours
   floors: Floor[]
+  search?: SearchIndex
 }
 
 export interface FacilityManifestEntry {
@@ -76,4 +116,27 @@ export interface FacilityManifestEntry {
   features: string[]
   hasMap: boolean
   dataUrl: string
+  // Directory of an occupancy feed (tools/occupancy.py); when set, the
+  // map loads immutable geometry + occupancy from it instead of dataUrl
+  feedUrl?: string
+}
+
+export interface OccupancyIndex {
+  facility: string
+  geometry: string
+  version: number
+  snapshot: number
+  deltas: number[]
+}
+
+export interface OccupancySnapshot {
+  version: number
+  geometry: string
+  floors: Record<string, string>  // base64 bitset, bit i = units[i]
+}
+
+export interface OccupancyDelta {
+  from: number
+  to: number
+  floors: Record<string, { occupied?: number[]; vacated?: number[] }>
 }
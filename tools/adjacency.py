@@ -0,0 +1,130 @@
+"""
+Unit Adjacency
+==============
+Which units share a wall, and the rows they form along aisles, from unit
+rectangles alone (extract-floorplan.py, id_resolver.py and
+build-facility-json.py).
+
+Two boxes share a wall when they are at most `gap` apart across it and
+overlap along it by at least half the shorter side.
+
+Walls are found with a sweep per axis. Every box contributes the edge
+where it starts and the edge where it ends; sorting all edges groups them
+into wall lines (chains of coordinates at most `gap` apart). Along a line,
+the boxes starting there are sorted by their position along the wall, and
+each box ending there only checks the starting boxes that can reach it,
+found by bisection. Sorting dominates: O(n log n) plus the pairs found,
+where comparing every pair of boxes is O(n^2).
+
+Rows: side-by-side units whose fronts (top or bottom edges for a
+horizontal row, left or right for a vertical one) line up within `gap`
+face the same aisle. Chains of them are rows, ordered along the aisle.
+
+Graphs are stored as compact index arrays (CSR): the neighbors of unit i
+are neighbors[offsets[i]:offsets[i + 1]], and row k is
+rows[rowOffsets[k]:rowOffsets[k + 1]].
+"""
+
+from bisect import bisect_left
+from statistics import median
+
+
+def default_gap(ws, hs):
+    """Wall tolerance for a floor: 10% of the median short side, at least 2px."""
+    if not len(ws):
+        return 2
+    return max(2, int(0.1 * median(min(w, h) for w, h in zip(ws, hs))))
+
+
+def _sweep(lo, size, cross_lo, cross_size, gap):
+    """Pairs (a, b): box a ends where box b starts on this axis, overlapping across it."""
+    n = len(lo)
+    edges = sorted([(lo[i] + size[i], 0, i) for i in range(n)] +
+                   [(lo[i], 1, i) for i in range(n)])
+    pairs = []
+    start = 0
+    for k in range(1, len(edges) + 1):
+        if k < len(edges) and edges[k][0] - edges[k - 1][0] <= gap:
+            continue
+        line = edges[start:k]
+        start = k
+        ending = [i for _, kind, i in line if kind == 0]
+        starting = sorted((cross_lo[i], i) for _, kind, i in line if kind == 1)
+        if not ending or not starting:
+            continue
+        keys = [c for c, _ in starting]
+        longest = max(cross_size[i] for _, i in starting)
+        for a in ending:
+            a_lo, a_hi = cross_lo[a], cross_lo[a] + cross_size[a]
+            # Only boxes starting less than `longest` before a's end can overlap it
+            for idx in range(bisect_left(keys, a_lo - longest + 1), bisect_left(keys, a_hi)):
+                b = starting[idx][1]
+                if b == a or abs(lo[b] - lo[a] - size[a]) > gap:
+                    continue
+                overlap = min(a_hi, cross_lo[b] + cross_size[b]) - max(a_lo, cross_lo[b])
+                if overlap >= min(cross_size[a], cross_size[b]) / 2:
+                    pairs.append((a, b))
+    return pairs
+
+
+def wall_pairs(xs, ys, ws, hs, gap):
+    """Pairs (i, j), i < j, of boxes that share a wall, sorted."""
+    xs, ys, ws, hs = (list(map(int, a)) for a in (xs, ys, ws, hs))
+    pairs = _sweep(xs, ws, ys, hs, gap) + _sweep(ys, hs, xs, ws, gap)
+    return sorted({(min(i, j), max(i, j)) for i, j in pairs})
+
+
+def _rows(pairs, front_lo, front_hi, order_key, gap):
+    """Chains of side-by-side boxes with aligned fronts, ordered along the row."""
+    parent = {}
+
+    def find(i):
+        while parent.get(i, i) != i:
+            parent[i] = parent.get(parent[i], parent[i])
+            i = parent[i]
+        return i
+
+    for a, b in pairs:
+        if abs(front_lo[a] - front_lo[b]) <= gap or abs(front_hi[a] - front_hi[b]) <= gap:
+            parent.setdefault(a, a)
+            parent.setdefault(b, b)
+            parent[find(a)] = find(b)
+
+    groups = {}
+    for i in parent:
+        groups.setdefault(find(i), []).append(i)
+    return [sorted(g, key=lambda i: (order_key[i], i)) for g in groups.values()]
+
+
+def build(xs, ys, ws, hs, gap=None):
+    """Adjacency block for a floor's units: CSR neighbors plus aisle rows.
+
+    Returns {"offsets", "neighbors", "rowOffsets", "rows"}; rows are
+    horizontal rows (left to right) then vertical rows (top to bottom),
+    each sorted by its first unit.
+    """
+    xs, ys, ws, hs = (list(map(int, a)) for a in (xs, ys, ws, hs))
+    n = len(xs)
+    gap = default_gap(ws, hs) if gap is None else gap
+    side_by_side = _sweep(xs, ws, ys, hs, gap)   # a left of b
+    stacked = _sweep(ys, hs, xs, ws, gap)        # a above b
+
+    neighbors = [set() for _ in range(n)]
+    for a, b in side_by_side + stacked:
+        neighbors[a].add(b)
+        neighbors[b].add(a)
+    offsets, flat = [0], []
+    for near in neighbors:
+        flat.extend(sorted(near))
+        offsets.append(len(flat))
+
+    bottoms = [y + h for y, h in zip(ys, hs)]
+    rights = [x + w for x, w in zip(xs, ws)]
+    rows = (sorted(_rows(side_by_side, ys, bottoms, xs, gap)) +
+            sorted(_rows(stacked, xs, rights, ys, gap)))
+    row_offsets, row_units = [0], []
+    for row in rows:
+        row_units.extend(row)
+        row_offsets.append(len(row_units))
+
+    return {"offsets": offsets, "neighbors": flat, "rowOffsets": row_offsets, "rows": row_units}
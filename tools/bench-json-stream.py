@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Streaming JSON Benchmark
+=========================
+Writes and reads a synthetic portfolio (facilities of floors of units) with
+jsonstream.py at growing unit counts, and reports time and peak memory per
+step (each step runs in a forked process; peak is its growth in max RSS).
+Streaming memory should stay flat as the unit count grows; the json.load
+baseline grows with it.
+
+Usage:
+  python tools/bench-json-stream.py
+  python tools/bench-json-stream.py --units 10000,1000000 --formats min,ndjson
+  python tools/bench-json-stream.py --no-baseline --dir /tmp/bench
+
+Units are generated lazily from a seed, so the writer never holds the
+portfolio either. Files go to --dir (default: a temporary directory,
+removed afterwards); a million units is ~210 MB pretty, ~70 MB minified.
+
+It also times build-facility-json.py on the same data: build_floor on one
+floor extraction JSON of each --floor-units count (dedup, overrides,
+typing, adjacency), and the --portfolio-index step over the portfolio
+written as one file per facility plus a facilities.json manifest. Both
+hold their output (the floor's units, every unit ID), so their memory
+grows with the unit count.
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import multiprocessing
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import jsonstream
+
+
+UNITS_PER_FLOOR = 2500
+FLOORS_PER_FACILITY = 4
+
+# Common unit footprints in floor pixels (5x5 ... 10x30 at ~16px/ft)
+SIZES = [(80, 80), (80, 160), (80, 245), (120, 160), (160, 160), (160, 245),
+         (160, 330), (160, 410), (160, 495)]
+
+
+def synthetic_units(count, seed):
+    """`count` unit dicts in aisle rows, generated one at a time."""
+    rng = random.Random(seed)
+    x = y = 0
+    for i in range(count):
+        w, h = rng.choice(SIZES)
+        if x + w > 4800:
+            x, y = 0, y + 520
+        yield {"id": str(100 + i), "x": x, "y": y, "w": w, "h": h,
+               "type": f"{w // 16}x{h // 16}", "occ": int(rng.random() < 0.65)}
+        x += w
+
+
+def synthetic_portfolio(total_units):
+    """Portfolio document whose "units" lists are generators."""
+    per_facility = UNITS_PER_FLOOR * FLOORS_PER_FACILITY
+    facilities = []
+    for k in range(-(-total_units // per_facility)):
+        floors = []
+        for f in range(FLOORS_PER_FACILITY):
+            done = k * per_facility + f * UNITS_PER_FLOOR
+            count = max(0, min(UNITS_PER_FLOOR, total_units - done))
+            if not count:
+                break
+            floors.append({"id": f"floor-{f + 1}", "name": f"Floor {f + 1}",
+                           "width": 4800, "height": 5200,
+                           "units": synthetic_units(count, seed=k * 100 + f),
+                           "siteFeatures": []})
+        facilities.append({"id": f"synthetic-{k}", "name": f"Synthetic {k}", "floors": floors})
+    return {"facilities": facilities}
+
+
+def _child(step, queue):
+    # A forked child starts with the parent's max RSS; report its growth
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.perf_counter()
+    result = step()
+    seconds = time.perf_counter() - t0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+    queue.put((result, seconds, peak / 1024))
+
+
+def measure(step):
+    """(result, seconds, peak MB) of step(), run in a forked process."""
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    process = context.Process(target=_child, args=(step, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def read_streaming(path):
+    """Units and occupied units, a unit at a time."""
+    units = occupied = 0
+    for where, value in jsonstream.items(path, [("facilities", None, "floors", None,
+                                                  "units", None)]):
+        if where[-2:-1] == ("units",):
+            units += 1
+            occupied += value["occ"]
+    return units, occupied
+
+
+def read_whole(path):
+    """Units and occupied units, loading the whole document first."""
+    if str(path).endswith(".ndjson"):
+        with open(path) as f:
+            lines = [json.loads(line) for line in f]
+        units = [item for _, item in lines[1:]]
+    else:
+        with open(path) as f:
+            doc = json.load(f)
+        units = [u for facility in doc["facilities"] for floor in facility["floors"]
+                 for u in floor["units"]]
+    return len(units), sum(u["occ"] for u in units)
+
+
+def _load_builder():
+    """Import build-facility-json.py (not importable by name: it has a hyphen)."""
+    path = Path(__file__).with_name("build-facility-json.py")
+    spec = importlib.util.spec_from_file_location("build_facility_json", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def build_floor(builder, path):
+    """Units on the built floor, from a floor extraction JSON."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        floor = builder.build_floor(path, "floor-1", "Floor 1")
+    return len(floor["units"])
+
+
+def write_facilities(out_dir, total_units, fmt):
+    """The synthetic portfolio as data/facility-*.json files and a manifest."""
+    data = out_dir / "data"
+    data.mkdir(exist_ok=True)
+    manifest = []
+    for facility in synthetic_portfolio(total_units)["facilities"]:
+        path = data / f"facility-{facility['id']}.{'ndjson' if fmt == 'ndjson' else 'json'}"
+        jsonstream.dump(facility, path, fmt)
+        manifest.append({"id": facility["id"], "hasMap": True, "dataUrl": f"/data/{path.name}"})
+    with open(data / "facilities.json", "w") as f:
+        json.dump(manifest, f)
+    return data / "facilities.json"
+
+
+def portfolio_index(builder, manifest_path):
+    """Units in the portfolio index over every facility of the manifest."""
+    output = manifest_path.with_name("search-index.json")
+    with contextlib.redirect_stdout(io.StringIO()):
+        # No facility was just built: every one is read from its file
+        builder.write_portfolio_index({"id": None}, manifest_path, output)
+    with open(output) as f:
+        return len(json.load(f)["ids"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streaming JSON I/O on a synthetic portfolio")
+    parser.add_argument("--units", default="10000,100000,1000000",
+                        help="Comma-separated unit counts (default: %(default)s)")
+    parser.add_argument("--formats", default=",".join(jsonstream.FORMATS),
+                        help="Comma-separated output formats (default: %(default)s)")
+    parser.add_argument("--floor-units", default="10000,100000",
+                        help="Comma-separated unit counts for the build_floor step "
+                             "(default: %(default)s)")
+    parser.add_argument("--no-baseline", action="store_true",
+                        help="Skip the json.load baseline (it needs GBs at a million units)")
+    parser.add_argument("--dir", default=None, help="Directory for the files (default: temporary)")
+    args = parser.parse_args()
+
+    formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    unknown = [f for f in formats if f not in jsonstream.FORMATS]
+    if unknown:
+        print(f"Error: unknown formats: {', '.join(unknown)}")
+        sys.exit(1)
+    counts = [int(n) for n in args.units.split(",")]
+    floor_counts = [int(n) for n in args.floor_units.split(",") if n.strip()]
+    builder = _load_builder()
+
+    out_dir = Path(args.dir) if args.dir else Path(tempfile.mkdtemp(prefix="bench-json-"))
+    out_dir.mkdir(parents=True, exist_ok=True)
+    print(f"{'Units':>9s}  {'Format':<7s}  {'Step':<10s}  {'Time':>8s}  {'Peak MB':>8s}  Size")
+    try:
+        for count in counts:
+            for fmt in formats:
+                path = out_dir / f"portfolio-{count}.{'ndjson' if fmt == 'ndjson' else 'json'}"
+                _, seconds, peak = measure(
+                    lambda: jsonstream.dump(synthetic_portfolio(count), path, fmt))
+                size = f"{path.stat().st_size / 1e6:.1f} MB"
+                print(f"{count:>9,d}  {fmt:<7s}  {'write':<10s}  {seconds:>7.2f}s  {peak:>8.1f}  {size}")
+
+                steps = [("stream", read_streaming)]
+                if not args.no_baseline:
+                    steps.append(("json.load", read_whole))
+                for name, reader in steps:
+                    (units, _), seconds, peak = measure(lambda: reader(path))
+                    if units != count:
+                        print(f"Error: read {units} units from {path}, wrote {count}")
+                        sys.exit(1)
+                    print(f"{count:>9,d}  {fmt:<7s}  {name:<10s}  {seconds:>7.2f}s  {peak:>8.1f}")
+                path.unlink()
+
+                manifest_path = write_facilities(out_dir, count, fmt)
+                units, seconds, peak = measure(lambda: portfolio_index(builder, manifest_path))
+                if units != count:
+                    print(f"Error: indexed {units} units from {manifest_path}, wrote {count}")
+                    sys.exit(1)
+                print(f"{count:>9,d}  {fmt:<7s}  {'index':<10s}  {seconds:>7.2f}s  {peak:>8.1f}")
+                shutil.rmtree(manifest_path.parent)
+
+        for count in floor_counts:
+            for fmt in formats:
+                # One floor extraction JSON: the builder drops adjacency and
+                # stats, so the bench leaves them out
+                path = out_dir / f"floor-{count}.{'ndjson' if fmt == 'ndjson' else 'json'}"
+                jsonstream.dump({"floor": {"id": "floor-1", "width": 4800, "height": 5200},
+                                 "units": synthetic_units(count, seed=count),
+                                 "siteFeatures": []}, path, fmt)
+                units, seconds, peak = measure(lambda: build_floor(builder, path))
+                if units != count:
+                    print(f"Error: built {units} units from {path}, wrote {count}")
+                    sys.exit(1)
+                print(f"{count:>9,d}  {fmt:<7s}  {'build':<10s}  {seconds:>7.2f}s  {peak:>8.1f}")
+                path.unlink()
+    finally:
+        if not args.dir:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+OCR Backend Benchmark
+======================
+Measures per-unit OCR latency of each available Tesseract backend on real
+unit crops, using the same ocr_unit_id() strategy stack as extraction.
+
+Usage:
+  python tools/bench-ocr.py richland-2.png
+  python tools/bench-ocr.py richland-1.png --floor-json tools/validation/richland-floor1-v5.json \
+    --sample 100 --backends pytesseract,tesserocr
+
+Without --floor-json, unit boxes come from the geometry stages of
+extract-floorplan.py. The floor JSON must be in source-image pixels (no
+--target-width).
+"""
+
+import argparse
+import importlib.util
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+import ocr_backends
+import unit_table
+
+
+def _load_extractor():
+    """Import extract-floorplan.py (not importable by name: it has a hyphen)."""
+    path = Path(__file__).with_name("extract-floorplan.py")
+    spec = importlib.util.spec_from_file_location("extract_floorplan", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OCR backends on unit crops")
+    parser.add_argument("input", help="Site map PNG")
+    parser.add_argument("--floor-json", default=None,
+                        help="Floor extraction JSON to take unit boxes from (source pixels)")
+    parser.add_argument("--sample", type=int, default=50,
+                        help="Number of units to OCR per backend (default: 50, 0 = all)")
+    parser.add_argument("--backends", default=None,
+                        help="Comma-separated backends (default: all available)")
+    parser.add_argument("--seed", type=int, default=0, help="Sampling seed")
+    args = parser.parse_args()
+
+    extractor = _load_extractor()
+
+    img = cv2.imread(args.input)
+    if img is None:
+        print(f"Error: Could not read image: {args.input}")
+        sys.exit(1)
+    planes = {
+        "img": img,
+        "hsv": cv2.cvtColor(img, cv2.COLOR_BGR2HSV),
+        "rgb": cv2.cvtColor(img, cv2.COLOR_BGR2RGB),
+        "gray": cv2.cvtColor(img, cv2.COLOR_BGR2GRAY),
+    }
+
+    if args.floor_json:
+        with open(args.floor_json) as f:
+            records = json.load(f)["units"]
+        units = unit_table.from_boxes([u["x"] for u in records], [u["y"] for u in records],
+                                      [u["w"] for u in records], [u["h"] for u in records])
+    else:
+        units, _ = extractor.detect_units(planes)
+
+    if args.sample and args.sample < len(units):
+        rows = random.Random(args.seed).sample(range(len(units)), args.sample)
+        units = units[sorted(rows)]
+
+    names = args.backends.split(",") if args.backends else ocr_backends.available_backends()
+    if not names:
+        print("Error: No OCR backend available (install pytesseract or tesserocr)")
+        sys.exit(1)
+
+    print(f"\nOCR benchmark: {len(units)} units from {args.input}")
+    print(f"  {'Backend':>12s}  {'Startup':>8s}  {'Mean':>8s}  {'p50':>8s}  {'p95':>8s}  {'Total':>8s}  Agreement")
+
+    reference = None
+    for name in names:
+        start = time.perf_counter()
+        backend = ocr_backends.get_backend(name)
+        # First read initializes the engine (model load for tesserocr)
+        extractor.ocr_unit_id(planes["rgb"], units[0], backend)
+        startup = time.perf_counter() - start
+
+        ids = []
+        latencies = []
+        for unit in units:
+            t0 = time.perf_counter()
+            uid, _, _ = extractor.ocr_unit_id(planes["rgb"], unit, backend)
+            latencies.append(time.perf_counter() - t0)
+            ids.append(uid)
+        backend.close()
+
+        lat_ms = np.array(latencies) * 1000
+        if reference is None:
+            reference = ids
+            agreement = "(reference)"
+        else:
+            same = sum(1 for a, b in zip(ids, reference) if a == b)
+            agreement = f"{same}/{len(ids)} IDs match {names[0]}"
+        print(f"  {name:>12s}  {startup * 1000:>6.0f}ms  {lat_ms.mean():>6.1f}ms  "
+              f"{np.percentile(lat_ms, 50):>6.1f}ms  {np.percentile(lat_ms, 95):>6.1f}ms  "
+              f"{lat_ms.sum() / 1000:>7.2f}s  {agreement}")
+
+
+if __name__ == "__main__":
+    main()
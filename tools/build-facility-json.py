@@ -10,13 +10,52 @@ Usage:
     --floor1 tools/validation/richland-floor1-v5.json \
     --floor2 tools/validation/richland-floor2-v3.json \
     --output public/data/facility-richland.json
+
+With --floor1-image/--floor2-image (the site map PNGs the floors were
+extracted from), each floor also gets a "wayfinding" block: walking
+distances and routes from its elevator/stairs/office to every unit, plus
+units sorted by distance (see wayfinding.py).
+
+--format min writes the output without whitespace and --format ndjson one
+unit per line (see jsonstream.py); the default stays indent=2. Floor
+extraction JSONs are read a unit at a time.
+
+With --feed DIR, the facility is also published as immutable geometry plus
+a versioned occupancy feed (see occupancy.py): a rebuild whose geometry is
+unchanged only appends a delta of the units whose occupancy changed.
+
+Hand corrections in a floor's overrides file (--floor1-overrides /
+--floor2-overrides, by default <floor JSON>.overrides.json next to it; see
+overrides.py) are applied after deduplication, before units are typed.
+
+Every facility gets a "search" block: its unit IDs sorted, with floor and
+unit-offset columns and a prefix table for type-ahead (see search_index.py).
+With --portfolio-index PATH, the same index is also written across every
+mapped facility of --manifest (the built facility plus the others' dataUrl
+files), with a facility column:
+
+  python tools/build-facility-json.py ... \
+    --manifest public/data/facilities.json \
+    --portfolio-index public/data/search-index.json
+
+generate-facilities.py builds synthetic facilities of any size with the
+same unit typing and mock occupancy/features (unit_entry).
 """
 
 import argparse
 import json
 import random
+import sys
+from collections import defaultdict
 from pathlib import Path
 
+import adjacency
+import id_resolver
+import jsonstream
+import occupancy
+import overrides
+import search_index
+
 
 # ---------------------------------------------------------------------------
 # Real unit sizes at Richland (from planning/richland-unit-mix.pdf)
@@ -84,95 +123,101 @@ def classify_unit(w_px, h_px):
     return raw_type
 
 
+# Mock features: (flag, probability, unit types it's drawn for; None = all),
+# drawn in this order from the floor's seeded RNG
+MOCK_FEATURES = [
+    ('climate', 0.3, ('10x10', '10x15', '10x20', '10x25', '10x30', '10x40')),
+    ('power', 0.15, ('10x10', '10x15', '10x20', '10x25', '10x30', '10x40')),
+    ('driveup', 0.4, ('10x20', '10x25', '10x30', '10x40')),
+    ('smartlock', 0.2, None),
+]
+
+
+def unit_entry(u, rng, occupancy_rate=0.65, features=MOCK_FEATURES):
+    """Production unit dict for a box: type from its size, plus mock
+    occupancy and features drawn from `rng`."""
+    unit_type = classify_unit(u['w'], u['h'])
+
+    # Mock occupancy (seeded random for consistency)
+    occ = 1 if rng.random() < occupancy_rate else 0
+
+    entry = {
+        'id': u.get('id') or f"U{u['x']}_{u['y']}",
+        'x': u['x'],
+        'y': u['y'],
+        'w': u['w'],
+        'h': u['h'],
+        'type': unit_type,
+        'occ': occ,
+    }
+
+    # Add random features for some units (seeded)
+    for flag, probability, types in features:
+        if types is None or unit_type in types:
+            if rng.random() < probability:
+                entry[flag] = 1
+    return entry
+
+
 def deduplicate_units(units):
     """Remove duplicate/near-duplicate units (from rescue pass overlap).
 
-    Two units are considered duplicates if their centers are within 20px
-    and their sizes are similar (within 30%).
+    Two units are duplicates when their boxes overlap by at least half the
+    smaller one (id_resolver.duplicate_groups, a spatial hash, so large
+    floors stay fast). Of a set of duplicates, the one with the most
+    confident ID is kept ("conf" in the floor JSON; floor JSONs without it
+    count every unit as equally confident), then the larger.
     """
     if not units:
         return units
 
-    kept = []
-    used = set()
-
-    # Sort by area (largest first) — prefer larger detections
-    sorted_units = sorted(enumerate(units), key=lambda x: x[1]['w'] * x[1]['h'], reverse=True)
-
-    for i, unit in sorted_units:
-        if i in used:
-            continue
-
-        cx = unit['x'] + unit['w'] // 2
-        cy = unit['y'] + unit['h'] // 2
-        area = unit['w'] * unit['h']
-
-        is_dup = False
-        for j, other in sorted_units:
-            if j in used or j == i:
-                continue
-            ocx = other['x'] + other['w'] // 2
-            ocy = other['y'] + other['h'] // 2
-            oarea = other['w'] * other['h']
-
-            dist = ((cx - ocx) ** 2 + (cy - ocy) ** 2) ** 0.5
-            size_ratio = min(area, oarea) / max(area, oarea) if max(area, oarea) > 0 else 0
-
-            if dist < 20 and size_ratio > 0.7:
-                # Near-duplicate — mark the smaller one as used
-                used.add(j)
+    groups = defaultdict(list)
+    for i, group in enumerate(id_resolver.duplicate_groups(*([u[k] for u in units] for k in 'xywh'))):
+        groups[group].append(i)
 
-        kept.append(unit)
-        used.add(i)
+    # Prefer confident, larger detections (the first on a tie), and keep
+    # them in that order: mock occupancy is drawn in it
+    def preference(i):
+        return units[i].get('conf', 1.0), units[i]['w'] * units[i]['h']
 
-    return kept
+    keep = sorted(sorted(max(members, key=preference) for members in groups.values()),
+                  key=preference, reverse=True)
+    return [units[i] for i in keep]
 
 
-def build_floor(floor_json, floor_id, floor_name, occupancy_rate=0.65, seed=42):
-    """Build a floor entry from extraction JSON."""
-    with open(floor_json) as f:
-        data = json.load(f)
+def build_floor(floor_json, floor_id, floor_name, occupancy_rate=0.65, seed=42, image=None,
+                overrides_file=None):
+    """Build a floor entry from extraction JSON (and its site map `image`, for wayfinding).
 
-    raw_units = data['units']
-    floor_info = data['floor']
+    overrides_file defaults to the floor JSON's overrides file, if it has one.
+    """
+    # Streamed: only the fields the builder uses are kept per unit, and the
+    # rest of the extraction output (adjacency, stats) is never held whole
+    raw_units, floor_info, site_features = [], {}, []
+    for path, value in jsonstream.items(floor_json, [('units', None)]):
+        if path[0] == 'units':
+            raw_units.append({k: value[k] for k in ('id', 'x', 'y', 'w', 'h', 'conf')
+                              if k in value})
+        elif path == ('floor',):
+            floor_info = value
+        elif path == ('siteFeatures',):
+            site_features = value
 
     # Deduplicate
     deduped = deduplicate_units(raw_units)
     print(f"  {floor_name}: {len(raw_units)} raw → {len(deduped)} after dedup")
 
+    # Hand corrections (already in place if the extraction applied them)
+    overrides_file = overrides_file or overrides.default_path(floor_json)
+    if Path(overrides_file).exists():
+        deduped, plan = overrides.apply(deduped, overrides.load(overrides_file))
+        print(f"  {floor_name}: overrides from {overrides_file}: {overrides.summary(plan)}")
+        for warning in plan['skipped']:
+            print(f"    Warning: {warning}")
+
     # Assign types, occupancy, and features
     rng = random.Random(seed)
-    units = []
-
-    for u in deduped:
-        unit_type = classify_unit(u['w'], u['h'])
-
-        # Mock occupancy (seeded random for consistency)
-        occ = 1 if rng.random() < occupancy_rate else 0
-
-        entry = {
-            'id': u['id'] if u['id'] else f"U{u['x']}_{u['y']}",
-            'x': u['x'],
-            'y': u['y'],
-            'w': u['w'],
-            'h': u['h'],
-            'type': unit_type,
-            'occ': occ,
-        }
-
-        # Add random features for some units (seeded)
-        if unit_type in ('10x10', '10x15', '10x20', '10x25', '10x30', '10x40'):
-            if rng.random() < 0.3:
-                entry['climate'] = 1
-            if rng.random() < 0.15:
-                entry['power'] = 1
-        if unit_type in ('10x20', '10x25', '10x30', '10x40'):
-            if rng.random() < 0.4:
-                entry['driveup'] = 1
-        if rng.random() < 0.2:
-            entry['smartlock'] = 1
-
-        units.append(entry)
+    units = [unit_entry(u, rng, occupancy_rate) for u in deduped]
 
     # Sort by ID
     def sort_key(u):
@@ -194,27 +239,134 @@ def build_floor(floor_json, floor_id, floor_name, occupancy_rate=0.65, seed=42):
         else:
             seen_ids[uid] = 0
 
-    return {
+    floor = {
         'id': floor_id,
         'name': floor_name,
         'width': floor_info['width'] if 'width' in floor_info else floor_info.get('sourceImageWidth', 4800),
         'height': floor_info['height'] if 'height' in floor_info else floor_info.get('sourceImageHeight', 5200),
         'units': units,
-        'siteFeatures': data.get('siteFeatures', []),
+        'siteFeatures': site_features,
+        # Recomputed: dedup and sorting changed the unit indexes
+        'adjacency': adjacency.build(*([u[k] for u in units] for k in 'xywh')),
     }
 
+    if image:
+        # OpenCV/NumPy are only needed for wayfinding
+        import wayfinding
+        scale = floor_info.get('sourceImageWidth', floor['width']) / floor['width']
+        block = wayfinding.floor_wayfinding(wayfinding.load_gray(image), units,
+                                            floor['siteFeatures'], scale)
+        if block is None:
+            print(f"  {floor_name}: no elevator/stairs/office, skipping wayfinding")
+        else:
+            floor['wayfinding'] = block
+            for source, distance in zip(block['sources'], block['distance']):
+                reachable = [d for d in distance if d >= 0]
+                print(f"  {floor_name}: {source['type']} reaches {len(reachable)}/{len(units)} "
+                      f"units (farthest {max(reachable, default=0)})")
+
+    return floor
+
+
+def index_entries(path):
+    """A facility file's ID and unit IDs, read a unit at a time.
+
+    Returns the facility with only what search_index.portfolio_index reads:
+    {"id", "floors": [{"units": [{"id"}, ...]}, ...]}.
+    """
+    facility = {'id': None, 'floors': []}
+    for where, value in jsonstream.items(path, [('floors', None, 'units', None)]):
+        if where == ('id',):
+            facility['id'] = value
+        elif where[0] == 'floors':
+            floors = facility['floors']
+            while len(floors) <= where[1]:
+                floors.append({'units': []})
+            if len(where) == 4:
+                floors[where[1]]['units'].append({'id': value['id']})
+    return facility
+
+
+def write_portfolio_index(facility, manifest_path, output):
+    """Unit ID index across the mapped facilities of a facilities.json.
+
+    dataUrl paths ("/data/facility-x.json") are resolved against the public
+    directory the manifest is served from (public/data/facilities.json ->
+    public/); the facility just built is used as is. The others are streamed
+    (index_entries), so only their unit IDs are held.
+    """
+    manifest_path = Path(manifest_path)
+    if not manifest_path.exists():
+        print(f"Error: manifest not found: {manifest_path}")
+        sys.exit(1)
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+
+    public = manifest_path.parent.parent
+    facilities = []
+    for entry in manifest:
+        if not entry.get('hasMap') or not entry.get('dataUrl'):
+            continue
+        if entry['id'] == facility['id']:
+            facilities.append(facility)
+            continue
+        path = public / entry['dataUrl'].lstrip('/')
+        if not path.exists():
+            print(f"Error: {entry['id']}: {path} not found")
+            sys.exit(1)
+        facilities.append(index_entries(path))
+
+    index = search_index.portfolio_index(facilities)
+    output_path = Path(output)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump(index, f, separators=(',', ':'))
+    print(f"\n  Portfolio index: {len(index['ids'])} units in "
+          f"{len(facilities)} facilities -> {output_path}")
+
 
 def main():
     parser = argparse.ArgumentParser(description='Build production facility JSON')
     parser.add_argument('--floor1', required=True, help='Floor 1 extraction JSON')
     parser.add_argument('--floor2', required=True, help='Floor 2 extraction JSON')
-    parser.add_argument('--output', '-o', required=True, help='Output facility JSON')
+    parser.add_argument('--floor1-image', help='Floor 1 site map PNG, to add wayfinding')
+    parser.add_argument('--floor2-image', help='Floor 2 site map PNG, to add wayfinding')
+    parser.add_argument('--floor1-overrides', help='Floor 1 overrides file '
+                        '(default: <floor1>.overrides.json if it exists)')
+    parser.add_argument('--floor2-overrides', help='Floor 2 overrides file '
+                        '(default: <floor2>.overrides.json if it exists)')
+    parser.add_argument('--output', '-o', help='Output facility JSON')
+    parser.add_argument('--format', choices=jsonstream.FORMATS, default='pretty',
+                        help='Output format: pretty (indent=2), min or ndjson '
+                             '(default: %(default)s)')
+    parser.add_argument('--feed', metavar='DIR',
+                        help='Publish to an occupancy feed directory: geometry file + '
+                             'occupancy snapshot/deltas (e.g. public/data)')
+    parser.add_argument('--manifest', default='public/data/facilities.json',
+                        help='Facility list for --portfolio-index (default: %(default)s)')
+    parser.add_argument('--portfolio-index', metavar='PATH',
+                        help='Also write a unit ID index across every mapped facility '
+                             'of --manifest')
     args = parser.parse_args()
+    if not args.output and not args.feed:
+        parser.error('--output and/or --feed is required')
 
     print("Building facility JSON...")
 
-    floor1 = build_floor(args.floor1, 'floor-1', 'Ground Floor', occupancy_rate=0.65, seed=42)
-    floor2 = build_floor(args.floor2, 'floor-2', '2nd Floor', occupancy_rate=0.60, seed=99)
+    for path in (args.floor1_overrides, args.floor2_overrides):
+        if path and not Path(path).exists():
+            print(f"Error: overrides file not found: {path}")
+            sys.exit(1)
+    try:
+        floor1 = build_floor(args.floor1, 'floor-1', 'Ground Floor', occupancy_rate=0.65,
+                             seed=42, image=args.floor1_image,
+                             overrides_file=args.floor1_overrides)
+        floor2 = build_floor(args.floor2, 'floor-2', '2nd Floor', occupancy_rate=0.60,
+                             seed=99, image=args.floor2_image,
+                             overrides_file=args.floor2_overrides)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
 
     facility = {
         'id': 'richland',
@@ -232,6 +384,7 @@ def main():
         },
         'floors': [floor1, floor2],
     }
+    facility['search'] = search_index.facility_index(facility['floors'])
 
     # Stats
     total = len(floor1['units']) + len(floor2['units'])
@@ -254,11 +407,31 @@ def main():
     print(f"\n  Total: {total} units ({vacant_1 + vacant_2} vacant)")
 
     # Write
-    output_path = Path(args.output)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(output_path, 'w') as f:
-        json.dump(facility, f, indent=2)
-    print(f"\n  Saved to: {output_path}")
+    if args.output:
+        output_path = Path(args.output)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        # Written unit by unit, never as one string
+        jsonstream.dump({**facility, 'floors': [{**floor, 'units': iter(floor['units'])}
+                                                for floor in facility['floors']]},
+                        output_path, args.format)
+        print(f"\n  Saved to: {output_path}")
+
+    if args.feed:
+        feed = occupancy.Feed(args.feed, facility['id'])
+        before = feed.latest()
+        version = feed.publish(facility)
+        latest = feed.latest()
+        if before and before['version'] == version:
+            print(f"\n  Feed unchanged at version {version}")
+        elif latest['snapshot'] == version:
+            print(f"\n  Feed version {version}: snapshot of geometry {latest['geometry']}")
+        else:
+            print(f"\n  Feed version {version}: delta over version {version - 1}")
+        print(f"  Geometry: {feed.geometry_path(latest['geometry'])}")
+        print(f"  Occupancy: {feed.dir / 'latest.json'}")
+
+    if args.portfolio_index:
+        write_portfolio_index(facility, args.manifest, args.portfolio_index)
 
 
 if __name__ == '__main__':
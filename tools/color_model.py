@@ -0,0 +1,132 @@
+"""
+Color Model
+===========
+Fits per-facility HSV bounds for extract-floorplan.py's color classes
+(green units, blue elevator, yellow highlights).
+
+Site maps are flat-colored: each class is one fill color plus its
+anti-aliased blend into the white aisles and dark walls. Blending changes
+saturation and value but barely moves hue, so:
+
+  1. Sample the image on a regular grid (~SAMPLE_PIXELS pixels) and drop
+     near-gray pixels (background, walls, text).
+  2. Cluster the circular hue histogram: every hue bin climbs to its local
+     maximum, and the bins reaching the same peak form one cluster.
+  3. Label clusters by the nearest reference hue (the middle of the default
+     bounds); the largest matching cluster wins. A class with no cluster
+     (e.g. a floor without an elevator) keeps its default bounds.
+  4. Derive bounds from each cluster's fill: hue percentiles +- HUE_MARGIN,
+     and saturation/value floors and a value ceiling relative to the
+     cluster's median color, sized to keep the blended edge pixels the
+     hand-tuned Richland bounds keep.
+
+A model is a dict {class: {"lower": [h, s, v], "upper": [h, s, v], ...}}
+and is saved as JSON next to the floor JSON.
+"""
+
+import json
+
+import numpy as np
+
+
+SAMPLE_PIXELS = 400_000
+
+# Pixels grayer/darker than this carry no reliable hue
+MIN_SATURATION = 40
+MIN_VALUE = 40
+
+# Smallest cluster (in samples) that can be a class
+MIN_CLUSTER_SAMPLES = 50
+
+# A cluster farther than this from a class's reference hue isn't that class
+MAX_HUE_OFFSET = 20
+
+# Bounds relative to a cluster's fill (calibrated so the Richland floors
+# reproduce the hand-tuned GREEN_LOWER/UPPER: H 45-58, S >= 100, V 40-230)
+HUE_MARGIN = 6
+SATURATION_FLOOR = 0.65    # x median saturation
+VALUE_FLOOR = 0.18         # x median value
+VALUE_HEADROOM = 0.35      # share of the gap from median value to 255
+
+
+def fit(hsv, reference):
+    """Fit bounds for each class in `reference` ({class: (lower, upper)}).
+
+    Returns (model, clusters): the model for the classes that were found,
+    and every hue cluster as (peak hue, samples), largest first.
+    """
+    img_h, img_w = hsv.shape[:2]
+    stride = max(1, int(np.sqrt(img_h * img_w / SAMPLE_PIXELS)))
+    samples = hsv[::stride, ::stride].reshape(-1, 3)
+    samples = samples[(samples[:, 1] >= MIN_SATURATION) & (samples[:, 2] >= MIN_VALUE)]
+    if not len(samples):
+        return {}, []
+
+    hue = samples[:, 0].astype(np.intp)
+    hist = np.bincount(hue, minlength=180)[:180]
+    peak_of = _climb(hist)
+
+    clusters = []
+    for peak in np.unique(peak_of[hist > 0]).tolist():
+        count = int(hist[peak_of == peak].sum())
+        if count >= MIN_CLUSTER_SAMPLES:
+            clusters.append((peak, count))
+    clusters.sort(key=lambda c: -c[1])
+
+    model = {}
+    taken = set()
+    for name, (lower, upper) in reference.items():
+        center = (int(lower[0]) + int(upper[0])) / 2
+        for peak, count in clusters:
+            if peak not in taken and _hue_distance(peak, center) <= MAX_HUE_OFFSET:
+                taken.add(peak)
+                model[name] = _bounds(samples[peak_of[hue] == peak], peak, count)
+                break
+    return model, clusters
+
+
+def _climb(hist):
+    """Map each hue bin to the local maximum reached by steepest ascent."""
+    n = len(hist)
+    idx = np.arange(n)
+    neighbours = np.stack([(idx - 1) % n, idx, (idx + 1) % n])
+    # Ties go to the lower bin, so plateaus resolve to one peak
+    step = neighbours[np.argmax(hist[neighbours], axis=0), idx]
+    while True:
+        nxt = step[step]
+        if np.array_equal(nxt, step):
+            return step
+        step = nxt
+
+
+def _hue_distance(a, b):
+    d = abs(a - b) % 180
+    return min(d, 180 - d)
+
+
+def _bounds(pixels, peak, count):
+    h_lo, h_hi = np.percentile(pixels[:, 0], [1, 99])
+    sat = float(np.median(pixels[:, 1]))
+    val = float(np.median(pixels[:, 2]))
+    return {
+        "lower": [max(0, int(h_lo) - HUE_MARGIN),
+                  int(SATURATION_FLOOR * sat),
+                  int(VALUE_FLOOR * val)],
+        "upper": [min(179, int(h_hi) + HUE_MARGIN),
+                  255,
+                  min(255, round(val + VALUE_HEADROOM * (255 - val)))],
+        "hue": int(peak),
+        "samples": int(count),
+    }
+
+
+def save(path, model, source_key):
+    with open(path, "w") as f:
+        json.dump({"source": source_key, "classes": model}, f, indent=2)
+
+
+def load(path):
+    """Read a saved model. Returns (model, source key)."""
+    with open(path) as f:
+        data = json.load(f)
+    return data["classes"], data.get("source")
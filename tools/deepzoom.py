@@ -0,0 +1,317 @@
+"""
+Deep Zoom Debug Viewer
+======================
+Tiled debug output for extract-floorplan.py --debug-tiles: a Deep Zoom
+(DZI) tile pyramid of the debug image plus a self-contained HTML viewer
+that draws the units as a vector overlay on top.
+
+  <name>.dzi                     Deep Zoom descriptor (any DZI viewer opens it)
+  <name>_files/<level>/<c>_<r>.jpg
+                                 TILE_SIZE tiles; level L is the image
+                                 halved (MAX - L) times, MAX = ceil(log2
+                                 of the longer side)
+  <name>.html                    pan/zoom viewer; no libraries or server
+                                 needed, open it from disk
+
+The viewer only fetches the tiles on screen at the level matching the
+zoom, so a 5000px floor opens instantly. Hovering a unit shows its ID, the
+stage that produced its box, how its ID was read and its confidence; the
+panel finds units by ID and can hide every unit at or above a confidence
+threshold.
+"""
+
+import json
+import math
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+
+
+TILE_SIZE = 256
+JPEG_QUALITY = 90
+
+
+def level_count(width, height):
+    """Number of pyramid levels (level 0 is 1x1)."""
+    return math.ceil(math.log2(max(width, height))) + 1
+
+
+def write_tiles(img, out_dir, name):
+    """Write the DZI pyramid of `img`; returns the number of tiles."""
+    out_dir = Path(out_dir)
+    files = out_dir / f"{name}_files"
+    # Tiles of an earlier, larger image would otherwise linger
+    shutil.rmtree(files, ignore_errors=True)
+    height, width = img.shape[:2]
+    max_level = level_count(width, height) - 1
+
+    jobs = []
+    level_img = img
+    for level in range(max_level, -1, -1):
+        level_dir = files / str(level)
+        level_dir.mkdir(parents=True)
+        h, w = level_img.shape[:2]
+        for row in range(0, h, TILE_SIZE):
+            for col in range(0, w, TILE_SIZE):
+                path = level_dir / f"{col // TILE_SIZE}_{row // TILE_SIZE}.jpg"
+                jobs.append((path, level_img[row:row + TILE_SIZE, col:col + TILE_SIZE]))
+        if level:
+            level_img = cv2.resize(level_img, (-(-w // 2), -(-h // 2)),
+                                   interpolation=cv2.INTER_AREA)
+
+    # imwrite releases the GIL, so encoding spreads over every core
+    params = [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY]
+    with ThreadPoolExecutor(os.cpu_count()) as pool:
+        list(pool.map(lambda job: cv2.imwrite(str(job[0]), job[1], params), jobs))
+
+    (out_dir / f"{name}.dzi").write_text(
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" TileSize="{TILE_SIZE}" '
+        f'Overlap="0" Format="jpg"><Size Width="{width}" Height="{height}"/></Image>\n')
+    return len(jobs)
+
+
+def write_viewer(out_dir, name, width, height, units, features, stage_names, title=""):
+    """Write <name>.html over the tiles of write_tiles().
+
+    `units` are dicts with id, x, y, w, h, stage (a stage code), confidence,
+    id_ocr and id_source (a name); `features` are site feature dicts.
+    Coordinates are in the tiled image's pixels.
+    """
+    data = {
+        "title": title or name,
+        "width": width,
+        "height": height,
+        "tileSize": TILE_SIZE,
+        "maxLevel": level_count(width, height) - 1,
+        "tiles": f"{name}_files",
+        "stages": {str(code): label for code, label in stage_names.items()},
+        "units": [[u["id"], u["x"], u["y"], u["w"], u["h"], u["stage"],
+                   round(float(u["confidence"]), 3), u["id_ocr"], u["id_source"]]
+                  for u in units],
+        "features": [[f["type"], f["x"], f["y"], f["w"], f["h"]] for f in features],
+    }
+    # "</" can't end the inline script early once escaped
+    text = json.dumps(data, separators=(",", ":")).replace("</", "<\\/")
+    path = Path(out_dir) / f"{name}.html"
+    path.write_text(VIEWER_HTML.replace("__TITLE__", _escape(data["title"]))
+                    .replace("__DATA__", text), encoding="utf-8")
+    return path
+
+
+def _escape(text):
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+VIEWER_HTML = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>__TITLE__</title>
+<style>
+  html, body { margin: 0; height: 100%; overflow: hidden; background: #1e1e1e;
+               font: 13px system-ui, sans-serif; }
+  #view { position: absolute; inset: 0; cursor: grab; touch-action: none; }
+  #view.dragging { cursor: grabbing; }
+  #tiles img { position: absolute; user-select: none; }
+  #overlay { position: absolute; overflow: visible; }
+  #overlay rect { fill: transparent; stroke-width: 2; vector-effect: non-scaling-stroke; }
+  #overlay rect.unit:hover, #overlay rect.match { fill: rgba(255, 235, 59, 0.45); }
+  #overlay rect.feature { stroke-dasharray: 6 3; pointer-events: none; }
+  #overlay.only-low rect.confident { display: none; }
+  #panel { position: absolute; top: 8px; left: 8px; padding: 8px 10px; border-radius: 4px;
+           background: rgba(255, 255, 255, 0.94); box-shadow: 0 1px 4px rgba(0, 0, 0, 0.4); }
+  #panel div { margin-top: 6px; }
+  #legend span { display: inline-block; margin-right: 8px; }
+  #legend i { display: inline-block; width: 10px; height: 10px; margin-right: 3px; }
+  #tip { position: absolute; display: none; pointer-events: none; padding: 4px 6px;
+         border: 1px solid #888; border-radius: 3px; background: #fff; white-space: pre; }
+</style>
+</head>
+<body>
+<div id="view"><div id="tiles"></div><svg id="overlay"></svg></div>
+<div id="panel">
+  <strong id="title"></strong>
+  <div><input id="find" placeholder="Find unit ID" size="14"> <span id="count"></span></div>
+  <div><label><input type="checkbox" id="low"> Only confidence below</label>
+       <input type="range" id="threshold" min="0" max="1" step="0.05" value="0.6">
+       <span id="threshold-value"></span></div>
+  <div id="legend"></div>
+</div>
+<div id="tip"></div>
+<script>
+const DATA = __DATA__;
+const T = DATA.tileSize, W = DATA.width, H = DATA.height, MAX = DATA.maxLevel;
+const STAGE_COLORS = ['#e53935', '#fb8c00', '#8e24aa', '#43a047', '#00897b',
+                      '#1e88e5', '#6d4c41', '#d81b60'];
+const FEATURE_COLORS = { elevator: '#00c8ff', highlight: '#ffc800', office: '#9e9e9e',
+                         stairs: '#ff64c8' };
+const SVG = 'http://www.w3.org/2000/svg';
+const view = document.getElementById('view');
+const tiles = document.getElementById('tiles');
+const overlay = document.getElementById('overlay');
+const tip = document.getElementById('tip');
+let scale = 1, tx = 0, ty = 0, queued = false;
+
+// Level L is the image halved (MAX - L) times
+const levelSize = (l) => [Math.ceil(W / 2 ** (MAX - l)), Math.ceil(H / 2 ** (MAX - l))];
+// The largest single-tile level stays under everything while tiles load
+let base = MAX;
+while (base > 0 && Math.max(...levelSize(base)) > T) base--;
+
+const cache = new Map();
+function tile(level, col, row) {
+  const key = `${level}/${col}_${row}`;
+  let img = cache.get(key);
+  if (!img) {
+    img = new Image();
+    img.draggable = false;
+    img.src = `${DATA.tiles}/${key}.jpg`;
+    cache.set(key, img);
+  }
+  const f = 2 ** (MAX - level) * scale;  // screen pixels per level pixel
+  const [lw, lh] = levelSize(level);
+  img.style.left = `${tx + col * T * f}px`;
+  img.style.top = `${ty + row * T * f}px`;
+  img.style.width = `${Math.min(T, lw - col * T) * f + 0.5}px`;
+  img.style.height = `${Math.min(T, lh - row * T) * f + 0.5}px`;
+  return img;
+}
+
+function render() {
+  queued = false;
+  const level = Math.max(base, Math.min(MAX, MAX + Math.ceil(Math.log2(scale))));
+  const f = 2 ** (MAX - level) * scale;
+  const [lw, lh] = levelSize(level);
+  const c0 = Math.max(0, Math.floor(-tx / f / T)), r0 = Math.max(0, Math.floor(-ty / f / T));
+  const c1 = Math.min(Math.ceil(lw / T), Math.ceil((view.clientWidth - tx) / f / T));
+  const r1 = Math.min(Math.ceil(lh / T), Math.ceil((view.clientHeight - ty) / f / T));
+  const shown = [tile(base, 0, 0)];
+  if (level > base) {
+    for (let r = r0; r < r1; r++) for (let c = c0; c < c1; c++) shown.push(tile(level, c, r));
+  }
+  tiles.replaceChildren(...shown);
+  Object.assign(overlay.style, { left: `${tx}px`, top: `${ty}px`,
+                                 width: `${W * scale}px`, height: `${H * scale}px` });
+}
+
+function update() {
+  if (!queued) { queued = true; requestAnimationFrame(render); }
+}
+
+function zoomAt(x, y, factor) {
+  const next = Math.min(8, Math.max(fit() / 4, scale * factor));
+  tx = x - (x - tx) * next / scale;
+  ty = y - (y - ty) * next / scale;
+  scale = next;
+  update();
+}
+
+const fit = () => Math.min(view.clientWidth / W, view.clientHeight / H);
+
+function show(x, y, w, h) {
+  scale = Math.min(8, Math.min(view.clientWidth, view.clientHeight) / (Math.max(w, h) * 6));
+  tx = view.clientWidth / 2 - (x + w / 2) * scale;
+  ty = view.clientHeight / 2 - (y + h / 2) * scale;
+  update();
+}
+
+function reset() {
+  scale = fit();
+  tx = (view.clientWidth - W * scale) / 2;
+  ty = (view.clientHeight - H * scale) / 2;
+  update();
+}
+
+// Overlay, drawn once in image coordinates; the browser scales it
+overlay.setAttribute('viewBox', `0 0 ${W} ${H}`);
+const rects = DATA.units.map(([id, x, y, w, h, stage], i) => {
+  const rect = document.createElementNS(SVG, 'rect');
+  Object.entries({ x, y, width: w, height: h }).forEach(([k, v]) => rect.setAttribute(k, v));
+  rect.setAttribute('class', 'unit');
+  rect.setAttribute('stroke', STAGE_COLORS[stage % STAGE_COLORS.length]);
+  rect.dataset.i = i;
+  overlay.appendChild(rect);
+  return rect;
+});
+for (const [type, x, y, w, h] of DATA.features) {
+  const rect = document.createElementNS(SVG, 'rect');
+  Object.entries({ x, y, width: w, height: h }).forEach(([k, v]) => rect.setAttribute(k, v));
+  rect.setAttribute('class', 'feature');
+  rect.setAttribute('stroke', FEATURE_COLORS[type] || '#808080');
+  overlay.appendChild(rect);
+}
+
+const used = [...new Set(DATA.units.map((u) => u[5]))].sort((a, b) => a - b);
+document.getElementById('legend').innerHTML = used.map((s) =>
+  `<span><i style="background:${STAGE_COLORS[s % STAGE_COLORS.length]}"></i>` +
+  `${DATA.stages[s] || s}</span>`).join('');
+document.getElementById('title').textContent = `${DATA.title} (${DATA.units.length} units)`;
+
+overlay.addEventListener('pointermove', (e) => {
+  const i = e.target.dataset && e.target.dataset.i;
+  if (i === undefined) { tip.style.display = 'none'; return; }
+  const [id, x, y, w, h, stage, confidence, ocr, source] = DATA.units[i];
+  tip.textContent = `Unit ${id || '(no ID)'}\\n` +
+    `Stage: ${DATA.stages[stage] || stage}\\n` +
+    `ID: ${source}, confidence ${confidence.toFixed(2)}` +
+    (ocr ? `\\nOCR read: ${ocr}` : '') +
+    `\\n${w}x${h} at ${x}, ${y}`;
+  Object.assign(tip.style, { display: 'block', left: `${e.clientX + 14}px`,
+                             top: `${e.clientY + 14}px` });
+});
+overlay.addEventListener('pointerleave', () => { tip.style.display = 'none'; });
+
+function applyThreshold() {
+  const threshold = Number(document.getElementById('threshold').value);
+  document.getElementById('threshold-value').textContent = threshold.toFixed(2);
+  rects.forEach((rect, i) => rect.classList.toggle('confident', DATA.units[i][6] >= threshold));
+  overlay.classList.toggle('only-low', document.getElementById('low').checked);
+}
+document.getElementById('threshold').addEventListener('input', applyThreshold);
+document.getElementById('low').addEventListener('change', applyThreshold);
+
+document.getElementById('find').addEventListener('input', (e) => {
+  const query = e.target.value.trim().toLowerCase();
+  const matches = [];
+  rects.forEach((rect, i) => {
+    const hit = query !== '' && DATA.units[i][0].toLowerCase().startsWith(query);
+    rect.classList.toggle('match', hit);
+    if (hit) matches.push(i);
+  });
+  document.getElementById('count').textContent = query ? `${matches.length} found` : '';
+  const exact = matches.find((i) => DATA.units[i][0].toLowerCase() === query);
+  const target = exact !== undefined ? exact : matches.length === 1 ? matches[0] : undefined;
+  if (target !== undefined) show(...DATA.units[target].slice(1, 5));
+});
+
+let drag = null;
+view.addEventListener('pointerdown', (e) => {
+  drag = { x: e.clientX - tx, y: e.clientY - ty };
+  view.classList.add('dragging');
+  view.setPointerCapture(e.pointerId);
+});
+view.addEventListener('pointermove', (e) => {
+  if (!drag) return;
+  tx = e.clientX - drag.x;
+  ty = e.clientY - drag.y;
+  update();
+});
+view.addEventListener('pointerup', () => { drag = null; view.classList.remove('dragging'); });
+view.addEventListener('wheel', (e) => {
+  e.preventDefault();
+  zoomAt(e.clientX, e.clientY, Math.exp(-e.deltaY * 0.0015));
+}, { passive: false });
+view.addEventListener('dblclick', (e) => zoomAt(e.clientX, e.clientY, 2));
+window.addEventListener('resize', update);
+window.addEventListener('keydown', (e) => { if (e.key === '0' && e.target.tagName !== 'INPUT') reset(); });
+
+applyThreshold();
+reset();
+</script>
+</body>
+</html>
+"""
@@ -7,19 +7,55 @@ Outputs structured JSON for the Moove In interactive map.
 
 Usage:
   python extract-floorplan.py <input.png> --output <output.json> [--debug]
+  python extract-floorplan.py <input.png> --output <output.json> --watch
+  python extract-floorplan.py <input.png> --output <output.json> --stages geometry --save-state s.npz
+  python extract-floorplan.py <input.png> --output <output.json> --resume s.npz
+  python extract-floorplan.py <input.png> --output <output.json> --reocr 2100,3400,400,300
+  python extract-floorplan.py --serve
 
 The --debug flag generates an overlay image showing detected units,
-allowing visual comparison against the original.
+allowing visual comparison against the original. --debug-tiles writes it
+as deep-zoom tiles plus an HTML viewer instead (see deepzoom.py).
+
+A vector PDF site plan (input ending in .pdf, needs PyMuPDF) is read
+directly: unit rectangles and IDs come from the page's filled paths and
+text runs instead of contour detection and OCR. Pages without vector
+units are rendered and go through the raster pipeline.
+
+--stages picks which stages run (geometry, ocr, features); a geometry-only
+run never loads an OCR engine. --save-state/--resume carry stage results
+between runs, so OCR and features can run later without redoing geometry.
+
+Hand corrections go in an overrides file (<output>.overrides.json by
+default, see overrides.py), applied at the end of every run. --reocr
+re-reads only the units inside a region of an existing extraction.
+
+--watch re-extracts whenever the PNG changes, and --serve answers JSON-RPC
+requests on stdin; both keep decoded images and OCR reads warm between runs
+so only the stages affected by a change are repeated.
 """
 
 import argparse
+import contextlib
+import io
 import json
 import sys
+import time
+import zlib
 from pathlib import Path
 
 import cv2
 import numpy as np
-import pytesseract
+
+import adjacency
+import color_model
+import glyph_classifier
+import id_resolver
+import ocr_backends
+import overrides
+import pdf_vector
+import plane_cache
+import unit_table
 
 
 # ---------------------------------------------------------------------------
@@ -36,8 +72,57 @@ BLUE_UPPER = np.array([130, 255, 255])
 YELLOW_LOWER = np.array([15, 80, 80])
 YELLOW_UPPER = np.array([35, 255, 255])
 
+# The constants above are the defaults; --colors auto fits them per image
+# (color_model.py) and set_color_model() swaps them in
+COLOR_CLASSES = {
+    "green": ("GREEN_LOWER", "GREEN_UPPER"),
+    "blue": ("BLUE_LOWER", "BLUE_UPPER"),
+    "yellow": ("YELLOW_LOWER", "YELLOW_UPPER"),
+}
+DEFAULT_COLORS = {name: (globals()[lower], globals()[upper])
+                  for name, (lower, upper) in COLOR_CLASSES.items()}
 
-def extract_units(img, hsv, scale_factor):
+# ---------------------------------------------------------------------------
+# Detection thresholds (pixels, at the ~4800px width of the site maps) —
+# hand-tuned over the v2–v5 runs; tools/sweep-params.py searches around them
+# ---------------------------------------------------------------------------
+CANNY_LOW = 50
+CANNY_HIGH = 150
+DILATION_PASSES = (1, 2)   # edge dilation iterations: gentle pass, strong pass
+MIN_UNIT_AREA = 1500       # 5x5 units can shrink to ~55x55 after edge subtraction
+MAX_UNIT_AREA = 600000
+MAX_ASPECT = 8             # more elongated shapes are artifacts, not units
+MIN_UNIT_SIDE = 15
+MERGE_CELL_SIZE = 200      # grid cell for picking a pass per area (_merge_passes)
+
+# Rescue pass (rescue_small_units)
+UNIT_5x5_MIN = 50          # minimum dimension for a 5x5 unit
+UNIT_5x5_MAX = 95          # maximum dimension for a 5x5 unit
+UNIT_5x5_NOMINAL = 73      # typical pixel size
+RESCUE_INSET = 5           # pixels to shrink each existing unit's coverage
+RESCUE_MIN_AREA = 800      # smaller leftovers can't even be a partial unit
+RESCUE_SINGLE_MIN_AREA = 1200
+RESCUE_CLUSTER_MIN_AREA = 2000
+RESCUE_CLUSTER_MAX_SIDE = 600
+
+# Pyramid mode only pays off when candidate regions skip enough of the image
+PYRAMID_MAX_COVERAGE = 0.6
+
+# Site features (detect_site_features)
+FEATURE_MIN_AREA = 500     # smaller blue/yellow blobs are anti-aliasing or icon fragments
+INK_THRESHOLD = 128        # gray below this is walls, text or icon strokes
+STAIRS_MIN_STEPS = 3       # rises along the top edge of a stair icon
+STAIRS_STEP_RATIO = 1.5    # largest/smallest rise of an evenly stepped icon
+ROOM_MIN_AREA = 5000       # white rooms that could be the office
+ROOM_MAX_AREA = 500000
+ROOM_MIN_FILL = 0.85       # contour area / bounding box
+LABEL_MIN_INK = 0.005      # ink share of a room holding a text label
+LABEL_MAX_INK = 0.25
+LABEL_MIN_GLYPHS = 3
+LABEL_MIN_GLYPH_AREA = 20  # smaller ink blobs are specks, not letters
+
+
+def extract_units(img, hsv, scale_factor, pyramid_levels=0, regions=None, gray=None, green=None):
     """Detect green unit rectangles and extract bounding boxes.
 
     Uses a two-pass approach:
@@ -49,19 +134,114 @@ def extract_units(img, hsv, scale_factor):
     Results are merged: for any region covered by both passes, the pass that
     produces more (smaller) units wins — since over-splitting is preferable
     to under-splitting (can be merged back, but can't split what you missed).
+
+    With pyramid_levels > 0, candidate unit regions are first located on an
+    image downsampled 2^pyramid_levels times (see find_candidate_regions),
+    and the full-resolution passes only run inside those regions. Aisles,
+    margins and the title block are never edge-detected at full size.
+
+    Explicit `regions` (x, y, w, h) restrict detection the same way, e.g. to
+    the dirty regions of a revised image (see dirty_regions).
+
+    `gray` and `green` (the GREEN_LOWER/UPPER mask) are computed from img and
+    hsv unless precomputed planes are passed in.
+    """
+    img_h, img_w = img.shape[:2]
+
+    if regions is None:
+        regions = [(0, 0, img_w, img_h)]
+    elif not regions:
+        return unit_table.empty(), np.zeros((img_h, img_w), dtype=np.uint8)
+
+    if pyramid_levels > 0 and regions == [(0, 0, img_w, img_h)]:
+        candidates = find_candidate_regions(hsv, pyramid_levels)
+        covered = sum(rw * rh for _, _, rw, rh in candidates) / (img_w * img_h)
+        print(f"  Pyramid level {pyramid_levels}: {len(candidates)} candidate regions "
+              f"covering {covered:.0%} of the image")
+        # Overlapping regions get processed more than once — on dense floors
+        # a single full-resolution pass is cheaper
+        if covered < PYRAMID_MAX_COVERAGE:
+            regions = candidates
+        else:
+            print("  Regions cover most of the image, using full resolution")
+
+    pass1_parts, pass2_parts = [], []
+    mask_final = None
+
+    for rx, ry, rw, rh in regions:
+        roi_pass1, roi_pass2, roi_mask = _extract_passes(
+            img[ry:ry+rh, rx:rx+rw], hsv[ry:ry+rh, rx:rx+rw],
+            None if gray is None else gray[ry:ry+rh, rx:rx+rw],
+            None if green is None else green[ry:ry+rh, rx:rx+rw])
+
+        if len(regions) == 1 and (rw, rh) == (img_w, img_h):
+            pass1_parts, pass2_parts, mask_final = [roi_pass1], [roi_pass2], roi_mask
+            break
+
+        if mask_final is None:
+            mask_final = np.zeros((img_h, img_w), dtype=np.uint8)
+        np.maximum(mask_final[ry:ry+rh, rx:rx+rw], roi_mask,
+                   out=mask_final[ry:ry+rh, rx:rx+rw])
+
+        for roi_units, dest in ((roi_pass1, pass1_parts), (roi_pass2, pass2_parts)):
+            # A unit clipped by the region edge belongs to a neighbouring
+            # block, whose own region contains it whole
+            clipped = (((roi_units["x"] == 0) & (rx > 0)) |
+                       ((roi_units["y"] == 0) & (ry > 0)) |
+                       ((roi_units["x"] + roi_units["w"] == rw) & (rx + rw < img_w)) |
+                       ((roi_units["y"] + roi_units["h"] == rh) & (ry + rh < img_h)))
+            kept = roi_units[~clipped]
+            kept["x"] += rx
+            kept["y"] += ry
+            dest.append(kept)
+
+    if mask_final is None:
+        mask_final = np.zeros((img_h, img_w), dtype=np.uint8)
+
+    pass1_units = unit_table.append(unit_table.empty(), *pass1_parts)
+    pass2_units = unit_table.append(unit_table.empty(), *pass2_parts)
+
+    if len(regions) > 1:
+        # Regions may overlap; a unit inside two of them is found twice
+        pass1_units = _drop_duplicate_boxes(pass1_units)
+        pass2_units = _drop_duplicate_boxes(pass2_units)
+
+    # Merge passes: use a grid-based approach
+    # For each area of the image, keep whichever pass produced more units
+    final_units = _merge_passes(pass1_units, pass2_units)
+
+    # The returned mask is pass 1's (the gentler one), used for wall-splitting
+    return final_units, mask_final
+
+
+def _drop_duplicate_boxes(units):
+    """Keep the first unit for each distinct (x, y, w, h) bounding box."""
+    boxes = np.stack([units["x"], units["y"], units["w"], units["h"]], axis=1)
+    _, first = np.unique(boxes, axis=0, return_index=True)
+    return units[np.sort(first)]
+
+
+def _extract_passes(img, hsv, gray=None, mask=None):
+    """Run both dilation passes over an image (or region) at full resolution.
+
+    Returns (pass1_units, pass2_units, mask) with coordinates relative to the
+    given image. The mask is the gentle (dilation=1) separated green mask.
     """
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    if gray is None:
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
 
     # Step 1: Get green mask
-    mask = cv2.inRange(hsv, GREEN_LOWER, GREEN_UPPER)
+    if mask is None:
+        mask = cv2.inRange(hsv, GREEN_LOWER, GREEN_UPPER)
 
     # Step 2: Detect edges (shared between passes)
-    edges = cv2.Canny(gray, 50, 150)
+    edges = cv2.Canny(gray, CANNY_LOW, CANNY_HIGH)
     edge_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
 
     all_units = []
+    mask_gentle = None
 
-    for dilation_iters in [1, 2]:
+    for dilation_iters in DILATION_PASSES:
         # Dilate edges — more iterations = thicker separator lines
         edges_thick = cv2.dilate(edges, edge_kernel, iterations=dilation_iters)
 
@@ -71,57 +251,117 @@ def extract_units(img, hsv, scale_factor):
         # Clean up noise (morph open removes tiny fragments)
         clean_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
         mask_separated = cv2.morphologyEx(mask_separated, cv2.MORPH_OPEN, clean_kernel, iterations=1)
+        if mask_gentle is None:
+            mask_gentle = mask_separated
 
-        # Find contours
+        # Find contours; areas and boxes for all of them come back as arrays
         contours, _ = cv2.findContours(mask_separated, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        xs, ys, ws, hs, areas = _contour_stats(contours)
 
-        units = []
-        # Lower min_area to catch 5x5 units (73x73=5329px², but after edge
+        # Low min area to catch 5x5 units (73x73=5329px², but after edge
         # subtraction they can shrink to ~55x55=3025px² or even smaller)
-        min_area = 1500
-        max_area = 600000
+        keep = (areas >= MIN_UNIT_AREA) & (areas <= MAX_UNIT_AREA)
+        # Skip very elongated shapes (artifacts, not units)
+        aspect = np.maximum(ws, hs) / np.maximum(np.minimum(ws, hs), 1)
+        keep &= aspect <= MAX_ASPECT
+        # Skip very small regions (noise)
+        keep &= (ws >= MIN_UNIT_SIDE) & (hs >= MIN_UNIT_SIDE)
 
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if area < min_area or area > max_area:
-                continue
+        all_units.append(unit_table.from_boxes(xs[keep], ys[keep], ws[keep], hs[keep],
+                                               areas[keep], pass_=dilation_iters))
 
-            x, y, w, h = cv2.boundingRect(contour)
+    pass1_units, pass2_units = all_units
+    return pass1_units, pass2_units, mask_gentle
 
-            # Skip very elongated shapes (artifacts, not units)
-            aspect = max(w, h) / max(min(w, h), 1)
-            if aspect > 8:
-                continue
 
-            # Skip very small regions (noise)
-            if w < 15 or h < 15:
-                continue
+def _contour_stats(contours):
+    """Bounding boxes and areas for a list of contours, as NumPy columns.
 
-            units.append({
-                "x": x,
-                "y": y,
-                "w": w,
-                "h": h,
-                "area": area,
-                "contour": contour,
-                "pass": dilation_iters,
-            })
+    Equivalent to calling cv2.boundingRect and cv2.contourArea per contour,
+    but computed over all contour points at once: boxes from per-contour
+    min/max, areas from the shoelace formula.
+    """
+    if not contours:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty, empty, np.empty(0, dtype=np.float64)
 
-        all_units.append(units)
+    lengths = np.fromiter((len(c) for c in contours), dtype=np.int64, count=len(contours))
+    points = np.concatenate(contours).reshape(-1, 2).astype(np.int64)
+    starts = np.zeros(len(contours), dtype=np.int64)
+    starts[1:] = np.cumsum(lengths)[:-1]
 
-    # Merge passes: use a grid-based approach
-    # For each area of the image, keep whichever pass produced more units
-    pass1_units, pass2_units = all_units
+    xs = np.minimum.reduceat(points[:, 0], starts)
+    ys = np.minimum.reduceat(points[:, 1], starts)
+    ws = np.maximum.reduceat(points[:, 0], starts) - xs + 1
+    hs = np.maximum.reduceat(points[:, 1], starts) - ys + 1
 
-    final_units = _merge_passes(pass1_units, pass2_units)
+    # Each point pairs with the next one in its own contour (wrapping around)
+    following = np.arange(len(points)) + 1
+    following[starts + lengths - 1] = starts
+    cross = points[:, 0] * points[following, 1] - points[following, 0] * points[:, 1]
+    areas = np.abs(np.add.reduceat(cross, starts)) / 2.0
 
-    # Return the last mask for debug (pass 1 — the gentler one)
-    edges_gentle = cv2.dilate(edges, edge_kernel, iterations=1)
-    mask_final = cv2.bitwise_and(mask, cv2.bitwise_not(edges_gentle))
-    mask_final = cv2.morphologyEx(mask_final, cv2.MORPH_OPEN,
-                                   cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3)),
-                                   iterations=1)
-    return final_units, mask_final
+    return xs, ys, ws, hs, areas
+
+
+def unit_contours(green_mask, units):
+    """Trace the green outline inside each unit's box (debug overlay only).
+
+    Detection never keeps contours; this re-derives them on demand from the
+    separated green mask so the overlay can show raw region shapes.
+    """
+    contours = []
+    for x, y, w, h in zip(units["x"].tolist(), units["y"].tolist(),
+                          units["w"].tolist(), units["h"].tolist()):
+        found, _ = cv2.findContours(green_mask[y:y+h, x:x+w], cv2.RETR_EXTERNAL,
+                                    cv2.CHAIN_APPROX_SIMPLE, offset=(x, y))
+        if found:
+            contours.append(max(found, key=cv2.contourArea))
+    return contours
+
+
+def find_candidate_regions(hsv, levels, margin=24):
+    """Locate blocks of units on a downsampled green mask.
+
+    The HSV image is reduced 2^levels times with pyrDown, thresholded for
+    green and grouped into connected blocks (aisles keep blocks apart). Each
+    block's bounding box is scaled back to full resolution and padded by
+    `margin` pixels of background so edge detection has context.
+
+    Boxes are deliberately not merged: on floors with L-shaped or nested
+    blocks the union of overlapping boxes degenerates into the whole image.
+    extract_units() discards units clipped by a region edge and duplicates
+    found in overlapping regions instead.
+
+    Returns a list of (x, y, w, h) regions in full-resolution pixels.
+    """
+    img_h, img_w = hsv.shape[:2]
+    factor = 2 ** levels
+
+    small = hsv
+    for _ in range(levels):
+        small = cv2.pyrDown(small)
+    mask_small = cv2.inRange(small, GREEN_LOWER, GREEN_UPPER)
+    # Bridge the dark walls between units (~4-8px at full resolution) so a
+    # block of units is one component, but not the aisles between blocks
+    k = max(3, 2 * (8 // factor) + 1)
+    mask_small = cv2.dilate(mask_small, cv2.getStructuringElement(cv2.MORPH_RECT, (k, k)))
+
+    _, _, stats, _ = cv2.connectedComponentsWithStats(mask_small, connectivity=8)
+
+    regions = []
+    # Smallest block worth refining: one 5x5 unit at the main min_area
+    min_area_small = MIN_UNIT_AREA / (factor * factor)
+    for x, y, w, h, area in stats[1:]:
+        if area < min_area_small:
+            continue
+        x1 = max(0, x * factor - margin)
+        y1 = max(0, y * factor - margin)
+        x2 = min(img_w, (x + w) * factor + margin)
+        y2 = min(img_h, (y + h) * factor + margin)
+        regions.append((int(x1), int(y1), int(x2 - x1), int(y2 - y1)))
+
+    return regions
 
 
 def _merge_passes(pass1, pass2):
@@ -133,42 +373,28 @@ def _merge_passes(pass1, pass2):
     both passes found the same count, prefer pass 2 (stronger separation
     is generally more reliable for medium/large units).
     """
-    CELL_SIZE = 200  # pixels
-
-    def cell_key(u):
-        cx = u["x"] // CELL_SIZE
-        cy = u["y"] // CELL_SIZE
-        return (cx, cy)
-
-    # Group units by grid cell
-    from collections import defaultdict
-    cells1 = defaultdict(list)
-    cells2 = defaultdict(list)
-
-    for u in pass1:
-        cells1[cell_key(u)].append(u)
-    for u in pass2:
-        cells2[cell_key(u)].append(u)
-
-    # All cells from both passes
-    all_cells = set(cells1.keys()) | set(cells2.keys())
-
-    final = []
-    for cell in all_cells:
-        c1 = cells1.get(cell, [])
-        c2 = cells2.get(cell, [])
-
-        if len(c1) > len(c2):
-            # Pass 1 found more units here — better separation
-            final.extend(c1)
-        else:
-            # Pass 2 found same or more — use it (stronger separation)
-            final.extend(c2)
+    def cell_keys(units):
+        return ((units["y"].astype(np.int64) // MERGE_CELL_SIZE) * 100000 +
+                units["x"] // MERGE_CELL_SIZE)
+
+    keys1 = cell_keys(pass1)
+    keys2 = cell_keys(pass2)
+
+    # All cells from both passes, with per-pass unit counts
+    all_cells = np.union1d(keys1, keys2)
+    idx1 = np.searchsorted(all_cells, keys1)
+    idx2 = np.searchsorted(all_cells, keys2)
+    count1 = np.bincount(idx1, minlength=len(all_cells))
+    count2 = np.bincount(idx2, minlength=len(all_cells))
+
+    # Pass 1 found more units in a cell — better separation. Otherwise pass 2
+    # found same or more — use it (stronger separation)
+    pass1_wins = count1 > count2
 
-    return final
+    return np.concatenate([pass1[pass1_wins[idx1]], pass2[~pass1_wins[idx2]]])
 
 
-def rescue_small_units(img, hsv, existing_units):
+def rescue_small_units(img, hsv, existing_units, gray=None, green=None):
     """Rescue pass for 5x5 units missed by the main extraction.
 
     The main extraction uses edge subtraction which destroys small units in
@@ -181,27 +407,24 @@ def rescue_small_units(img, hsv, existing_units):
       2. Get the raw green mask (no edge subtraction)
       3. Subtract the coverage mask → only uncovered green remains
       4. Find contours in the uncovered green
-      5. For each contour, check if it matches 5x5 dimensions or can be
-         grid-decomposed into 5x5 cells
+      5. Filter the contour stats for 5x5 dimensions, and grid-decompose
+         clusters of merged 5x5 cells
+
+    Returns a unit table of the rescued units.
     """
-    mask = cv2.inRange(hsv, GREEN_LOWER, GREEN_UPPER)
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    mask = cv2.inRange(hsv, GREEN_LOWER, GREEN_UPPER) if green is None else green
+    if gray is None:
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
     img_h, img_w = img.shape[:2]
 
-    # Expected 5x5 unit size in pixels (with tolerance)
-    UNIT_5x5_MIN = 50    # minimum dimension for a 5x5 unit
-    UNIT_5x5_MAX = 95    # maximum dimension for a 5x5 unit
-    UNIT_5x5_NOMINAL = 73  # typical pixel size
-
     # Build pixel-level coverage mask from existing units
     # (with a small inset so we don't miss units sitting right at the edge)
     coverage = np.zeros((img_h, img_w), dtype=np.uint8)
-    INSET = 5  # pixels to shrink each existing unit's coverage
-    for u in existing_units:
-        x1 = u["x"] + INSET
-        y1 = u["y"] + INSET
-        x2 = u["x"] + u["w"] - INSET
-        y2 = u["y"] + u["h"] - INSET
+    x1s = existing_units["x"] + RESCUE_INSET
+    y1s = existing_units["y"] + RESCUE_INSET
+    x2s = existing_units["x"] + existing_units["w"] - RESCUE_INSET
+    y2s = existing_units["y"] + existing_units["h"] - RESCUE_INSET
+    for x1, y1, x2, y2 in zip(x1s.tolist(), y1s.tolist(), x2s.tolist(), y2s.tolist()):
         if x2 > x1 and y2 > y1:
             coverage[y1:y2, x1:x2] = 255
 
@@ -214,30 +437,29 @@ def rescue_small_units(img, hsv, existing_units):
 
     # Find contours in uncovered green regions
     contours, _ = cv2.findContours(clean, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    xs, ys, ws, hs, areas = _contour_stats(contours)
 
-    rescued = []
-    for contour in contours:
-        area = cv2.contourArea(contour)
-        x, y, w, h = cv2.boundingRect(contour)
+    # Too small to be even a partial unit
+    candidate = areas >= RESCUE_MIN_AREA
 
-        if area < 800:  # Too small to be even a partial unit
-            continue
+    # Single small unit that was missed
+    single = (candidate &
+              (ws >= UNIT_5x5_MIN) & (ws <= UNIT_5x5_MAX) &
+              (hs >= UNIT_5x5_MIN) & (hs <= UNIT_5x5_MAX) &
+              (areas >= RESCUE_SINGLE_MIN_AREA))
 
-        # Single small unit that was missed
-        if (UNIT_5x5_MIN <= w <= UNIT_5x5_MAX and
-                UNIT_5x5_MIN <= h <= UNIT_5x5_MAX and
-                area >= 1200):
-            rescued.append({"x": x, "y": y, "w": w, "h": h,
-                            "area": area, "contour": contour})
-            continue
+    # Cluster of merged small units — try grid decomposition
+    cluster = (candidate & ~single & (areas >= RESCUE_CLUSTER_MIN_AREA) &
+               (ws <= RESCUE_CLUSTER_MAX_SIDE) & (hs <= RESCUE_CLUSTER_MAX_SIDE))
 
-        # Cluster of merged small units — try grid decomposition
-        if area >= 2000 and w <= 600 and h <= 600:
-            grid_units = _grid_decompose_5x5(gray, uncovered_green, x, y, w, h,
-                                              UNIT_5x5_NOMINAL)
-            rescued.extend(grid_units)
+    rescued = [unit_table.from_boxes(xs[single], ys[single], ws[single], hs[single],
+                                     areas[single], stage=unit_table.STAGE_RESCUE)]
+    for x, y, w, h in zip(xs[cluster].tolist(), ys[cluster].tolist(),
+                          ws[cluster].tolist(), hs[cluster].tolist()):
+        rescued.append(_grid_decompose_5x5(gray, uncovered_green, x, y, w, h,
+                                           UNIT_5x5_NOMINAL))
 
-    return rescued
+    return unit_table.append(*rescued)
 
 
 def _grid_decompose_5x5(gray, green_mask, rx, ry, rw, rh, cell_size):
@@ -246,7 +468,7 @@ def _grid_decompose_5x5(gray, green_mask, rx, ry, rw, rh, cell_size):
     Looks at the dark lines within the region to find the actual cell
     boundaries, then extracts individual cells.
     """
-    units = []
+    cells = []
 
     # Estimate number of cells along each axis
     # Add ~4px for walls between units
@@ -255,7 +477,7 @@ def _grid_decompose_5x5(gray, green_mask, rx, ry, rw, rh, cell_size):
     n_rows = max(1, round(rh / cell_with_wall))
 
     if n_cols <= 0 or n_rows <= 0:
-        return units
+        return unit_table.empty()
 
     # Calculate cell dimensions
     cell_w = rw / n_cols
@@ -263,7 +485,7 @@ def _grid_decompose_5x5(gray, green_mask, rx, ry, rw, rh, cell_size):
 
     # Only decompose if cells are roughly 5x5 unit sized
     if not (50 <= cell_w <= 100 and 50 <= cell_h <= 100):
-        return units
+        return unit_table.empty()
 
     for row in range(n_rows):
         for col in range(n_cols):
@@ -278,12 +500,12 @@ def _grid_decompose_5x5(gray, green_mask, rx, ry, rw, rh, cell_size):
                 continue
             green_ratio = cv2.countNonZero(cell_mask) / cell_mask.size
             if green_ratio > 0.3:  # At least 30% green
-                units.append({
-                    "x": cx, "y": cy, "w": cw, "h": ch,
-                    "area": cw * ch, "contour": None,
-                })
+                cells.append((cx, cy, cw, ch))
 
-    return units
+    if not cells:
+        return unit_table.empty()
+    xs, ys, ws, hs = zip(*cells)
+    return unit_table.from_boxes(xs, ys, ws, hs, stage=unit_table.STAGE_GRID)
 
 
 def split_by_internal_walls(units, gray_img, green_mask):
@@ -294,7 +516,10 @@ def split_by_internal_walls(units, gray_img, green_mask):
       - 10x25 → could be 10x10 + 10x15
       - 10x30 → could be 2× 10x15
       - 10x40 → could be 2× 10x20
-      - Any invalid size (not in VALID_SIZES_FT)
+
+    Invalid sizes are left to split_oversized_units(), which only cuts at
+    walls crossing the whole unit (this function's brightness fallback
+    also dips at a unit's ID text).
 
     Does NOT try splitting already-valid non-merge sizes like 10x15, 10x10,
     5x10, etc. — those would produce invalid halves (e.g., splitting 10x15
@@ -303,41 +528,29 @@ def split_by_internal_walls(units, gray_img, green_mask):
     # Sizes (in feet, sorted tuple) that are known merge candidates
     SPLITTABLE_SIZES = {(10, 20), (10, 25), (10, 30), (10, 40)}
 
-    final = []
-    split_count = 0
-
-    for unit in units:
-        w, h = unit["w"], unit["h"]
-        x, y = unit["x"], unit["y"]
+    replacements = {}
 
+    for i, (x, y, w, h) in enumerate(zip(units["x"].tolist(), units["y"].tolist(),
+                                         units["w"].tolist(), units["h"].tolist())):
         w_ft = _px_to_ft(w)
         h_ft = _px_to_ft(h)
         dims_ft = tuple(sorted([w_ft, h_ft]))
 
         # Decide if this unit should be tried for wall-splitting
-        should_try = False
-        if dims_ft in SPLITTABLE_SIZES:
-            should_try = True
-        elif not _is_valid_size(w, h) and max(w, h) >= 200:
-            # Invalid size that might be a merge artifact
-            should_try = True
-
-        if not should_try:
-            final.append(unit)
+        if dims_ft not in SPLITTABLE_SIZES:
             continue
 
         # Look for a dark vertical or horizontal line through the unit
-        split_result = _find_internal_wall(gray_img, green_mask, x, y, w, h)
-        if split_result:
-            final.extend(split_result)
-            split_count += 1
-        else:
-            final.append(unit)
+        boxes = _find_internal_wall(gray_img, green_mask, x, y, w, h)
+        if boxes:
+            xs, ys, ws, hs = zip(*boxes)
+            replacements[i] = unit_table.children(np.repeat(units[i:i+1], len(boxes)),
+                                                  xs, ys, ws, hs, unit_table.STAGE_WALL_SPLIT)
 
-    if split_count:
-        print(f"  Wall-split {split_count} merged units")
+    if replacements:
+        print(f"  Wall-split {len(replacements)} merged units")
 
-    return final
+    return unit_table.split_rows(units, replacements)
 
 
 def _find_internal_wall(gray, green_mask, x, y, w, h):
@@ -421,10 +634,8 @@ def _find_split_by_green_gap(profile, cross_dim, x, y, w, h, axis):
             return None
         if _is_valid_size(left_w, h) and _is_valid_size(right_w, h):
             return [
-                {"x": x, "y": y, "w": left_w, "h": h,
-                 "area": left_w * h, "contour": None},
-                {"x": x + min_idx, "y": y, "w": right_w, "h": h,
-                 "area": right_w * h, "contour": None},
+                (x, y, left_w, h),
+                (x + min_idx, y, right_w, h),
             ]
     else:
         top_h = min_idx
@@ -433,10 +644,8 @@ def _find_split_by_green_gap(profile, cross_dim, x, y, w, h, axis):
             return None
         if _is_valid_size(w, top_h) and _is_valid_size(w, bottom_h):
             return [
-                {"x": x, "y": y, "w": w, "h": top_h,
-                 "area": w * top_h, "contour": None},
-                {"x": x, "y": y + min_idx, "w": w, "h": bottom_h,
-                 "area": w * bottom_h, "contour": None},
+                (x, y, w, top_h),
+                (x, y + min_idx, w, bottom_h),
             ]
 
     return None
@@ -470,10 +679,8 @@ def _find_split_point(profile, x, y, w, h, axis):
         # Check both halves are valid sizes
         if _is_valid_size(left_w, h) and _is_valid_size(right_w, h):
             return [
-                {"x": x, "y": y, "w": left_w, "h": h,
-                 "area": left_w * h, "contour": None},
-                {"x": x + min_idx, "y": y, "w": right_w, "h": h,
-                 "area": right_w * h, "contour": None},
+                (x, y, left_w, h),
+                (x + min_idx, y, right_w, h),
             ]
     else:
         # Split at the dark row
@@ -483,22 +690,25 @@ def _find_split_point(profile, x, y, w, h, axis):
             return None
         if _is_valid_size(w, top_h) and _is_valid_size(w, bottom_h):
             return [
-                {"x": x, "y": y, "w": w, "h": top_h,
-                 "area": w * top_h, "contour": None},
-                {"x": x, "y": y + min_idx, "w": w, "h": bottom_h,
-                 "area": w * bottom_h, "contour": None},
+                (x, y, w, top_h),
+                (x, y + min_idx, w, bottom_h),
             ]
 
     return None
 
 
-def ocr_unit_id(img_rgb, unit, padding=2):
+def ocr_unit_id(img_rgb, unit, ocr, padding=2):
     """OCR the unit ID from a cropped region of the image.
 
     Uses multiple OCR strategies and picks the best result.
     Key insight: feeding GRAYSCALE directly to Tesseract (letting it handle
     binarization) works much better than manual thresholding, especially
     for distinguishing similar-looking digits like 5 vs 9.
+
+    `ocr` is an ocr_backends backend. Returns (unit_id, confidence,
+    id_source), where confidence is the best Tesseract confidence among the
+    reads that agree with the chosen ID and id_source is the unit_table ID_*
+    code of the strategy behind it (grayscale unless only Otsu read it).
     """
     x, y, w, h = unit["x"], unit["y"], unit["w"], unit["h"]
 
@@ -509,7 +719,7 @@ def ocr_unit_id(img_rgb, unit, padding=2):
     x2 = min(img_rgb.shape[1], x + w - padding)
 
     if x2 <= x1 or y2 <= y1:
-        return ""
+        return "", 0.0, unit_table.ID_NONE
 
     crop = img_rgb[y1:y2, x1:x2]
     gray = cv2.cvtColor(crop, cv2.COLOR_RGB2GRAY)
@@ -524,11 +734,10 @@ def ocr_unit_id(img_rgb, unit, padding=2):
                            interpolation=cv2.INTER_LANCZOS4)
         bordered = cv2.copyMakeBorder(large, 30, 30, 30, 30,
                                        cv2.BORDER_CONSTANT, value=200)
-        config = "--oem 1 --psm 7 -c tessedit_char_whitelist=0123456789"
-        text = pytesseract.image_to_string(bordered, config=config).strip()
+        text, conf = ocr.read(bordered, psm=7, oem=1, whitelist=ocr_backends.DIGIT_WHITELIST)
         cleaned = "".join(c for c in text if c.isdigit())
         if cleaned:
-            results.append(cleaned)
+            results.append((cleaned, conf, unit_table.ID_GRAY))
 
     # Fallback strategy: Binary threshold (Otsu) for cases where grayscale
     # doesn't work well (e.g., very low contrast)
@@ -536,14 +745,17 @@ def ocr_unit_id(img_rgb, unit, padding=2):
     large = cv2.resize(otsu, None, fx=4, fy=4, interpolation=cv2.INTER_NEAREST)
     bordered = cv2.copyMakeBorder(large, 30, 30, 30, 30, cv2.BORDER_CONSTANT, value=0)
     final = cv2.bitwise_not(bordered)
-    config = "--oem 3 --psm 7 -c tessedit_char_whitelist=0123456789"
-    text = pytesseract.image_to_string(final, config=config).strip()
+    text, conf = ocr.read(final, psm=7, oem=3, whitelist=ocr_backends.DIGIT_WHITELIST)
     cleaned = "".join(c for c in text if c.isdigit())
     if cleaned:
-        results.append(cleaned)
+        results.append((cleaned, conf, unit_table.ID_OTSU))
 
     # Pick the best result
-    return _pick_best_id(results)
+    best = _pick_best_id([text for text, _, _ in results])
+    agreeing = [(conf, source) for text, conf, source in results if text == best]
+    if not agreeing:
+        return best, 0.0, unit_table.ID_NONE
+    return best, max(conf for conf, _ in agreeing), min(source for _, source in agreeing)
 
 
 def _pick_best_id(candidates):
@@ -578,61 +790,155 @@ def _pick_best_id(candidates):
     return candidates[0] if candidates else ""
 
 
-def detect_site_features(img, hsv):
-    """Detect non-unit features: elevator (blue), stairs, office, yellow/special."""
+def detect_site_features(img, hsv, ocr, planes=None):
+    """Detect non-unit features: elevator (blue), stairs, office, yellow/special.
+
+    Classified cheapest test first: colored regions by their icon, and
+    white rooms by shape and text density, so OCR only ever sees the few
+    rooms that hold a label. `ocr` is an ocr_backends backend, used to
+    find the "OFFICE" label. Precomputed "gray", "blue" and "yellow"
+    `planes` are used if present.
+    """
+    planes = planes or {}
+    gray = planes.get("gray")
+    if gray is None:
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
     features = []
 
     # Blue regions (elevator)
-    blue_mask = cv2.inRange(hsv, BLUE_LOWER, BLUE_UPPER)
-    blue_contours, _ = cv2.findContours(blue_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    for c in blue_contours:
-        area = cv2.contourArea(c)
-        if area < 500:
-            continue
-        x, y, w, h = cv2.boundingRect(c)
+    for x, y, w, h in _color_regions(planes.get("blue"), hsv, BLUE_LOWER, BLUE_UPPER):
         features.append({
             "type": "elevator",
             "x": x, "y": y, "w": w, "h": h,
         })
 
-    # Yellow/orange regions (special units or highlights)
-    yellow_mask = cv2.inRange(hsv, YELLOW_LOWER, YELLOW_UPPER)
-    yellow_contours, _ = cv2.findContours(yellow_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    for c in yellow_contours:
-        area = cv2.contourArea(c)
-        if area < 500:
-            continue
-        x, y, w, h = cv2.boundingRect(c)
+    # Yellow/orange regions: stairs if they carry a staircase icon,
+    # otherwise special units or highlights
+    for x, y, w, h in _color_regions(planes.get("yellow"), hsv, YELLOW_LOWER, YELLOW_UPPER):
         features.append({
-            "type": "highlight",
+            "type": "stairs" if _is_stair_icon(gray[y:y+h, x:x+w]) else "highlight",
             "x": x, "y": y, "w": w, "h": h,
         })
 
-    # Detect "OFFICE" text region via template matching or OCR
-    # For now, detect large white/light rectangular regions with text
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    # The office is a white rectangle with "OFFICE" text
-    _, white_mask = cv2.threshold(gray, 240, 255, cv2.THRESH_BINARY)
-    white_contours, _ = cv2.findContours(white_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    for c in white_contours:
-        area = cv2.contourArea(c)
-        if area < 5000 or area > 500000:
-            continue
-        x, y, w, h = cv2.boundingRect(c)
-        # Check if this region contains "OFFICE" text
-        crop = gray[y:y+h, x:x+w]
-        text = pytesseract.image_to_string(crop, config="--psm 7").strip().upper()
-        if "OFFICE" in text:
+    # The office is a white room with "OFFICE" text
+    rooms, labeled = _labeled_rooms(gray)
+    for (x, y, w, h), (lx, ly, lw, lh) in labeled:
+        text, _ = ocr.read(gray[ly:ly+lh, lx:lx+lw], psm=7)
+        if "OFFICE" in text.upper():
             features.append({
                 "type": "office",
                 "label": "OFFICE",
                 "x": x, "y": y, "w": w, "h": h,
             })
+    print(f"  {rooms} white rooms, {len(labeled)} with a text label sent to OCR")
 
     return features
 
 
-def fix_ocr_errors(units, expected_range=None):
+def _color_regions(mask, hsv, lower, upper):
+    """Bounding boxes of the color mask's blobs of at least FEATURE_MIN_AREA."""
+    if mask is None:
+        mask = cv2.inRange(hsv, lower, upper)
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    return [cv2.boundingRect(c) for c in contours if cv2.contourArea(c) >= FEATURE_MIN_AREA]
+
+
+def _is_stair_icon(crop):
+    """Whether a region's largest ink stroke is a staircase.
+
+    The stair icon's zigzag has a top edge that rises in at least
+    STAIRS_MIN_STEPS even steps in one direction; unit ID digits and
+    arrows don't. Checked along both axes, for stairs drawn sideways.
+    """
+    ink = (crop < INK_THRESHOLD).astype(np.uint8)
+    n, labels, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    if n < 2:
+        return False
+    largest = 1 + int(np.argmax(stats[1:, cv2.CC_STAT_AREA]))
+    x, y, w, h = stats[largest, :4]
+    stroke = labels[y:y+h, x:x+w] == largest
+
+    for profile in (stroke, stroke.T):
+        # A component's projection has no gaps, so every column has ink
+        top = np.argmax(profile, axis=0)
+        rises = np.diff(top)
+        rises = rises[np.abs(rises) >= max(3, profile.shape[0] // 12)]
+        if len(rises) < STAIRS_MIN_STEPS:
+            continue
+        if not (np.all(rises > 0) or np.all(rises < 0)):
+            continue
+        if np.abs(rises).max() <= STAIRS_STEP_RATIO * np.abs(rises).min():
+            return True
+    return False
+
+
+def _labeled_rooms(gray):
+    """White rooms that hold a text label, found without any OCR.
+
+    Returns (number of room-shaped candidates, [(room box, label box)]).
+    Prefilters, cheapest first: bounding-box area, fill ratio (rooms are
+    rectangles, aisle fragments aren't), ink share (an empty room has
+    nothing to read), and glyph count.
+    """
+    _, white_mask = cv2.threshold(gray, 240, 255, cv2.THRESH_BINARY)
+    # Enclosed rooms are nested inside the background's outline, so
+    # RETR_EXTERNAL never sees them; RETR_CCOMP puts every white
+    # component's outline at the top level
+    contours, hierarchy = cv2.findContours(white_mask, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
+    if hierarchy is None:
+        return 0, []
+
+    rooms, labeled = 0, []
+    for c, (_, _, _, parent) in zip(contours, hierarchy[0]):
+        if parent != -1:
+            continue    # a hole: text or walls inside a white region
+        x, y, w, h = cv2.boundingRect(c)
+        if not ROOM_MIN_AREA <= w * h <= ROOM_MAX_AREA:
+            continue
+        if cv2.contourArea(c) < ROOM_MIN_FILL * w * h:
+            continue
+        rooms += 1
+
+        ink = gray[y:y+h, x:x+w] < INK_THRESHOLD
+        if not LABEL_MIN_INK <= ink.mean() <= LABEL_MAX_INK:
+            continue
+        n, _, stats, _ = cv2.connectedComponentsWithStats(ink.astype(np.uint8), connectivity=8)
+        glyphs = stats[1:][stats[1:, cv2.CC_STAT_AREA] >= LABEL_MIN_GLYPH_AREA]
+        if len(glyphs) < LABEL_MIN_GLYPHS:
+            continue
+
+        # OCR just the label, padded like the unit ID crops
+        lx = max(0, x + int(glyphs[:, 0].min()) - 10)
+        ly = max(0, y + int(glyphs[:, 1].min()) - 10)
+        lx2 = min(x + w, x + int((glyphs[:, 0] + glyphs[:, 2]).max()) + 10)
+        ly2 = min(y + h, y + int((glyphs[:, 1] + glyphs[:, 3]).max()) + 10)
+        labeled.append(((x, y, w, h), (lx, ly, lx2 - lx, ly2 - ly)))
+    return rooms, labeled
+
+
+def parse_region(region):
+    """Parse "x,y,w,h" into a tuple of ints; ValueError if malformed."""
+    try:
+        x, y, w, h = map(int, region.split(","))
+    except ValueError:
+        raise ValueError(f"Region must be x,y,w,h in source-image pixels, not '{region}'")
+    if w <= 0 or h <= 0:
+        raise ValueError(f"Region '{region}' is empty")
+    return x, y, w, h
+
+
+def _parse_expected_range(expected_range):
+    """Parse "400-589" into (400, 589); None if missing or malformed."""
+    if not expected_range:
+        return None
+    try:
+        range_start, range_end = map(int, expected_range.split("-"))
+    except ValueError:
+        return None
+    return range_start, range_end
+
+
+def fix_ocr_errors(units, expected_range=None, fixed=None):
     """Post-process OCR results to fix systematic misreads.
 
     Known OCR confusion patterns in bold sans-serif fonts:
@@ -641,85 +947,47 @@ def fix_ocr_errors(units, expected_range=None):
     - '3' ↔ '8'
     - '0' ↔ 'O' (already handled by digit whitelist)
 
-    If expected_range is given (e.g., "400-589"), IDs outside the range
-    are corrected by trying common digit substitutions.
+    If expected_range is given (e.g., "400-589"), IDs are resolved for the
+    whole floor at once (see id_resolver.py): out-of-range and duplicate
+    reads are matched to unique in-range IDs by digit substitutions, dropped
+    leading digits and neighboring units' numbering, weighted by OCR
+    confidence. Changed IDs keep their raw read in id_ocr. Units carried
+    over from a previous extraction, IDs set by an overrides file and the
+    units in the `fixed` mask keep their IDs (and are never reassigned).
     """
     if not expected_range:
         return units
 
-    # Parse expected range
-    try:
-        range_start, range_end = map(int, expected_range.split("-"))
-    except ValueError:
+    bounds = _parse_expected_range(expected_range)
+    if bounds is None:
         print(f"  Warning: Invalid expected range '{expected_range}', skipping OCR correction")
         return units
 
-    # Common OCR digit confusions (bidirectional)
-    CONFUSIONS = {
-        '5': ['9'], '9': ['5'],
-        '6': ['8'], '8': ['6', '3'],
-        '3': ['8'], '1': ['7'], '7': ['1'],
-    }
-
-    fixed_count = 0
-    for unit in units:
-        uid = unit["id"]
-        if not uid or not uid.isdigit():
-            continue
-
-        num = int(uid)
-        if range_start <= num <= range_end:
-            continue  # Already in range, no fix needed
-
-        # Try all possible single and multi-digit substitutions
-        best_fix = _find_ocr_fix(uid, CONFUSIONS, range_start, range_end)
-
-        # Also handle dropped leading digit (e.g., "77" should be "477")
-        if not best_fix and len(uid) < 3:
-            for prefix in range(1, 10):
-                padded = str(prefix) + uid.zfill(2)
-                if padded.isdigit():
-                    pnum = int(padded)
-                    if range_start <= pnum <= range_end:
-                        best_fix = padded
-                        break
-
-        if best_fix:
-            unit["id_original_ocr"] = uid
-            unit["id"] = best_fix
-            fixed_count += 1
-
-    if fixed_count:
-        print(f"  Fixed {fixed_count} OCR misreads using expected range {expected_range}")
+    index = id_resolver.ConfusionIndex(*bounds)
+    reads = units["id"].tolist()
+    carried = ((units["source_stage"] == unit_table.STAGE_PREVIOUS) |
+               (units["id_source"] == unit_table.ID_MANUAL))
+    if fixed is not None:
+        carried = carried | fixed
+    ids, stats = id_resolver.resolve_ids(reads, units["confidence"],
+                                         (units["x"], units["y"], units["w"], units["h"]), index,
+                                         fixed=carried)
+    for i, (read, uid) in enumerate(zip(reads, ids)):
+        if uid != read:
+            units["id_ocr"][i] = read
+            units["id"][i] = uid
+
+    if stats["corrected"] or stats["sequenced"]:
+        print(f"  Fixed {stats['corrected'] + stats['sequenced']} OCR misreads using expected "
+              f"range {expected_range} ({stats['sequenced']} from neighbor numbering)")
+    if stats["cleared"]:
+        print(f"  Cleared {stats['cleared']} duplicate IDs with no unique alternative")
+    if stats["unresolved"]:
+        print(f"  {stats['unresolved']} out-of-range reads left unresolved")
 
     return units
 
 
-def _find_ocr_fix(uid, confusions, range_start, range_end):
-    """Try substituting confused digits (single and multi) to find a valid ID."""
-    from itertools import product
-
-    # Build list of possible replacements per position
-    options_per_pos = []
-    for digit in uid:
-        alts = [digit]  # original digit is always an option
-        if digit in confusions:
-            alts.extend(confusions[digit])
-        options_per_pos.append(alts)
-
-    # Try all combinations (skip the original)
-    for combo in product(*options_per_pos):
-        candidate = "".join(combo)
-        if candidate == uid:
-            continue  # Skip original
-        if candidate.isdigit():
-            cnum = int(candidate)
-            if range_start <= cnum <= range_end:
-                return candidate
-
-    return None
-
-
 # ---------------------------------------------------------------------------
 # Valid unit sizes at Richland (from planning/richland-unit-mix.pdf)
 # Format: (width_ft, height_ft) — always smaller dim first
@@ -769,6 +1037,23 @@ def _ft_to_px_range(ft):
     return ranges.get(ft, (0, 0))
 
 
+# _px_to_ft() as lookup arrays, for classifying whole columns at once
+_PX_TO_FT_BOUNDS = np.array([55, 95, 140, 200, 290, 370, 460, 560, 700])
+_PX_TO_FT_VALUES = np.array([0, 5, 7.6, 10, 15, 20, 25, 30, 40, -1])
+
+
+def _valid_size_mask(w_px, h_px):
+    """Vectorized _is_valid_size() over arrays of pixel dimensions."""
+    w_ft = _PX_TO_FT_VALUES[np.searchsorted(_PX_TO_FT_BOUNDS, w_px)]
+    h_ft = _PX_TO_FT_VALUES[np.searchsorted(_PX_TO_FT_BOUNDS, h_px)]
+    small = np.minimum(w_ft, h_ft)
+    large = np.maximum(w_ft, h_ft)
+    valid = np.zeros(len(small), dtype=bool)
+    for a, b in VALID_SIZES_FT:
+        valid |= (small == a) & (large == b)
+    return valid & (small > 0)
+
+
 def _is_valid_size(w_px, h_px):
     """Check if pixel dimensions map to a valid Richland unit size."""
     w_ft = _px_to_ft(w_px)
@@ -779,83 +1064,179 @@ def _is_valid_size(w_px, h_px):
     return dims in VALID_SIZES_FT
 
 
-def split_oversized_units(units, img_rgb, green_mask):
-    """Split detected units whose dimensions don't match any valid size.
+# Oversized-contour partitioning (split_oversized_units)
+MAX_PARTS = 8                 # most units one contour is split into
+MAX_PARTITION_LENGTH = 2400   # longer contours are left alone
+PARTITION_CUT_WEIGHT = 1.0    # cost of a cut at the weakest acceptable wall
+PARTITION_SKIP_WEIGHT = 1.0   # cost of a part spanning a certain wall
+PARTITION_WALL_TOLERANCE = 3  # pixels a cut may sit off the wall
+WALL_MIN_COVER = 0.6          # non-green share of a line below which it's no wall
+MIN_CUT_EVIDENCE = 0.5        # cuts need a line >= 80% non-green (ID text
+                              # rows reach ~60% in narrow units)
+
+# Nominal pixel length of each standard size (middle of _ft_to_px_range)
+_NOMINAL_PX = {ft: sum(_ft_to_px_range(ft)) / 2
+               for ft in {ft for size in VALID_SIZES_FT for ft in size}}
+
+_PARTITION_TABLES = {}
+
 
-    For each oversized/invalid unit, try splitting along the longer axis
-    into 2 or 3 parts. If the resulting parts match valid sizes, replace
-    the original with the splits. The splits inherit the original's position
-    and divide the space evenly.
+def _partition_table(cross_ft):
+    """Part lengths and feasibility for partitions across a cross_ft-wide unit.
 
-    This handles the common case where two adjacent 10x15 units merge into
-    one 10x30, or two 5x5 units merge into one 5x10-ish shape.
+    Returns (lengths, size_cost, min_parts):
+      lengths     every pixel length a part may have: one whose size in
+                  feet makes a valid unit with the cross dimension
+      size_cost   per length, its relative distance from the nominal length
+      min_parts   per total length 0..MAX_PARTITION_LENGTH, the fewest
+                  parts (<= MAX_PARTS) it can be divided into, 0 if none
+
+    Built once per cross dimension; a unit whose length has min_parts 0 is
+    rejected without running the DP.
+    """
+    if cross_ft in _PARTITION_TABLES:
+        return _PARTITION_TABLES[cross_ft]
+
+    px = np.arange(1, _PX_TO_FT_BOUNDS[-1] + 1)
+    part_ft = _PX_TO_FT_VALUES[np.searchsorted(_PX_TO_FT_BOUNDS, px)]
+    valid = {tuple(sorted(size)) for size in VALID_SIZES_FT}
+    ok = np.array([tuple(sorted((cross_ft, ft))) in valid for ft in part_ft.tolist()])
+    lengths = px[ok]
+    nominal = np.array([_NOMINAL_PX[ft] for ft in part_ft[ok].tolist()])
+    size_cost = np.abs(lengths - nominal) / nominal
+
+    min_parts = np.zeros(MAX_PARTITION_LENGTH + 1, dtype=np.int8)
+    if len(lengths):
+        step = np.zeros(lengths[-1] + 1)
+        step[lengths] = 1
+        reach = np.zeros(MAX_PARTITION_LENGTH + 1)
+        reach[0] = 1
+        for k in range(1, MAX_PARTS + 1):
+            # Lengths reachable with exactly k parts
+            reach = (np.convolve(reach, step)[:MAX_PARTITION_LENGTH + 1] > 0).astype(float)
+            min_parts[(reach > 0) & (min_parts == 0)] = k
+    min_parts[0] = 0
+
+    _PARTITION_TABLES[cross_ft] = (lengths, size_cost, min_parts)
+    return _PARTITION_TABLES[cross_ft]
+
+
+def _wall_evidence(green_crop, axis):
+    """Per-position wall evidence (0-1) along a unit's width (axis=1) or height.
+
+    A wall crosses the whole unit, so a line of the raw green mask that is
+    almost entirely non-green is evidence of one; ID text only blanks part
+    of a line.
     """
-    final = []
-    split_count = 0
+    cover = 1 - (green_crop > 0).mean(axis=0 if axis == 1 else 1)
+    return np.clip((cover - WALL_MIN_COVER) / (1 - WALL_MIN_COVER), 0, 1).astype(np.float32)
 
-    for unit in units:
-        w, h = unit["w"], unit["h"]
 
-        if _is_valid_size(w, h):
-            final.append(unit)
-            continue
+def _partition(length, cross_px, evidence):
+    """Cheapest division of `length` pixels into parts of valid sizes.
 
-        # Try splitting along the longer axis into 2 parts
-        splits = _try_split(unit, 2)
-        if splits:
-            final.extend(splits)
-            split_count += 1
-            continue
+    Parts may only meet within PARTITION_WALL_TOLERANCE pixels of a wall
+    with evidence >= MIN_CUT_EVIDENCE. Cost per part: its size_cost, plus
+    PARTITION_CUT_WEIGHT x how far the wall it ends at falls short of
+    certain, plus PARTITION_SKIP_WEIGHT x the strongest wall it spans.
+    Returns (cost, part lengths), or None if the length can't be divided
+    into at most MAX_PARTS valid parts at walls.
+    """
+    if length > MAX_PARTITION_LENGTH:
+        return None
+    lengths, size_cost, min_parts = _partition_table(_px_to_ft(cross_px))
+    if not min_parts[length]:
+        return None
 
-        # Try splitting into 3 parts
-        splits = _try_split(unit, 3)
-        if splits:
-            final.extend(splits)
-            split_count += 1
-            continue
+    size = 2 * PARTITION_WALL_TOLERANCE + 1
+    near = cv2.dilate(evidence[None, :], np.ones((1, size), np.uint8))[0]
+    walls = np.flatnonzero(near[:length] >= MIN_CUT_EVIDENCE)
+    # Only cuts from which both sides can still be partitioned
+    walls = walls[(min_parts[walls] > 0) & (min_parts[length - walls] > 0)]
+    if not len(walls):
+        return None
 
-        # Can't split — keep original (might be an unusual but real unit)
-        final.append(unit)
+    part_cost = np.full(length + 1, np.inf)
+    fits = lengths <= length
+    part_cost[lengths[fits]] = size_cost[fits]
+    cut_cost = PARTITION_CUT_WEIGHT * (1 - near)
+
+    # DP over cut points and part counts: cost[k, j] = cheapest partition
+    # of [0, points[j]) into exactly k parts
+    points = np.concatenate([[0], walls, [length]])
+    cost = np.full((MAX_PARTS + 1, len(points)), np.inf)
+    back = np.zeros((MAX_PARTS + 1, len(points)), dtype=np.int64)
+    cost[0, 0] = 0
+    tol = PARTITION_WALL_TOLERANCE
+    for j in range(1, len(points)):
+        end = points[j]
+        starts = points[:j]
+        # Strongest wall inside each candidate part, clear of its ends
+        inner_end = max(end - tol, 0)
+        suffix_max = np.maximum.accumulate(evidence[:inner_end][::-1])[::-1]
+        inner_start = starts + tol + 1
+        inside = np.zeros(j, dtype=np.float32)
+        has_inside = inner_start < inner_end
+        inside[has_inside] = suffix_max[inner_start[has_inside]]
+        last = (part_cost[end - starts] + PARTITION_SKIP_WEIGHT * inside +
+                (cut_cost[end] if end < length else 0))
+        # Row k: the last part after a (k-1)-part partition of [0, start)
+        total = cost[:-1, :j] + last
+        back[1:, j] = np.argmin(total, axis=1)
+        cost[1:, j] = total[np.arange(MAX_PARTS), back[1:, j]]
+
+    k = int(np.argmin(cost[:, -1]))
+    best = float(cost[k, -1])
+    if not np.isfinite(best):
+        return None
+    parts = []
+    j = len(points) - 1
+    while k > 0:
+        parts.append(int(points[j] - points[back[k, j]]))
+        j = back[k, j]
+        k -= 1
+    return best, parts[::-1]
 
-    if split_count:
-        print(f"  Split {split_count} oversized contours into valid units")
 
-    return final
+def split_oversized_units(units, green_mask):
+    """Split detected units whose dimensions don't match any valid size.
 
+    Each invalid unit is partitioned along its width or height into a run
+    of valid sizes (e.g. a 10x25 into 10x10 + 10x15, or 5x5s mixed with
+    5x10s), whichever axis gives the cheaper partition: parts close to
+    nominal sizes, cut only at walls visible in the raw green mask (see
+    _partition). Units with no such partition are kept as they are (most
+    are real units of a size missing from VALID_SIZES_FT, e.g. 15x15).
+    """
+    pending = np.flatnonzero(~_valid_size_mask(units["w"], units["h"]))
+    replacements = {}
+
+    for i in pending.tolist():
+        x, y, w, h = (int(units[key][i]) for key in ("x", "y", "w", "h"))
+        green_crop = green_mask[y:y+h, x:x+w]
+        best = None
+        for axis, length, cross in ((1, w, h), (0, h, w)):
+            result = _partition(length, cross, _wall_evidence(green_crop, axis))
+            if result and (best is None or result[0] < best[1][0]):
+                best = (axis, result)
+        if best is None:
+            continue
 
-def _try_split(unit, n_parts):
-    """Try splitting a unit into n_parts along its longer axis."""
-    x, y, w, h = unit["x"], unit["y"], unit["w"], unit["h"]
+        axis, (_, parts) = best
+        offsets = np.concatenate([[0], np.cumsum(parts)[:-1]])
+        n = len(parts)
+        if axis == 1:
+            xs, ys, ws, hs = x + offsets, [y] * n, parts, [h] * n
+        else:
+            xs, ys, ws, hs = [x] * n, y + offsets, [w] * n, parts
+        replacements[i] = unit_table.children(np.repeat(units[i:i+1], n),
+                                              xs, ys, ws, hs, unit_table.STAGE_PARTITION)
 
-    # Split along the longer dimension
-    if w >= h:
-        # Split horizontally (along width)
-        part_w = w // n_parts
-        remainder = w - part_w * n_parts
-        parts = []
-        cx = x
-        for i in range(n_parts):
-            pw = part_w + (1 if i < remainder else 0)
-            parts.append({"x": cx, "y": y, "w": pw, "h": h,
-                          "area": pw * h, "contour": None})
-            cx += pw
-    else:
-        # Split vertically (along height)
-        part_h = h // n_parts
-        remainder = h - part_h * n_parts
-        parts = []
-        cy = y
-        for i in range(n_parts):
-            ph = part_h + (1 if i < remainder else 0)
-            parts.append({"x": x, "y": cy, "w": w, "h": ph,
-                          "area": w * ph, "contour": None})
-            cy += ph
-
-    # Check if ALL resulting parts are valid sizes
-    if all(_is_valid_size(p["w"], p["h"]) for p in parts):
-        return parts
+    if replacements:
+        total = sum(len(parts) for parts in replacements.values())
+        print(f"  Split {len(replacements)} oversized contours into {total} valid units")
 
-    return None
+    return unit_table.split_rows(units, replacements)
 
 
 def normalize_coordinates(units, features, img_width, img_height, target_width=None):
@@ -863,6 +1244,9 @@ def normalize_coordinates(units, features, img_width, img_height, target_width=N
     Normalize all coordinates to a consistent coordinate space.
     If target_width is given, scale all coordinates proportionally.
     Otherwise, use image pixel coordinates directly.
+
+    The unit table is rescaled in one vectorized step into a new table;
+    feature dicts are scaled in place.
     """
     if target_width is None:
         return units, features, img_width, img_height
@@ -870,11 +1254,7 @@ def normalize_coordinates(units, features, img_width, img_height, target_width=N
     scale = target_width / img_width
     target_height = int(img_height * scale)
 
-    for u in units:
-        u["x"] = round(u["x"] * scale)
-        u["y"] = round(u["y"] * scale)
-        u["w"] = round(u["w"] * scale)
-        u["h"] = round(u["h"] * scale)
+    units = unit_table.rescale(units, scale)
 
     for f in features:
         f["x"] = round(f["x"] * scale)
@@ -885,13 +1265,26 @@ def normalize_coordinates(units, features, img_width, img_height, target_width=N
     return units, features, target_width, target_height
 
 
-def generate_debug_image(img, units, features, output_path):
-    """Draw detected units and features on a copy of the original image."""
+def generate_debug_image(img, units, features, output_path=None, contours=None, boxes=True):
+    """Draw detected units and features on a copy of the original image.
+
+    If contours are given (see unit_contours), the raw green outlines found
+    by detection are drawn underneath the final unit rectangles. With
+    boxes=False only the contours are drawn (the deep-zoom viewer draws
+    units and features itself). Returns the image; it's also written to
+    output_path when one is given.
+    """
     debug = img.copy()
 
-    for u in units:
-        x, y, w, h = u["x"], u["y"], u["w"], u["h"]
-        uid = u.get("id", "?")
+    if contours:
+        cv2.drawContours(debug, contours, -1, (0, 160, 0), 2)
+
+    if not boxes:
+        units, features = units[:0], []
+
+    for uid, x, y, w, h in zip(units["id"].tolist(), units["x"].tolist(),
+                               units["y"].tolist(), units["w"].tolist(),
+                               units["h"].tolist()):
 
         # Draw rectangle
         cv2.rectangle(debug, (x, y), (x + w, y + h), (0, 0, 255), 3)
@@ -917,120 +1310,1109 @@ def generate_debug_image(img, units, features, output_path):
         cv2.rectangle(debug, (x, y), (x + w, y + h), color, 4)
         cv2.putText(debug, ftype, (x + 5, y + 25), cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
 
-    cv2.imwrite(str(output_path), debug)
-    print(f"Debug image saved to: {output_path}")
+    if output_path is not None:
+        cv2.imwrite(str(output_path), debug)
+        print(f"Debug image saved to: {output_path}")
+    return debug
 
 
-def main():
-    parser = argparse.ArgumentParser(description="Extract floor plan data from site map PNG")
-    parser.add_argument("input", help="Path to the site map PNG file")
-    parser.add_argument("--output", "-o", required=True, help="Output JSON file path")
-    parser.add_argument("--debug", action="store_true", help="Generate debug overlay image")
-    parser.add_argument("--target-width", type=int, default=None,
-                        help="Scale coordinates to this target width (e.g., 1200 for the web map)")
-    parser.add_argument("--floor-name", default="Ground Floor", help="Name for this floor")
-    parser.add_argument("--floor-id", default="floor-1", help="ID for this floor")
-    parser.add_argument("--expected-range", default=None,
-                        help="Expected unit ID range (e.g., '400-589'). "
-                             "Used to fix systematic OCR misreads like 5→9.")
-    args = parser.parse_args()
+# ---------------------------------------------------------------------------
+# Dirty-region re-extraction (--previous / --previous-json): diff a revised
+# site map against the previous one and only re-detect/re-OCR what changed
+# ---------------------------------------------------------------------------
+DIRTY_TILE = 256         # tile size in pixels
+DIRTY_THRESHOLD = 24     # per-channel difference that counts as changed
+DIRTY_MIN_PIXELS = 16    # changed pixels that make a tile dirty
+DIRTY_MARGIN = 24        # background padding around each re-detected region
 
-    input_path = Path(args.input)
-    if not input_path.exists():
-        print(f"Error: Input file not found: {input_path}")
-        sys.exit(1)
 
-    print(f"Loading image: {input_path}")
-    img = cv2.imread(str(input_path))
-    if img is None:
-        print(f"Error: Could not read image: {input_path}")
-        sys.exit(1)
+def dirty_regions(img, prev_img):
+    """Tiles that differ between two same-sized images.
 
+    Returns (dirty, regions): a boolean grid of dirty DIRTY_TILE tiles
+    (grown by one tile so units at a tile edge get context) and the pixel
+    bounding boxes (x, y, w, h) of its connected groups.
+    """
+    img_h, img_w = img.shape[:2]
+    changed = (cv2.absdiff(img, prev_img).max(axis=2) > DIRTY_THRESHOLD).astype(np.uint8)
+
+    rows, cols = -(-img_h // DIRTY_TILE), -(-img_w // DIRTY_TILE)
+    padded = np.zeros((rows * DIRTY_TILE, cols * DIRTY_TILE), dtype=np.int32)
+    padded[:img_h, :img_w] = changed
+    counts = padded.reshape(rows, DIRTY_TILE, cols, DIRTY_TILE).sum(axis=(1, 3))
+    dirty = (counts >= DIRTY_MIN_PIXELS).astype(np.uint8)
+    dirty = cv2.dilate(dirty, np.ones((3, 3), dtype=np.uint8))
+
+    _, _, stats, _ = cv2.connectedComponentsWithStats(dirty, connectivity=8)
+    regions = []
+    for tx, ty, tw, th, _ in stats[1:].tolist():
+        x, y = tx * DIRTY_TILE, ty * DIRTY_TILE
+        regions.append((x, y, min(img_w, (tx + tw) * DIRTY_TILE) - x,
+                        min(img_h, (ty + th) * DIRTY_TILE) - y))
+    return dirty.astype(bool), regions
+
+
+def _touches_tiles(units, dirty):
+    """Mask of units whose box overlaps at least one dirty tile."""
+    table = np.pad(dirty.astype(np.int32), ((1, 0), (1, 0))).cumsum(0).cumsum(1)
+    rows, cols = dirty.shape
+    tx0 = np.clip(units["x"] // DIRTY_TILE, 0, cols - 1)
+    ty0 = np.clip(units["y"] // DIRTY_TILE, 0, rows - 1)
+    tx1 = np.clip((units["x"] + units["w"] - 1) // DIRTY_TILE, 0, cols - 1) + 1
+    ty1 = np.clip((units["y"] + units["h"] - 1) // DIRTY_TILE, 0, rows - 1) + 1
+    return (table[ty1, tx1] - table[ty0, tx1] - table[ty1, tx0] + table[ty0, tx0]) > 0
+
+
+def load_previous_units(json_path, keep_provenance=False):
+    """Unit table from a previous floor JSON, in source-image pixels.
+
+    JSON written with --target-width is scaled back to source pixels
+    (rounded, so boxes can shift by a pixel). Units are marked as carried
+    over (STAGE_PREVIOUS) unless keep_provenance, which restores their
+    stage and ID source from "src" (--reocr).
+    """
+    with open(json_path) as f:
+        data = json.load(f)
+    floor, records = data["floor"], data["units"]
+    units = unit_table.from_boxes([u["x"] for u in records], [u["y"] for u in records],
+                                  [u["w"] for u in records], [u["h"] for u in records],
+                                  stage=unit_table.STAGE_PREVIOUS)
+    units["id"] = [u["id"] for u in records]
+    units["id_ocr"] = [u.get("id_original_ocr", "") for u in records]
+    # Older floor JSONs carry no confidence; their IDs were accepted as is
+    units["confidence"] = [u.get("conf", 1.0) for u in records]
+    units["id_source"] = np.where(units["id"] != "", unit_table.ID_PREVIOUS, unit_table.ID_NONE)
+    if keep_provenance:
+        for i, u in enumerate(records):
+            if "src" in u:
+                stage, pass_, source, _ = unit_table.parse_provenance(u["src"])
+                units["source_stage"][i] = stage
+                units["pass"][i] = pass_
+                units["id_source"][i] = source
+    source_w = floor.get("sourceImageWidth", floor["width"])
+    if source_w != floor["width"]:
+        units = unit_table.rescale(units, source_w / floor["width"])
+    return units, (source_w, floor.get("sourceImageHeight", floor["height"]))
+
+
+def detect_units_incremental(planes, prev_img, previous, pyramid_levels=0):
+    """Detect units in a revised image, reusing the previous extraction.
+
+    Previous units that touch no dirty tile are carried over verbatim (box,
+    ID and raw OCR read). Detection re-runs only inside the dirty regions,
+    each grown to contain the previous units it replaces, and keeps the new
+    units that touch a dirty tile. Carried units keep their IDs, so the OCR
+    stage only reads the new ones.
+
+    Returns (units, green_mask) like detect_units.
+    """
+    img = planes["img"]
     img_h, img_w = img.shape[:2]
-    print(f"Image dimensions: {img_w} x {img_h}")
+    dirty, regions = dirty_regions(img, prev_img)
+    stale = _touches_tiles(previous, dirty)
+    carried = previous[~stale]
+    print(f"Dirty tiles: {int(dirty.sum())}/{dirty.size} in {len(regions)} regions; "
+          f"carrying over {len(carried)} of {len(previous)} previous units")
+
+    if not regions:
+        return carried, np.zeros((img_h, img_w), dtype=np.uint8)
+
+    grown = []
+    for rx, ry, rw, rh in regions:
+        old = previous[stale & (previous["x"] < rx + rw) & (previous["x"] + previous["w"] > rx) &
+                       (previous["y"] < ry + rh) & (previous["y"] + previous["h"] > ry)]
+        x1 = min([rx] + old["x"].tolist()) - DIRTY_MARGIN
+        y1 = min([ry] + old["y"].tolist()) - DIRTY_MARGIN
+        x2 = max([rx + rw] + (old["x"] + old["w"]).tolist()) + DIRTY_MARGIN
+        y2 = max([ry + rh] + (old["y"] + old["h"]).tolist()) + DIRTY_MARGIN
+        x1, y1, x2, y2 = max(0, x1), max(0, y1), min(img_w, x2), min(img_h, y2)
+        grown.append((x1, y1, x2 - x1, y2 - y1))
+
+    fresh, green_mask = detect_units(planes, pyramid_levels, regions=grown, existing=carried)
+    fresh = fresh[_touches_tiles(fresh, dirty)]
+    print(f"  {len(fresh)} units re-detected in dirty regions")
+    return unit_table.append(carried, fresh), green_mask
+
+
+def change_report(previous, units):
+    """Compare a previous unit table with the new one.
+
+    Units are matched by ID (and by identical box when they have none).
+    Returns {"summary": counts, "added": [...], "removed": [...],
+    "moved": [{"id", "from", "to"}]} with boxes in source pixels.
+    """
+    def box(row):
+        return {"x": int(row["x"]), "y": int(row["y"]), "w": int(row["w"]), "h": int(row["h"])}
+
+    def key(row):
+        return row["id"] or (int(row["x"]), int(row["y"]), int(row["w"]), int(row["h"]))
+
+    # Exact matches (same ID and box) first, so repeated IDs pair up by box
+    old_exact = {}
+    for row in previous:
+        old_exact.setdefault((key(row), tuple(box(row).values())), []).append(row)
+    unmatched = []
+    unchanged = 0
+    for row in units:
+        matches = old_exact.get((key(row), tuple(box(row).values())))
+        if matches:
+            matches.pop()
+            unchanged += 1
+        else:
+            unmatched.append(row)
+
+    old_by_key = {}
+    for rows in old_exact.values():
+        for row in rows:
+            old_by_key.setdefault(key(row), []).append(row)
+
+    added, moved = [], []
+    for row in unmatched:
+        matches = old_by_key.get(key(row))
+        if matches:
+            moved.append({"id": str(row["id"]), "from": box(matches.pop(0)), "to": box(row)})
+        else:
+            added.append({"id": str(row["id"]), **box(row)})
+    removed = [{"id": str(row["id"]), **box(row)} for rows in old_by_key.values() for row in rows]
+
+    return {
+        "summary": {"added": len(added), "removed": len(removed),
+                    "moved": len(moved), "unchanged": unchanged},
+        "added": added,
+        "removed": removed,
+        "moved": moved,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Extraction session — keeps decoded planes, stage results and OCR reads warm
+# between runs (used by one-shot runs, --watch and --serve)
+# ---------------------------------------------------------------------------
+DEFAULT_OPTIONS = {
+    "input": None,
+    "output": None,
+    "debug": False,
+    "debug_tiles": False,
+    "target_width": None,
+    "floor_name": "Ground Floor",
+    "floor_id": "floor-1",
+    "expected_range": None,
+    "pyramid": 0,
+    "ocr_backend": "auto",
+    "ocr_tier": "tesseract",
+    "pdf_page": 1,
+    "pdf_dpi": 288,
+    "previous": None,
+    "previous_json": None,
+    "plane_cache": None,
+    "colors": "default",
+    "stages": "geometry,ocr,features",
+    "save_state": None,
+    "resume": None,
+    "overrides": None,
+    "reocr": None,
+}
+
+# Selectable with --stages. Geometry (unit rectangles) always runs or is
+# resumed from a state file, since the other stages work on its units;
+# "ocr" includes the expected-range correction.
+STAGES = ("geometry", "ocr", "features")
+
+# Which cached stage results each option invalidates. Options not listed
+# here (output path, floor name/id, target width, debug, overrides) only
+# affect the output step, which always runs; --reocr replaces every stage
+# with the existing output (ExtractionSession._reocr), for that run only: it
+# is never carried into the next run's options. pdf_page/pdf_dpi select a different
+# source image, and colors the HSV bounds, which both invalidate everything.
+# plane_cache only changes where the same planes are loaded from.
+OPTION_STAGES = {
+    "pyramid": ("detect", "fix"),
+    "expected_range": ("fix",),
+    "ocr_backend": ("ocr", "features", "fix"),
+    "ocr_tier": ("ocr", "fix"),
+    "previous": ("detect",),
+    "previous_json": ("detect",),
+    "stages": ("fix",),
+}
+
+
+def parse_stages(stages):
+    """Stage names from "geometry,ocr" or a list (JSON-RPC); ValueError if unknown."""
+    if isinstance(stages, str):
+        stages = [name.strip() for name in stages.split(",") if name.strip()]
+    unknown = sorted(set(stages) - set(STAGES))
+    if unknown:
+        raise ValueError(f"Unknown stages {unknown} (choose from: {', '.join(STAGES)})")
+    return set(stages) | {"geometry"}
+
+
+# ---------------------------------------------------------------------------
+# Intermediate state (--save-state / --resume): stage results saved as .npz,
+# so later stages can run without redoing geometry
+# ---------------------------------------------------------------------------
+
+def save_state(path, results, source, options):
+    """Save the detect/ocr/features results of a run to an .npz file.
+
+    `source` identifies the image the results belong to (see
+    _state_source); the options that affect each stage are saved too, so
+    a resume only reuses stages whose options still match.
+    """
+    meta = {
+        "source": source,
+        "options": {key: options[key] for key in OPTION_STAGES if key != "stages"},
+        "features": results.get("features"),
+    }
+    arrays = {"detect": results["detect"][0], "meta": np.array(json.dumps(meta))}
+    if "ocr" in results:
+        arrays["ocr"] = results["ocr"]
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # np.savez adds .npz to any other suffix; write through a file object
+    with open(path, "wb") as f:
+        np.savez(f, **arrays)
+    print(f"State saved to: {path} (stages: {', '.join(_state_stages(results))})")
+
+
+def load_state(path, source, options):
+    """Stage results from a save_state() file, for the current image and options.
+
+    Returns a dict with "detect" and whichever of "ocr"/"features" were
+    saved with matching options. Raises ValueError if the state belongs to
+    a different image (or color model) or different detection options.
+    """
+    try:
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            arrays = {key: data[key] for key in ("detect", "ocr") if key in data.files}
+    except (OSError, KeyError, ValueError) as e:
+        raise ValueError(f"Could not read state file {path}: {e}")
+    if meta["source"] != source:
+        raise ValueError(f"State file {path} was saved for a different image or color model")
+    if any(table.dtype != unit_table.UNIT_DTYPE for table in arrays.values()):
+        raise ValueError(f"State file {path} has an older unit table layout; save it again")
+
+    changed = {key for key, value in meta["options"].items() if options[key] != value}
+    stale = {stage for key in changed for stage in OPTION_STAGES[key]}
+    if "detect" in stale:
+        raise ValueError(f"State file {path} was saved with different detection options "
+                         f"({', '.join(sorted(changed))})")
+
+    results = {"detect": (arrays["detect"], None)}
+    if "ocr" in arrays and "ocr" not in stale:
+        results["ocr"] = arrays["ocr"]
+    if meta["features"] is not None and "features" not in stale:
+        results["features"] = meta["features"]
+    return results
+
+
+def _state_stages(results):
+    names = {"detect": "geometry", "ocr": "ocr", "features": "features"}
+    return [name for key, name in names.items() if key in results]
+
+
+class ExtractionSession:
+    """State shared across extraction runs of the same process.
+
+    Holds the decoded image planes for the current input, the results of
+    each pipeline stage, and an OCR cache keyed by unit box + crop content.
+    A run only repeats the stages whose inputs changed: a new or modified
+    image invalidates everything (though unchanged unit crops still hit the
+    OCR cache), a new --pyramid level re-runs detection, and a new
+    --expected-range only re-runs OCR correction (plus the glyph tier, whose
+    Tesseract reads stay cached).
+    """
+
+    def __init__(self):
+        self.source = None
+        self.planes = None
+        self.options = dict(DEFAULT_OPTIONS)
+        self.results = {}
+        self.ocr_cache = {}
+        self.ocr = None
+        self.vector = None
+        self.overrides_key = None
+
+    def run(self, options):
+        """Run the pipeline for `options`, reusing whatever is still valid.
+
+        Returns a summary dict: output path, stats and the stages re-run.
+        Raises FileNotFoundError / ValueError for unreadable inputs.
+        """
+        options = {**DEFAULT_OPTIONS, **options}
+        if not options["input"] or not options["output"]:
+            raise ValueError("Both input and output are required")
+        selected = parse_stages(options["stages"])
+        if bool(options["previous"]) != bool(options["previous_json"]):
+            raise ValueError("previous and previous_json must be given together")
+
+        input_path = Path(options["input"])
+        source = _source_key(input_path)
+        if source is None:
+            raise FileNotFoundError(f"Input file not found: {input_path}")
+        if _is_pdf(input_path):
+            source += (options["pdf_page"], options["pdf_dpi"])
+        # A different color model changes every mask, like a new image
+        source += (options["colors"],)
+
+        if source != self.source:
+            if _is_pdf(input_path):
+                self._load_pdf(input_path, options)
+            else:
+                self._load(input_path, options)
+                self.vector = None
+            self.source = source
+            self.results.clear()
+
+        for key, stages in OPTION_STAGES.items():
+            if options[key] != self.options[key]:
+                for stage in stages:
+                    self.results.pop(stage, None)
+        # The glyph tier learns from range-corrected reads
+        if options["ocr_tier"] == "glyph" and options["expected_range"] != self.options["expected_range"]:
+            self.results.pop("ocr", None)
+        # Editing the overrides file only re-runs the (cheap) correction step
+        path = overrides_path(options)
+        overrides_key = _source_key(path) if path is not None else None
+        if overrides_key != self.overrides_key:
+            self.results.pop("fix", None)
+            self.overrides_key = overrides_key
+        if self.ocr is not None and options["ocr_backend"] != self.options["ocr_backend"]:
+            self.ocr.close()
+            self.ocr = None
+        # --reocr applies to this run only
+        self.options = {**options, "reocr": None}
+
+        rerun = []
+        if options["reocr"]:
+            self._reocr(options)
+            rerun.append("reocr")
+
+        if "detect" not in self.results and options["resume"]:
+            self.results.pop("fix", None)
+            self.results.pop("previous", None)
+            self.results.update(load_state(options["resume"], _state_source(input_path, options),
+                                           options))
+            print(f"Resumed from {options['resume']} "
+                  f"(stages: {', '.join(_state_stages(self.results))})")
+
+        if "detect" not in self.results:
+            self.results.pop("ocr", None)
+            self.results.pop("fix", None)
+            self.results.pop("previous", None)
+            previous = self._load_previous(options) if self.vector is None else None
+            if self.vector is not None:
+                self.results["detect"] = (self.vector[0], None)
+            elif previous is not None:
+                prev_img, self.results["previous"] = previous
+                self.results["detect"] = detect_units_incremental(
+                    self.planes, prev_img, self.results["previous"], options["pyramid"])
+            else:
+                self.results["detect"] = detect_units(self.planes, options["pyramid"])
+            rerun.append("detect")
+
+        if "ocr" in selected and "ocr" not in self.results:
+            units, _ = self.results["detect"]
+            if self.vector is not None:
+                # IDs came from the PDF's text runs
+                self.results["ocr"] = units
+            else:
+                self.results["ocr"] = read_unit_ids(self.planes, units, self._ocr_backend(),
+                                                    self.ocr_cache, options["ocr_tier"],
+                                                    options["expected_range"])
+            rerun.append("ocr")
+
+        if "features" in selected and "features" not in self.results:
+            print("Detecting site features...")
+            if self.vector is not None:
+                features = self.vector[1]
+            else:
+                features = self._detect_features(input_path, options)
+            print(f"  Found {len(features)} site features: {[f['type'] for f in features]}")
+            self.results["features"] = features
+            rerun.append("features")
+
+        if "fix" not in self.results:
+            # Without the OCR stage, units are written without IDs
+            units = (self.results["ocr"] if "ocr" in selected else self.results["detect"][0]).copy()
+            img_w = self.planes["img"].shape[1]
+            self.results["fix"], self.results["overrides"] = correct_units(
+                units, img_w, options, ocr="ocr" in selected)
+            rerun.append("fix")
+
+        output = write_output(self.planes, self.results, options)
+        if options["save_state"]:
+            save_state(options["save_state"], self.results, _state_source(input_path, options),
+                       options)
+        summary = {
+            "output": str(options["output"]),
+            "stats": output["stats"],
+            "rerun": rerun,
+        }
+
+        if self.results.get("previous") is not None:
+            report = change_report(self.results["previous"], self.results["fix"])
+            report_path = Path(options["output"]).with_suffix(".changes.json")
+            with open(report_path, "w") as f:
+                json.dump(report, f, indent=2)
+            counts = report["summary"]
+            print(f"Change report saved to: {report_path}")
+            print(f"  Added {counts['added']}, removed {counts['removed']}, "
+                  f"moved {counts['moved']}, unchanged {counts['unchanged']}")
+            summary["changes"] = counts
+
+        return summary
+
+    def _reocr(self, options):
+        """Re-read only the units inside the --reocr region.
+
+        Starts from the floor JSON at the output path (the last extraction,
+        overrides included) instead of detecting again: units outside the
+        region keep their boxes, IDs and provenance, and those inside are
+        OCR'd again from the current planes (memory-mapped with
+        --plane-cache) and range-corrected with every other ID held fixed.
+        The overrides file is applied again, as in a full run.
+        """
+        output_path = Path(options["output"])
+        if not output_path.exists():
+            raise FileNotFoundError(f"--reocr updates an existing extraction: {output_path} not found")
+        rx, ry, rw, rh = parse_region(options["reocr"])
+        units, source_size = load_previous_units(output_path, keep_provenance=True)
+        img_h, img_w = self.planes["img"].shape[:2]
+        if source_size != (img_w, img_h):
+            raise ValueError(f"{output_path} was extracted from a {source_size[0]}x{source_size[1]} "
+                             f"image, not this {img_w}x{img_h} one")
+
+        # IDs set by hand are never re-read
+        inside = ((units["x"] < rx + rw) & (units["x"] + units["w"] > rx) &
+                  (units["y"] < ry + rh) & (units["y"] + units["h"] > ry) &
+                  (units["id_source"] != unit_table.ID_MANUAL))
+        region = units[inside]
+        region["id"] = ""
+        region["id_ocr"] = ""
+        region["confidence"] = 0
+        region["id_source"] = unit_table.ID_NONE
+        print(f"Re-reading {len(region)} units in region {rx},{ry} {rw}x{rh}...")
+        units[inside] = read_unit_ids(self.planes, region, self._ocr_backend(), self.ocr_cache,
+                                      options["ocr_tier"], options["expected_range"])
+        fixed, plan = correct_units(units.copy(), img_w, options, fixed=~inside)
+
+        with open(output_path) as f:
+            data = json.load(f)
+        scale = img_w / data["floor"]["width"]
+        features = [{**f, **{k: round(f[k] * scale) for k in ("x", "y", "w", "h")}}
+                    for f in data["siteFeatures"]]
+        self.results = {"detect": (units, None), "ocr": units, "features": features,
+                        "fix": fixed, "overrides": plan}
+
+    def _load_previous(self, options):
+        """(previous image, previous unit table) for --previous, or None.
+
+        Returns None (full extraction) when no previous extraction is given
+        or its image size differs from the current image.
+        """
+        if not options["previous"]:
+            return None
+        if options["plane_cache"]:
+            prev_img = plane_cache.load_planes(options["previous"], options["plane_cache"],
+                                               keys=("img",))["img"]
+        else:
+            prev_img = cv2.imread(str(options["previous"]))
+        if prev_img is None:
+            raise ValueError(f"Could not read previous image: {options['previous']}")
+        previous, (source_w, source_h) = load_previous_units(options["previous_json"])
+        img_h, img_w = self.planes["img"].shape[:2]
+        if prev_img.shape[:2] != (img_h, img_w) or (source_w, source_h) != (img_w, img_h):
+            print("  Warning: previous image/JSON size differs from the input, "
+                  "running a full extraction")
+            return None
+        return prev_img, previous
+
+    def _ocr_backend(self):
+        """The OCR backend for the current options, created on first use."""
+        if self.ocr is None:
+            self.ocr = ocr_backends.get_backend(self.options["ocr_backend"])
+            print(f"OCR backend: {self.ocr.name}")
+        return self.ocr
+
+    def _load_pdf(self, input_path, options):
+        """Read a PDF page: vector units/features if it has them, and its raster.
+
+        The page is always rendered (debug overlays draw on it, and --colors
+        auto fits on it); when it has no vector unit rectangles, the raster
+        pipeline runs on the render.
+        """
+        page_number, dpi = options["pdf_page"], options["pdf_dpi"]
+        print(f"Loading PDF: {input_path} (page {page_number}, {dpi} dpi)")
+        try:
+            pdf = pdf_vector.PdfPage(input_path, page_number, dpi)
+        except ImportError:
+            raise ValueError("PDF input requires PyMuPDF (pip install pymupdf)")
+        try:
+            img = pdf.render()
+            planes = plane_cache.convert(img)
+            self._apply_colors(planes["hsv"], input_path, options)
+            units, features = read_vector_page(pdf, planes["gray"])
+        finally:
+            pdf.close()
+
+        img_h, img_w = img.shape[:2]
+        print(f"Page dimensions: {img_w} x {img_h}")
+        if units is None:
+            print("  No vector unit rectangles on this page, falling back to raster extraction")
+            self.vector = None
+        else:
+            print(f"  Read {len(units)} vector units "
+                  f"({np.count_nonzero(units['id'])} with IDs), {len(features)} site features")
+            self.vector = (units, features)
+        planes.update(plane_cache.convert(img, _mask_thresholds(), keys=(), hsv=planes["hsv"]))
+        self.planes = planes
+
+    def _detect_features(self, input_path, options):
+        """Site features, reused from the plane cache when it has them.
+
+        Features depend on the image, the color masks and the OCR backend
+        (for the office label), so that's what the cached result is keyed by.
+        """
+        # PDF renders aren't plane-cached (the key would need page and dpi)
+        cache_dir = None if _is_pdf(input_path) else options["plane_cache"]
+        name = f"features-{options['ocr_backend']}"
+        if cache_dir:
+            features = plane_cache.load_result(input_path, cache_dir, name, _mask_thresholds())
+            if features is not None:
+                print(f"  Reusing site features from cache {cache_dir}")
+                return features
+
+        features = detect_site_features(self.planes["img"], self.planes["hsv"],
+                                        self._ocr_backend(), self.planes)
+        if cache_dir:
+            plane_cache.save_result(input_path, cache_dir, name, _mask_thresholds(), features)
+        return features
+
+    def _load(self, input_path, options):
+        print(f"Loading image: {input_path}")
+        cache_dir = options["plane_cache"]
+        if cache_dir:
+            start = time.perf_counter()
+            planes = plane_cache.load_planes(input_path, cache_dir)
+            print(f"  Planes mapped from cache {cache_dir} in "
+                  f"{(time.perf_counter() - start) * 1000:.0f} ms")
+        else:
+            img = cv2.imread(str(input_path))
+            if img is None:
+                raise ValueError(f"Could not read image: {input_path}")
+            planes = plane_cache.convert(img)
+
+        img_h, img_w = planes["img"].shape[:2]
+        print(f"Image dimensions: {img_w} x {img_h}")
+
+        # Color masks depend on the (possibly fitted) HSV bounds
+        self._apply_colors(planes["hsv"], input_path, options)
+        if cache_dir:
+            planes.update(plane_cache.load_planes(input_path, cache_dir, _mask_thresholds(), keys=()))
+        else:
+            planes.update(plane_cache.convert(planes["img"], _mask_thresholds(), keys=(),
+                                              hsv=planes["hsv"]))
+        self.planes = planes
+
+    def _apply_colors(self, hsv, input_path, options):
+        """Set the HSV bounds for --colors: defaults, a saved model, or a fit.
+
+        With "auto", the model is fitted to this image and saved next to the
+        output JSON; later runs reuse the saved model while the image (and
+        PDF page/dpi) is unchanged.
+        """
+        colors = options["colors"]
+        if colors == "default":
+            set_color_model(None)
+            return
+
+        if colors != "auto":
+            try:
+                model, _ = color_model.load(colors)
+            except (KeyError, json.JSONDecodeError) as e:
+                raise ValueError(f"Invalid color model {colors}: {e}")
+            print(f"Color model: {colors}")
+            set_color_model(model)
+            return
+
+        model_path = Path(options["output"]).with_suffix(".colors.json")
+        source_key = _content_key(input_path, options)
+        if model_path.exists():
+            model, saved_key = color_model.load(model_path)
+            if saved_key == source_key:
+                print(f"Color model: reusing {model_path}")
+                set_color_model(model)
+                return
+
+        start = time.perf_counter()
+        model, clusters = color_model.fit(hsv, DEFAULT_COLORS)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"Fitted color model from {len(clusters)} hue clusters in {elapsed:.0f} ms:")
+        for name in COLOR_CLASSES:
+            if name in model:
+                fitted = model[name]
+                print(f"  {name:6s} H {fitted['lower'][0]}-{fitted['upper'][0]}  "
+                      f"S >= {fitted['lower'][1]}  V {fitted['lower'][2]}-{fitted['upper'][2]}")
+            else:
+                print(f"  {name:6s} not found, using default bounds")
+        color_model.save(model_path, model, source_key)
+        print(f"  Saved to: {model_path}")
+        set_color_model(model)
+
+
+def set_color_model(model):
+    """Point the HSV bound constants at a fitted model (None: the defaults).
+
+    Classes missing from `model` get their default bounds.
+    """
+    bounds = dict(DEFAULT_COLORS)
+    for name, fitted in (model or {}).items():
+        bounds[name] = (np.array(fitted["lower"]), np.array(fitted["upper"]))
+    for name, (lower, upper) in COLOR_CLASSES.items():
+        globals()[lower], globals()[upper] = bounds[name]
+
+
+def _mask_thresholds():
+    """HSV bounds of the cached color masks, read at call time."""
+    return {
+        "green": (GREEN_LOWER, GREEN_UPPER),
+        "blue": (BLUE_LOWER, BLUE_UPPER),
+        "yellow": (YELLOW_LOWER, YELLOW_UPPER),
+    }
+
+
+def _is_pdf(path):
+    return path.suffix.lower() == ".pdf"
+
+
+def _content_key(input_path, options):
+    """Hash of the input's bytes, plus the page and dpi for a PDF."""
+    key = plane_cache.source_hash(input_path)
+    if _is_pdf(input_path):
+        key += f"#page={options['pdf_page']}@{options['pdf_dpi']}dpi"
+    return key
+
+
+def _state_source(input_path, options):
+    """What a saved state's results depend on: the image and the color masks."""
+    return f"{_content_key(input_path, options)}/{plane_cache.thresholds_key(_mask_thresholds())}"
 
-    # Convert to HSV and RGB
-    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-    img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+def _source_key(path):
+    """Identify an input file's current contents by path, size and mtime."""
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (str(path.resolve()), st.st_size, st.st_mtime_ns)
+
+
+def read_vector_page(pdf, gray=None):
+    """Steps 1–3 for vector PDFs: units, IDs and site features, no OCR.
+
+    Filled rectangles from the page's drawing operators are classified by
+    fill color with the same HSV bounds as the raster path (green units,
+    blue elevator, yellow highlights). Each unit takes the digit word
+    closest to its center among the words inside it, and an "OFFICE" word
+    marks the smallest filled rectangle around it. With the page's `gray`
+    render, yellow rectangles holding a staircase icon become stairs.
+
+    Returns (units, features), or (None, []) when the page has no green
+    unit rectangles (e.g. a scanned plan) and the raster path should run.
+    """
+    rects = pdf.filled_rects()
+    if not rects:
+        return None, []
+
+    # Raster area thresholds are tuned for 4800px-wide site maps
+    area_scale = (pdf.size[0] / 4800) ** 2
+    boxes = np.array([r[:4] for r in rects])
+    areas = boxes[:, 2] * boxes[:, 3]
+    bgr = np.array([[r[4][::-1] for r in rects]], dtype=np.uint8)
+    hsv = cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV)
+    green = cv2.inRange(hsv, GREEN_LOWER, GREEN_UPPER)[0] > 0
+    blue = cv2.inRange(hsv, BLUE_LOWER, BLUE_UPPER)[0] > 0
+    yellow = cv2.inRange(hsv, YELLOW_LOWER, YELLOW_UPPER)[0] > 0
+
+    # A unit may be filled more than once (e.g. fill + hatch layer)
+    unit_boxes = np.unique(boxes[green & (areas >= MIN_UNIT_AREA * area_scale)], axis=0)
+    if not len(unit_boxes):
+        return None, []
+    units = unit_table.from_boxes(*unit_boxes.T, stage=unit_table.STAGE_VECTOR)
+    x0, y0 = units["x"], units["y"]
+    x1, y1 = x0 + units["w"], y0 + units["h"]
+    cx, cy = x0 + units["w"] / 2, y0 + units["h"] / 2
+
+    best = np.full(len(units), np.inf)
+    features = []
+    for wx, wy, ww, wh, text in pdf.words():
+        px, py = wx + ww / 2, wy + wh / 2
+        if text.isdigit():
+            inside = (x0 <= px) & (px < x1) & (y0 <= py) & (py < y1)
+            dist = np.where(inside, np.hypot(cx - px, cy - py), np.inf)
+            i = int(np.argmin(dist))
+            if dist[i] < best[i]:
+                best[i] = dist[i]
+                units["id"][i] = text
+                units["confidence"][i] = 1.0
+                units["id_source"][i] = unit_table.ID_VECTOR
+        elif text.upper() == "OFFICE":
+            around = ((boxes[:, 0] <= px) & (px < boxes[:, 0] + boxes[:, 2]) &
+                      (boxes[:, 1] <= py) & (py < boxes[:, 1] + boxes[:, 3]) & ~green)
+            x, y, w, h = (boxes[np.flatnonzero(around)[np.argmin(areas[around])]]
+                          if around.any() else (wx, wy, ww, wh))
+            features.append({"type": "office", "label": "OFFICE",
+                             "x": int(x), "y": int(y), "w": int(w), "h": int(h)})
+
+    min_feature_area = FEATURE_MIN_AREA * area_scale
+    for mask, ftype in ((blue, "elevator"), (yellow, "highlight")):
+        for x, y, w, h in boxes[mask & (areas >= min_feature_area)].tolist():
+            kind = ftype
+            if ftype == "highlight" and gray is not None and _is_stair_icon(gray[y:y+h, x:x+w]):
+                kind = "stairs"
+            features.append({"type": kind, "x": x, "y": y, "w": w, "h": h})
+
+    return units, features
+
+
+def detect_units(planes, pyramid_levels=0, regions=None, existing=None):
+    """Steps 1–1.7: detect, split and rescue unit rectangles.
+
+    With `regions`, detection only runs inside those (x, y, w, h) boxes and
+    only units rescued inside them are kept; `existing` units (e.g. carried
+    over from a previous extraction) count as covered for the rescue pass.
+
+    Returns (units, green_mask) where units is a unit table without IDs.
+    """
+    img, hsv = planes["img"], planes["hsv"]
 
     # Estimate scale factor (images are ~4x the logical coordinate space)
-    scale_factor = img_w / 1200  # assuming ~1200px logical width
+    scale_factor = img.shape[1] / 1200  # assuming ~1200px logical width
 
     # Step 1: Extract unit rectangles
     print("Detecting unit rectangles...")
-    raw_units, green_mask = extract_units(img, hsv, scale_factor)
+    raw_units, green_mask = extract_units(img, hsv, scale_factor, pyramid_levels, regions,
+                                          planes.get("gray"), planes.get("green"))
     print(f"  Found {len(raw_units)} unit contours")
 
     # Step 1.5: Split oversized/merged units
     print("Splitting oversized contours...")
-    raw_units = split_oversized_units(raw_units, img_rgb, green_mask)
+    green = planes.get("green")
+    if green is None:
+        green = cv2.inRange(hsv, GREEN_LOWER, GREEN_UPPER)
+    raw_units = split_oversized_units(raw_units, green)
     print(f"  After splitting: {len(raw_units)} units")
 
     # Step 1.6: Split units with visible internal walls
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
     print("Checking for internal walls in ambiguous units...")
-    raw_units = split_by_internal_walls(raw_units, gray, green_mask)
+    raw_units = split_by_internal_walls(raw_units, planes["gray"], green_mask)
     print(f"  After wall-splitting: {len(raw_units)} units")
 
     # Step 1.7: Rescue missed small (5x5) units
     print("Rescuing missed small units...")
-    rescued = rescue_small_units(img, hsv, raw_units)
-    if rescued:
+    covered = raw_units if existing is None else unit_table.append(existing, raw_units)
+    rescued = rescue_small_units(img, hsv, covered, planes.get("gray"), planes.get("green"))
+    if regions is not None:
+        cx = rescued["x"] + rescued["w"] // 2
+        cy = rescued["y"] + rescued["h"] // 2
+        inside = np.zeros(len(rescued), dtype=bool)
+        for rx, ry, rw, rh in regions:
+            inside |= (cx >= rx) & (cx < rx + rw) & (cy >= ry) & (cy < ry + rh)
+        rescued = rescued[inside]
+    if len(rescued):
         print(f"  Rescued {len(rescued)} additional small units")
-        raw_units.extend(rescued)
+        raw_units = unit_table.append(raw_units, rescued)
     print(f"  Total after rescue: {len(raw_units)} units")
 
-    # Step 2: OCR unit IDs
+    return raw_units, green_mask
+
+
+def read_unit_ids(planes, units, ocr, ocr_cache=None, tier="tesseract", expected_range=None):
+    """Step 2: OCR every unit's ID (and confidence) into a copy of the table.
+
+    With an ocr_cache dict, Tesseract reads are memoized by backend, box and
+    crop content, so re-running after a parameter or image change only OCRs
+    new crops. tier="glyph" reads most units with a glyph classifier trained
+    on this floor and only calls Tesseract to bootstrap it and for crops it
+    can't read confidently (see _read_ids_with_glyphs).
+
+    Units that already have an ID (carried over from a previous extraction)
+    are not read again.
+    """
+    img_rgb = planes["rgb"]
+    table = units.copy()
+    pending = np.flatnonzero(table["id"] == "")
+    units = table[pending]
+    counts = {"tesseract": 0, "cached": 0}
+
+    def tesseract(i):
+        unit = units[i]
+        key = None
+        if ocr_cache is not None:
+            x, y, w, h = int(unit["x"]), int(unit["y"]), int(unit["w"]), int(unit["h"])
+            key = (ocr.name, x, y, w, h, zlib.crc32(img_rgb[y:y+h, x:x+w].tobytes()))
+            if key in ocr_cache:
+                counts["cached"] += 1
+                return ocr_cache[key]
+        result = ocr_unit_id(img_rgb, unit, ocr)
+        counts["tesseract"] += 1
+        if key is not None:
+            ocr_cache[key] = result
+        return result
+
     print("Reading unit IDs via OCR...")
-    for i, unit in enumerate(raw_units):
-        uid = ocr_unit_id(img_rgb, unit)
-        unit["id"] = uid
-        if (i + 1) % 50 == 0:
-            print(f"  Processed {i + 1}/{len(raw_units)} units...")
-    print(f"  OCR complete. {sum(1 for u in raw_units if u['id'])} units with IDs detected")
-
-    # Step 3: Detect site features
-    print("Detecting site features...")
-    features = detect_site_features(img, hsv)
-    print(f"  Found {len(features)} site features: {[f['type'] for f in features]}")
-
-    # Step 3.5: Fix OCR errors using expected range
-    if args.expected_range:
-        print(f"Applying OCR corrections for expected range {args.expected_range}...")
-        raw_units = fix_ocr_errors(raw_units, args.expected_range)
+    if len(units) < len(table):
+        print(f"  {len(table) - len(units)} units already have IDs, reading {len(units)}")
+    if tier == "glyph":
+        _read_ids_with_glyphs(planes, units, tesseract, expected_range)
+    else:
+        for i in range(len(units)):
+            units["id"][i], units["confidence"][i], units["id_source"][i] = tesseract(i)
+            if (i + 1) % 50 == 0:
+                print(f"  Processed {i + 1}/{len(units)} units...")
+    if counts["cached"]:
+        print(f"  Reused {counts['cached']} cached OCR reads")
+    if tier == "glyph":
+        print(f"  Tesseract read {counts['tesseract']} crops "
+              f"({len(units) - counts['tesseract'] - counts['cached']} avoided)")
+    table[pending] = units
+    print(f"  OCR complete. {np.count_nonzero(table['id'])} units with IDs detected")
+
+    return table
+
+
+# Units read by Tesseract up front to train the glyph classifier, spread
+# evenly over the table
+GLYPH_BOOTSTRAP_UNITS = 40
+
+# Tesseract reads at least this confident become glyph templates
+GLYPH_MIN_TESSERACT_CONF = 0.80
+
+
+def _read_ids_with_glyphs(planes, units, tesseract, expected_range=None):
+    """Fill in unit IDs using the glyph classifier as the first OCR tier.
+
+    1. Tesseract reads GLYPH_BOOTSTRAP_UNITS evenly spaced units; confident
+       reads whose digit count matches the segmented glyphs become
+       templates. With an expected range, an out-of-range read is labeled
+       with its range correction, and the corrected digits are trusted so
+       the classifier learns e.g. which bold glyph is really a 5.
+    2. Every other unit is read by the classifier. A read is accepted when
+       every glyph clears the margin and its length matches an ID length
+       seen in step 1; otherwise the unit falls through to Tesseract, whose
+       read (if confident) is learned as well.
+
+    `tesseract(i)` returns (unit_id, confidence, id_source) for table row i.
+    """
+    gray = planes["gray"]
+    bounds = _parse_expected_range(expected_range)
+    index = id_resolver.ConfusionIndex(*bounds) if bounds else None
+    classifier = glyph_classifier.GlyphClassifier()
+    id_lengths = set()
+
+    def segment(i, padding=2):
+        # Same crop as ocr_unit_id()
+        x, y, w, h = (int(units[c][i]) for c in ("x", "y", "w", "h"))
+        y1, y2 = max(0, y + padding), min(gray.shape[0], y + h - padding)
+        x1, x2 = max(0, x + padding), min(gray.shape[1], x + w - padding)
+        return glyph_classifier.segment_digits(gray[y1:y2, x1:x2])
+
+    def learn(i, glyphs):
+        uid, conf, source = tesseract(i)
+        units["id"][i], units["confidence"][i], units["id_source"][i] = uid, conf, source
+        binary, boxes = glyphs
+        if conf < GLYPH_MIN_TESSERACT_CONF or not uid or len(boxes) != len(uid):
+            return
+        label = uid
+        if index and not index.in_range(uid):
+            label = index.best_fix(uid)
+            if not label or len(label) != len(uid):
+                return
+        trusted = [a != b for a, b in zip(label, uid)]
+        classifier.fit(glyph_classifier.glyph_vectors(binary, boxes), list(label), trusted)
+        id_lengths.add(len(label))
+
+    bootstrap = set(np.linspace(0, len(units) - 1, min(GLYPH_BOOTSTRAP_UNITS, len(units)),
+                                dtype=int).tolist())
+    for i in sorted(bootstrap):
+        learn(i, segment(i))
+    print(f"  Glyph classifier: {len(classifier)} templates from {len(bootstrap)} bootstrap reads")
+
+    glyph_reads = 0
+    for i in range(len(units)):
+        if i in bootstrap:
+            continue
+        glyphs = segment(i)
+        binary, boxes = glyphs
+        if boxes and len(boxes) in id_lengths:
+            labels, margins = classifier.classify(glyph_classifier.glyph_vectors(binary, boxes))
+            if margins.min() >= classifier.min_margin:
+                units["id"][i] = "".join(labels)
+                units["confidence"][i] = margins.min()
+                units["id_source"][i] = unit_table.ID_GLYPH
+                glyph_reads += 1
+                continue
+        learn(i, glyphs)
+    print(f"  Glyph classifier read {glyph_reads}/{len(units)} units")
 
-    # Step 4: Normalize coordinates
-    units_out = []
-    for u in raw_units:
-        entry = {
-            "id": u["id"],
-            "x": int(u["x"]),
-            "y": int(u["y"]),
-            "w": int(u["w"]),
-            "h": int(u["h"]),
-        }
-        if "id_original_ocr" in u:
-            entry["id_original_ocr"] = u["id_original_ocr"]
-        units_out.append(entry)
 
+def write_debug(img, raw_units, results, options):
+    """--debug overlay PNG plus a small copy, or with --debug-tiles a
+    deep-zoom tile set and HTML viewer in their place."""
+    input_path = Path(options["input"])
+    img_h, img_w = img.shape[:2]
+    detected, green_mask = results["detect"]
+    tiled = options["debug_tiles"]
+    debug = generate_debug_image(
+        img, raw_units, results.get("features", []),
+        None if tiled else input_path.with_suffix(".debug.png"),
+        contours=unit_contours(green_mask, detected) if green_mask is not None else None,
+        boxes=not tiled)
+
+    if tiled:
+        # Imported here: only --debug-tiles needs it
+        import deepzoom
+        name = input_path.with_suffix(".debug").name
+        start = time.perf_counter()
+        count = deepzoom.write_tiles(debug, input_path.parent, name)
+        units = [{"id": str(u["id"]), "x": int(u["x"]), "y": int(u["y"]), "w": int(u["w"]),
+                  "h": int(u["h"]), "stage": int(u["source_stage"]),
+                  "confidence": float(u["confidence"]), "id_ocr": str(u["id_ocr"]),
+                  "id_source": unit_table.ID_SOURCE_NAMES[int(u["id_source"])]}
+                 for u in raw_units]
+        viewer = deepzoom.write_viewer(input_path.parent, name, img_w, img_h, units,
+                                       results.get("features", []), unit_table.STAGE_NAMES,
+                                       title=f"{options['floor_name']} ({input_path.name})")
+        print(f"Debug tiles ({count}) saved in {time.perf_counter() - start:.1f}s to: "
+              f"{input_path.parent / (name + '_files')}")
+        print(f"Debug viewer saved to: {viewer}")
+
+    # Also a smaller version for easy viewing, scaled in memory (the viewer
+    # replaces it for tiles, which carry no unit boxes)
+    if not tiled and img_w > 2000:
+        scale = 1200 / img_w
+        small = cv2.resize(debug, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        small_path = input_path.with_suffix(".debug-small.png")
+        cv2.imwrite(str(small_path), small)
+        print(f"Debug image (small) saved to: {small_path}")
+
+
+def apply_overrides(units, path, scale, match=None):
+    """Apply an overrides file (see overrides.py) to a unit table.
+
+    Override coordinates are floor JSON coordinates; `scale` converts
+    source-image pixels to them (the --target-width scale). Entries select
+    units by their IDs in `match` (a copy of `units` with other IDs, by
+    default `units` itself). IDs set by the file get ID source ID_MANUAL
+    and full confidence, keeping the replaced read in id_ocr; reshaped and
+    added boxes get stage STAGE_MANUAL.
+
+    Returns (units, plan).
+    """
+    scaled = unit_table.rescale(units if match is None else match, scale)
+    records = [{"id": uid, "x": x, "y": y, "w": w, "h": h} for uid, x, y, w, h in zip(
+        scaled["id"].tolist(), scaled["x"].tolist(), scaled["y"].tolist(),
+        scaled["w"].tolist(), scaled["h"].tolist())]
+    plan = overrides.plan(overrides.load(path), records)
+
+    units = units.copy()
+    for i, changes in plan["set"].items():
+        if "id" in changes:
+            if not units["id_ocr"][i]:
+                units["id_ocr"][i] = units["id"][i]
+            units["id"][i] = changes["id"]
+            units["id_source"][i] = unit_table.ID_MANUAL
+            units["confidence"][i] = 1.0
+        box = [k for k in ("x", "y", "w", "h") if k in changes]
+        for k in box:
+            units[k][i] = round(changes[k] / scale)
+        if box:
+            units["area"][i] = units["w"][i] * units["h"][i]
+            units["source_stage"][i] = unit_table.STAGE_MANUAL
+            units["pass"][i] = 0
+
+    keep = np.ones(len(units), dtype=bool)
+    keep[plan["delete"]] = False
+    added = unit_table.from_boxes(*([round(u[k] / scale) for u in plan["add"]] for k in "xywh"),
+                                  stage=unit_table.STAGE_MANUAL)
+    added["id"] = [u["id"] for u in plan["add"]]
+    added["confidence"] = 1.0
+    added["id_source"] = np.where(added["id"] != "", unit_table.ID_MANUAL, unit_table.ID_NONE)
+    return unit_table.append(units[keep], added), plan
+
+
+def overrides_path(options):
+    """The overrides file for a run: --overrides, else
+    <output>.overrides.json if it exists, else None."""
+    if options["overrides"]:
+        return Path(options["overrides"])
+    path = overrides.default_path(options["output"])
+    return path if path.exists() else None
+
+
+def correct_units(units, img_w, options, ocr=True, fixed=None):
+    """Step 3.5: apply the overrides file, then (if the OCR stage ran) fix
+    OCR errors using the expected range.
+
+    Entries select units by the IDs the floor JSON would show without
+    them (a first, silent range correction), but are applied to the raw
+    reads before the real one, so range correction works around the IDs
+    they set instead of handing the same ID to another unit. Returns
+    (units, overrides plan or None).
+    """
+    range_fix = ocr and options["expected_range"]
+    plan = None
+    path = overrides_path(options)
+    if path is not None:
+        scale = options["target_width"] / img_w if options["target_width"] else 1.0
+        match = units
+        if range_fix:
+            with contextlib.redirect_stdout(io.StringIO()):
+                match = fix_ocr_errors(units.copy(), options["expected_range"], fixed)
+        units, plan = apply_overrides(units, path, scale, match)
+        if fixed is not None:
+            # Deleted rows are gone and added ones come last
+            keep = np.ones(len(fixed), dtype=bool)
+            keep[plan["delete"]] = False
+            fixed = np.concatenate([fixed[keep], np.zeros(len(plan["add"]), dtype=bool)])
+        print(f"Overrides from {path}: {overrides.summary(plan)}")
+        for warning in plan["skipped"]:
+            print(f"  Warning: {warning}")
+    if range_fix:
+        print(f"Applying OCR corrections for expected range {options['expected_range']}...")
+        units = fix_ocr_errors(units, options["expected_range"], fixed)
+    return units, plan
+
+
+def write_output(planes, results, options):
+    """Steps 4–6: sort, normalize and write the floor JSON (and debug images)."""
+    img = planes["img"]
+    img_h, img_w = img.shape[:2]
+    raw_units = results["fix"]
+    features = [dict(f) for f in results.get("features", [])]
+
+    # Step 4: Normalize coordinates
     # Sort by ID (numeric if possible)
-    def sort_key(u):
+    def sort_key(uid):
         try:
-            return int(u["id"])
-        except (ValueError, TypeError):
+            return int(uid)
+        except ValueError:
             return 999999
 
-    units_out.sort(key=sort_key)
+    ids = raw_units["id"].tolist()
+    raw_units = raw_units[sorted(range(len(ids)), key=lambda i: sort_key(ids[i]))]
 
-    units_out, features, floor_w, floor_h = normalize_coordinates(
-        units_out, features, img_w, img_h, args.target_width
+    units_scaled, features, floor_w, floor_h = normalize_coordinates(
+        raw_units, features, img_w, img_h, options["target_width"]
     )
+    units_out = unit_table.to_records(units_scaled)
 
     # Step 5: Build output
     output = {
         "floor": {
-            "id": args.floor_id,
-            "name": args.floor_name,
+            "id": options["floor_id"],
+            "name": options["floor_name"],
             "width": floor_w,
             "height": floor_h,
             "sourceImageWidth": img_w,
@@ -1038,15 +2420,26 @@ def main():
         },
         "units": units_out,
         "siteFeatures": features,
+        # Wall-sharing neighbors and aisle rows, as indexes into "units"
+        "adjacency": adjacency.build(raw_units["x"], raw_units["y"], raw_units["w"], raw_units["h"]),
         "stats": {
             "totalUnits": len(units_out),
             "unitsWithId": sum(1 for u in units_out if u["id"]),
             "unitsMissingId": sum(1 for u in units_out if not u["id"]),
+            "idsCorrected": sum(1 for u in units_out if "id_original_ocr" in u),
+            "lowConfidence": sum(1 for u in units_out
+                                 if u["id"] and u["conf"] < unit_table.LOW_CONFIDENCE),
+            # Units per box stage and ID source (provenance codes: see unit_table.py)
+            **unit_table.stage_counts(raw_units),
         },
     }
+    plan = results.get("overrides")
+    if plan is not None:
+        output["stats"]["overrides"] = {"applied": plan["applied"], "unchanged": plan["unchanged"],
+                                        "skipped": len(plan["skipped"])}
 
     # Write JSON
-    output_path = Path(args.output)
+    output_path = Path(options["output"])
     output_path.parent.mkdir(parents=True, exist_ok=True)
     with open(output_path, "w") as f:
         json.dump(output, f, indent=2)
@@ -1054,21 +2447,13 @@ def main():
     print(f"  Total units: {output['stats']['totalUnits']}")
     print(f"  Units with ID: {output['stats']['unitsWithId']}")
     print(f"  Units missing ID: {output['stats']['unitsMissingId']}")
+    print(f"  Low confidence (< {unit_table.LOW_CONFIDENCE}): {output['stats']['lowConfidence']}")
+    print("  Boxes: " + ", ".join(f"{k} {v}" for k, v in output["stats"]["boxSources"].items()))
+    print("  IDs: " + ", ".join(f"{k} {v}" for k, v in output["stats"]["idSources"].items()))
 
-    # Step 6: Debug image
-    if args.debug:
-        debug_path = input_path.with_suffix(".debug.png")
-        generate_debug_image(img, units_out if not args.target_width else raw_units,
-                             features if not args.target_width else detect_site_features(img, hsv),
-                             debug_path)
-        # Also generate a smaller version for easy viewing
-        if img_w > 2000:
-            debug_img = cv2.imread(str(debug_path))
-            scale = 1200 / img_w
-            small = cv2.resize(debug_img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
-            small_path = input_path.with_suffix(".debug-small.png")
-            cv2.imwrite(str(small_path), small)
-            print(f"Debug image (small) saved to: {small_path}")
+    # Step 6: Debug image (always drawn in source-image pixels), rendered once
+    if options["debug"] or options["debug_tiles"]:
+        write_debug(img, raw_units, results, options)
 
     # Print sample units
     print("\nSample units (first 10):")
@@ -1082,6 +2467,211 @@ def main():
         for u in missing[:20]:
             print(f"  x={u['x']:>5d}  y={u['y']:>5d}  w={u['w']:>4d}  h={u['h']:>4d}")
 
+    return output
+
+
+def watch(session, options, interval=1.0):
+    """Re-extract whenever the input PNG changes, until interrupted."""
+    input_path = Path(options["input"])
+    last = None
+    print(f"Watching {input_path} (Ctrl+C to stop)")
+    try:
+        while True:
+            source = _source_key(input_path)
+            if source is not None and source != last:
+                try:
+                    summary = session.run(options)
+                    print(f"Re-ran stages: {', '.join(summary['rerun']) or 'none'}")
+                    last = source
+                except (OSError, ValueError, RuntimeError) as e:
+                    # Usually a half-written or just-replaced PNG, or a
+                    # Tesseract failure; try again on the next tick
+                    print(f"Warning: {e}")
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("\nStopped watching")
+
+
+def serve(session, base_options):
+    """Answer JSON-RPC 2.0 requests, one JSON object per line on stdin.
+
+    Methods:
+      extract   params: any DEFAULT_OPTIONS keys (merged over the options
+                the server was started with and the last successful request;
+                "reocr" applies to its own request only)
+                result: {"output", "stats", "rerun", "seconds"}
+      status    result: current options and cached stages
+      shutdown  result: null, then the server exits
+
+    Responses are written one per line to stdout; progress logging goes to
+    stderr so it never interleaves with the protocol.
+    """
+    options = {**DEFAULT_OPTIONS, **base_options}
+    out = sys.stdout
+
+    def reply(request_id, result=None, error=None):
+        message = {"jsonrpc": "2.0", "id": request_id}
+        if error is not None:
+            message["error"] = error
+        else:
+            message["result"] = result
+        out.write(json.dumps(message) + "\n")
+        out.flush()
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            reply(None, error={"code": -32700, "message": f"Parse error: {e}"})
+            continue
+
+        if not isinstance(request, dict):
+            reply(None, error={"code": -32600, "message": "Invalid Request: expected an object"})
+            continue
+        request_id = request.get("id")
+        method = request.get("method")
+        params = request.get("params") or {}
+        if not isinstance(params, dict):
+            reply(request_id, error={"code": -32600,
+                                     "message": "Invalid Request: params must be an object"})
+            continue
+
+        if method == "shutdown":
+            reply(request_id, None)
+            break
+        elif method == "status":
+            reply(request_id, {"options": session.options,
+                               "cachedStages": sorted(session.results),
+                               "ocrCacheSize": len(session.ocr_cache)})
+        elif method == "extract":
+            unknown = set(params) - set(DEFAULT_OPTIONS)
+            if unknown:
+                reply(request_id, error={"code": -32602,
+                                         "message": f"Unknown params: {sorted(unknown)}"})
+                continue
+            # A rejected request leaves the previous options in force
+            candidate = {**options, **params}
+            start = time.perf_counter()
+            try:
+                with contextlib.redirect_stdout(sys.stderr):
+                    result = session.run(candidate)
+            except (FileNotFoundError, ValueError) as e:
+                reply(request_id, error={"code": -32000, "message": str(e)})
+                continue
+            except Exception as e:
+                # Bad param types and engine failures must not end the server
+                reply(request_id, error={"code": -32603,
+                                         "message": f"Internal error: {type(e).__name__}: {e}"})
+                continue
+            # A region re-read is one-shot: later requests run normally
+            options = {**candidate, "reocr": None}
+            result["seconds"] = round(time.perf_counter() - start, 3)
+            reply(request_id, result)
+        else:
+            reply(request_id, error={"code": -32601, "message": f"Unknown method: {method}"})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract floor plan data from site map PNG")
+    parser.add_argument("input", nargs="?",
+                        help="Path to the site map PNG file, or a vector PDF site plan")
+    parser.add_argument("--output", "-o", help="Output JSON file path")
+    parser.add_argument("--debug", action="store_true", help="Generate debug overlay image")
+    parser.add_argument("--debug-tiles", action="store_true",
+                        help="Write the debug overlay as a deep-zoom tile set plus an HTML "
+                             "viewer (<input>.debug.html: hover a unit for its ID, stage and "
+                             "OCR confidence) instead of the full-size debug PNG")
+    parser.add_argument("--target-width", type=int, default=None,
+                        help="Scale coordinates to this target width (e.g., 1200 for the web map)")
+    parser.add_argument("--floor-name", default="Ground Floor", help="Name for this floor")
+    parser.add_argument("--floor-id", default="floor-1", help="ID for this floor")
+    parser.add_argument("--expected-range", default=None,
+                        help="Expected unit ID range (e.g., '400-589'). "
+                             "Used to fix systematic OCR misreads like 5→9.")
+    parser.add_argument("--pyramid", type=int, default=0, metavar="LEVELS",
+                        help="Find candidate unit regions on an image downsampled "
+                             "2^LEVELS times and run full-resolution detection only "
+                             "inside them (default: 0, full resolution everywhere)")
+    parser.add_argument("--ocr-backend", default="auto",
+                        choices=["auto"] + sorted(ocr_backends.BACKENDS),
+                        help="Tesseract engine: in-process tesserocr or the pytesseract "
+                             "subprocess wrapper (default: auto, tesserocr if installed)")
+    parser.add_argument("--ocr-tier", default="tesseract", choices=["tesseract", "glyph"],
+                        help="glyph: read IDs with a digit classifier trained on this floor's "
+                             "confident Tesseract reads, calling Tesseract only for crops it "
+                             "can't read (default: tesseract for every unit)")
+    parser.add_argument("--pdf-page", type=int, default=1,
+                        help="Page of a PDF input to extract (default: 1)")
+    parser.add_argument("--pdf-dpi", type=int, default=288,
+                        help="Output pixels per inch for PDF input (default: 288, i.e. 4x "
+                             "PDF points, matching the ~4x raster site maps)")
+    parser.add_argument("--previous", default=None, metavar="OLD_PNG",
+                        help="Previous version of the site map: only regions that changed "
+                             "are re-detected and re-OCR'd (requires --previous-json)")
+    parser.add_argument("--previous-json", default=None, metavar="OLD_JSON",
+                        help="Floor JSON extracted from --previous; units outside changed "
+                             "regions are carried over from it verbatim")
+    parser.add_argument("--colors", default="default", metavar="default|auto|MODEL.json",
+                        help="HSV bounds for units/elevators/highlights: the built-in defaults, "
+                             "auto (fit to this image, saved as <output>.colors.json and reused "
+                             "while the image is unchanged), or a saved .colors.json, e.g. from "
+                             "another floor of the same facility")
+    parser.add_argument("--plane-cache", default=None, metavar="DIR",
+                        help="Keep decoded image planes (BGR/HSV/RGB/gray and color masks) "
+                             "as memory-mapped .npy files in DIR, keyed by image content and "
+                             "HSV thresholds, so later runs skip decoding and conversion")
+    parser.add_argument("--stages", default="geometry,ocr,features", metavar="LIST",
+                        help="Comma-separated stages to run: geometry (unit rectangles, always "
+                             "included), ocr (unit IDs) and features (elevator, stairs, office). "
+                             "E.g. --stages geometry writes boxes without IDs in seconds and "
+                             "never loads an OCR engine (default: all)")
+    parser.add_argument("--save-state", default=None, metavar="STATE.npz",
+                        help="Save the detected units, OCR reads and site features of this run "
+                             "so a later --resume can skip them")
+    parser.add_argument("--resume", default=None, metavar="STATE.npz",
+                        help="Reuse the stages saved by --save-state instead of redoing them "
+                             "(the image, color model and detection options must match; saved "
+                             "OCR/features are reused only if their options match too)")
+    parser.add_argument("--overrides", default=None, metavar="OVERRIDES.json",
+                        help="Hand corrections (unit ID or box edits, deletions, additions) "
+                             "applied at the end of the run; see overrides.py (default: "
+                             "<output>.overrides.json if it exists)")
+    parser.add_argument("--reocr", default=None, metavar="X,Y,W,H",
+                        help="Re-read only the unit IDs inside this region (source-image "
+                             "pixels) of the existing --output, keeping everything else; "
+                             "fast with --plane-cache")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and re-extract whenever the input PNG changes")
+    parser.add_argument("--watch-interval", type=float, default=1.0, metavar="SECONDS",
+                        help="How often --watch checks the input for changes (default: 1.0)")
+    parser.add_argument("--serve", action="store_true",
+                        help="Run as a long-lived JSON-RPC server on stdin/stdout, keeping "
+                             "images and OCR results warm between requests")
+    args = parser.parse_args()
+
+    options = {key: getattr(args, key) for key in DEFAULT_OPTIONS}
+    session = ExtractionSession()
+
+    if args.serve:
+        serve(session, {k: v for k, v in options.items() if v is not None})
+        return
+
+    if not args.input or not args.output:
+        parser.error("input and --output are required (unless using --serve)")
+
+    if args.watch:
+        watch(session, options, args.watch_interval)
+        return
+
+    try:
+        session.run(options)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
 
 if __name__ == "__main__":
     main()
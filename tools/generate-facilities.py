@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+Synthetic Facility Generator
+============================
+Generates facilities of any size in the production Facility / Floor /
+UnitData schema, plus a facilities.json of hundreds of locations, for
+load-testing the map and the data tools beyond Richland's ~600 units.
+
+Usage:
+  python tools/generate-facilities.py
+  python tools/generate-facilities.py --locations 500 --mapped 25 --units 20000 --floors 8
+  python tools/generate-facilities.py --mix 5x5=20,10x10=40 --features climate=0.6,alarm=0.1 \
+    --occupancy 0.4-0.95 --feed --portfolio-index
+
+Output goes to --out (default public/synthetic, ignored by git) with
+dataUrls under --url-prefix (default /synthetic); open the app with
+?manifest=/synthetic/facilities.json to load it instead of the real data.
+
+Floors are laid out like the site maps, at ~16px per foot: pairs of
+back-to-back unit rows between 10 ft aisles, with a cross aisle every
+CROSS_AISLE_EVERY pixels and an elevator and stairs (plus the office on the
+ground floor) in a strip at the top. A row has one depth: 10 ft rows hold
+5x10, 7'6"x10 and 10x10 units side by side, 15 ft rows 5x15 and 10x15,
+and so on, drawn from --mix by unit count. Units are typed and given mock
+occupancy and features by build-facility-json.py's unit_entry(), and every
+unit classifies back to the type it was laid out as. Floors get adjacency
+and facilities a search index, as the builder writes them; there's no
+wayfinding (it needs a site map image).
+
+Output is deterministic for a given --seed.
+"""
+
+import argparse
+import importlib.util
+import json
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+import adjacency
+import jsonstream
+import occupancy
+import search_index
+
+
+# Unit footprint in pixels per type: (width along the row, depth), with
+# the sizes measured on the Richland maps
+FEET_PX = {5: 73, 7.6: 117, 10: 159, 15: 245, 20: 330, 25: 413, 30: 495, 40: 650}
+UNIT_PX = {
+    "5x5": (FEET_PX[5], FEET_PX[5]),
+    "5x10": (FEET_PX[5], FEET_PX[10]),
+    "5x15": (FEET_PX[5], FEET_PX[15]),
+    "7.6x10": (FEET_PX[7.6], FEET_PX[10]),
+    "10x10": (FEET_PX[10], FEET_PX[10]),
+    "10x15": (FEET_PX[10], FEET_PX[15]),
+    "10x20": (FEET_PX[10], FEET_PX[20]),
+    "10x25": (FEET_PX[10], FEET_PX[25]),
+    "10x30": (FEET_PX[10], FEET_PX[30]),
+    "10x40": (FEET_PX[10], FEET_PX[40]),
+}
+
+# Default unit mix, by share of units
+UNIT_MIX = {"5x5": 8, "5x10": 18, "5x15": 4, "7.6x10": 8, "10x10": 26,
+            "10x15": 14, "10x20": 12, "10x25": 4, "10x30": 4, "10x40": 2}
+
+FLOOR_WIDTH = 4800  # narrowest floor, Richland's
+MARGIN = 120
+WALL = 9            # between neighboring units and back-to-back rows
+AISLE = 160         # 10 ft
+CROSS_AISLE_EVERY = 1500
+CORE_HEIGHT = 330   # strip at the top holding the site features
+
+# Locations for the manifest: (city, state, lat, lng, area code, ZIP prefix)
+CITIES = [
+    ("York", "PA", 39.9626, -76.7277, 717, 174), ("Lancaster", "PA", 40.0379, -76.3055, 717, 176),
+    ("Harrisburg", "PA", 40.2732, -76.8867, 717, 171), ("Reading", "PA", 40.3356, -75.9269, 610, 196),
+    ("Allentown", "PA", 40.6084, -75.4902, 610, 181), ("Philadelphia", "PA", 39.9526, -75.1652, 215, 191),
+    ("Pottstown", "PA", 40.2454, -75.6496, 610, 194), ("Hanover", "PA", 39.8007, -76.9830, 717, 173),
+    ("Gettysburg", "PA", 39.8309, -77.2311, 717, 173), ("Scranton", "PA", 41.4090, -75.6624, 570, 185),
+    ("Pittsburgh", "PA", 40.4406, -79.9959, 412, 152), ("Erie", "PA", 42.1292, -80.0851, 814, 165),
+    ("Camden", "NJ", 39.9259, -75.1196, 856, 81), ("Trenton", "NJ", 40.2206, -74.7597, 609, 86),
+    ("Vineland", "NJ", 39.4864, -75.0260, 856, 83), ("Cherry Hill", "NJ", 39.9348, -75.0307, 856, 80),
+    ("Newark", "NJ", 40.7357, -74.1724, 973, 71), ("Toms River", "NJ", 39.9537, -74.1979, 732, 87),
+    ("Wilmington", "DE", 39.7391, -75.5398, 302, 198), ("Dover", "DE", 39.1582, -75.5244, 302, 199),
+    ("Baltimore", "MD", 39.2904, -76.6122, 410, 212), ("Frederick", "MD", 39.4143, -77.4105, 301, 217),
+    ("Hagerstown", "MD", 39.6418, -77.7200, 301, 217), ("Annapolis", "MD", 38.9784, -76.4922, 410, 214),
+    ("Albany", "NY", 42.6526, -73.7562, 518, 122), ("Syracuse", "NY", 43.0481, -76.1474, 315, 132),
+    ("Utica", "NY", 43.1009, -75.2327, 315, 135), ("Binghamton", "NY", 42.0987, -75.9180, 607, 139),
+    ("Rochester", "NY", 43.1566, -77.6088, 585, 146), ("Buffalo", "NY", 42.8864, -78.8784, 716, 142),
+    ("Richmond", "VA", 37.5407, -77.4360, 804, 232), ("Winchester", "VA", 39.1857, -78.1633, 540, 226),
+    ("Columbus", "OH", 39.9612, -82.9988, 614, 432), ("Akron", "OH", 41.0814, -81.5190, 330, 443),
+]
+STREETS = ["Main St", "Market St", "Route 30", "Church Rd", "Industrial Dr", "Mill Rd",
+           "Park Ave", "Commerce Blvd", "Lincoln Hwy", "Ridge Rd", "Valley Rd", "Station Ave"]
+
+OFFICE_HOURS = {
+    "office": [
+        {"label": "Sunday", "time": "Closed"},
+        {"label": "Mon–Fri", "time": "9:30 AM – 5:30 PM"},
+        {"label": "Saturday", "time": "8:00 AM – 1:00 PM"},
+    ],
+    "gate": "6:00 AM – 10:00 PM Daily",
+}
+
+
+def _load_builder():
+    """Import build-facility-json.py (not importable by name: it has a hyphen)."""
+    path = Path(__file__).with_name("build-facility-json.py")
+    spec = importlib.util.spec_from_file_location("build_facility_json", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+builder = _load_builder()
+
+
+def _ordinal(n):
+    suffix = "th" if 10 <= n % 100 <= 20 else {1: "st", 2: "nd", 3: "rd"}.get(n % 10, "th")
+    return f"{n}{suffix}"
+
+
+def _slug(text):
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+
+# ---------------------------------------------------------------------------
+# Floors
+# ---------------------------------------------------------------------------
+def row_kinds(mix):
+    """[(depth, [(type, weight)], row weight)] for a unit mix.
+
+    A depth's rows are picked in proportion to its types' share times their
+    width, so the units they hold come out in the mix's proportions.
+    """
+    kinds = {}
+    for unit_type, weight in mix.items():
+        if weight > 0:
+            kinds.setdefault(UNIT_PX[unit_type][1], []).append((unit_type, weight))
+    return [(depth, types, sum(w * UNIT_PX[t][0] for t, w in types))
+            for depth, types in sorted(kinds.items())]
+
+
+def floor_width(count, kinds):
+    """Width that makes a floor of `count` units roughly square."""
+    units = sum(w for _, types, _ in kinds for _, w in types)
+    area = 0
+    for depth, types, _ in kinds:
+        # Units of this depth: their share, their average row length and half an aisle
+        share = sum(w for _, w in types)
+        length = sum(w * (UNIT_PX[t][0] + WALL) for t, w in types) / share
+        area += share / units * length * (depth + (WALL + AISLE) / 2)
+    side = (count * area) ** 0.5 * (1 + AISLE / CROSS_AISLE_EVERY) + 2 * MARGIN
+    return max(FLOOR_WIDTH, int(side / 100 + 1) * 100)
+
+
+def site_features(floor_no):
+    """Elevator and stairs (and the office on the ground floor) in the top strip."""
+    features = []
+    x = MARGIN
+    if floor_no == 1:
+        features.append({"type": "office", "label": "OFFICE", "x": x, "y": MARGIN,
+                         "w": FEET_PX[20], "h": FEET_PX[15]})
+        x += FEET_PX[20] + AISLE
+    features.append({"type": "elevator", "x": x, "y": MARGIN, "w": 164, "h": 164})
+    features.append({"type": "stairs", "x": x + 164 + AISLE, "y": MARGIN, "w": 164, "h": 164})
+    return features
+
+
+def layout_floor(count, kinds, rng, width):
+    """`count` (type, x, y, w, h) boxes in back-to-back rows; returns (boxes, height)."""
+    boxes = []
+    y = MARGIN + CORE_HEIGHT + AISLE
+    depths = [kind[0] for kind in kinds]
+    row_weights = [kind[2] for kind in kinds]
+    side = 0
+    while len(boxes) < count:
+        depth, types, _ = kinds[rng.choices(range(len(kinds)), row_weights)[0]]
+        names = [t for t, _ in types]
+        weights = [w for _, w in types]
+        x = MARGIN
+        next_cross = MARGIN + CROSS_AISLE_EVERY
+        while len(boxes) < count:
+            unit_type = rng.choices(names, weights)[0]
+            w, h = UNIT_PX[unit_type]
+            if x + w > next_cross:
+                x, next_cross = next_cross + AISLE, next_cross + AISLE + CROSS_AISLE_EVERY
+            if x + w > width - MARGIN:
+                break
+            boxes.append((unit_type, x, y, w, h))
+            x += w + WALL
+        # Rows come in back-to-back pairs, then an aisle
+        y += depth + (WALL if side == 0 else AISLE)
+        side = 1 - side
+    return boxes, y - (WALL if side == 1 else AISLE) + MARGIN
+
+
+def build_floor(floor_no, count, kinds, rng, occupancy_rate, features, digits=3):
+    """A Floor dict of `count` units with mock occupancy and features.
+
+    Unit IDs are the floor number then a `digits`-wide unit number; only
+    the ground floor has drive-up units.
+    """
+    width = floor_width(count, kinds)
+    boxes, height = layout_floor(count, kinds, rng, width)
+    if floor_no > 1:
+        features = [f for f in features if f[0] != "driveup"]
+    units = []
+    for i, (unit_type, x, y, w, h) in enumerate(boxes):
+        uid = f"{floor_no}{i + 1:0{digits}d}"
+        entry = builder.unit_entry({"id": uid, "x": x, "y": y, "w": w, "h": h}, rng,
+                                   occupancy_rate, features)
+        if entry["type"] != unit_type:
+            raise ValueError(f"{unit_type} laid out as {w}x{h}px classifies as {entry['type']}")
+        units.append(entry)
+    return {
+        "id": f"floor-{floor_no}",
+        "name": "Ground Floor" if floor_no == 1 else f"{_ordinal(floor_no)} Floor",
+        "width": width,
+        "height": height,
+        "units": units,
+        "siteFeatures": site_features(floor_no),
+        "adjacency": adjacency.build(*([u[k] for u in units] for k in "xywh")),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Facilities and manifest
+# ---------------------------------------------------------------------------
+def manifest_entries(count, rng):
+    """`count` facilities.json entries (without map fields) at spread-out locations."""
+    entries, used = [], set()
+    for k in range(count):
+        city, state, lat, lng, area, zip_prefix = CITIES[k % len(CITIES)]
+        street = rng.choice(STREETS)
+        name = f"Moove In {city}" if k < len(CITIES) else f"Moove In {city} {street}"
+        uid = base = _slug(name.removeprefix("Moove In "))
+        n = 2
+        while uid in used:
+            uid, n = f"{base}-{n}", n + 1
+        used.add(uid)
+        sizes = ["Small", "Medium", "Large"]
+        if rng.random() < 0.05:
+            sizes.append(rng.choice(["Parking", "RV/Boat"]))
+        entries.append({
+            "id": uid,
+            "name": name if n == 2 else f"{name} {n - 1}",
+            "address": f"{rng.randint(100, 9999)} {street}",
+            "city": city,
+            "state": state,
+            "zip": f"{zip_prefix:03d}{rng.randint(0, 99):02d}",
+            "phone": f"({area}) {rng.randint(200, 999)}-{rng.randint(0, 9999):04d}",
+            "hours": "Gate 6AM–10PM",
+            "lat": round(lat + rng.uniform(-0.15, 0.15), 4),
+            "lng": round(lng + rng.uniform(-0.15, 0.15), 4),
+            "sizes": sizes,
+            "features": [],
+        })
+    return entries
+
+
+def build_facility(entry, units, floors, kinds, seed, occupancy_rate, features):
+    """A Facility dict for a manifest entry, its units split across floors."""
+    per_floor = [units // floors + (1 if f < units % floors else 0) for f in range(floors)]
+    digits = max(3, len(str(per_floor[0])))
+    built = []
+    for f, count in enumerate(per_floor):
+        rng = random.Random(f"{seed}:{entry['id']}:{f + 1}")
+        built.append(build_floor(f + 1, count, kinds, rng, occupancy_rate, features, digits))
+    facility = {
+        "id": entry["id"],
+        "name": entry["name"],
+        "address": f"{entry['address']}, {entry['city']}, {entry['state']} {entry['zip']}",
+        "phone": entry["phone"],
+        "hours": "Gate 6AM–10PM",
+        "officeHours": OFFICE_HOURS,
+        "floors": built,
+    }
+    facility["search"] = search_index.facility_index(facility["floors"])
+    return facility
+
+
+def _parse_weights(text, known, option):
+    """{"name": float} from "a=1,b=2"; ValueError naming `option` if malformed."""
+    weights = {}
+    for pair in (p.strip() for p in text.split(",") if p.strip()):
+        name, sep, value = pair.partition("=")
+        try:
+            weights[name] = float(value)
+        except ValueError:
+            sep = ""
+        if not sep or (known is not None and name not in known):
+            raise ValueError(f"{option}: expected NAME=VALUE pairs"
+                             + (f" with NAME one of {', '.join(known)}" if known else "")
+                             + f", not '{pair}'")
+    return weights
+
+
+def parse_features(text):
+    """MOCK_FEATURES with the rates in "climate=0.5,alarm=0.1" replaced or
+    added (new flags are drawn for every unit type)."""
+    rates = _parse_weights(text, None, "--features")
+    features = [(flag, rates.pop(flag, p), types) for flag, p, types in builder.MOCK_FEATURES]
+    return features + [(flag, p, None) for flag, p in rates.items()]
+
+
+def parse_occupancy(text):
+    """(low, high) from "0.65" or "0.5-0.9"."""
+    try:
+        low, _, high = text.partition("-")
+        low, high = float(low), float(high or low)
+    except ValueError:
+        raise ValueError(f"--occupancy takes a rate or LOW-HIGH, not '{text}'")
+    if not 0 <= low <= high <= 1:
+        raise ValueError(f"--occupancy must be within 0-1, not '{text}'")
+    return low, high
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate synthetic facilities and a facilities.json for scale testing")
+    parser.add_argument("--out", default="public/synthetic",
+                        help="Output directory (default: %(default)s)")
+    parser.add_argument("--url-prefix", default="/synthetic",
+                        help="URL --out is served at, for dataUrl/feedUrl (default: %(default)s)")
+    parser.add_argument("--locations", type=int, default=300,
+                        help="Facilities in facilities.json (default: %(default)s)")
+    parser.add_argument("--mapped", type=int, default=10,
+                        help="How many of them get a generated map (default: %(default)s)")
+    parser.add_argument("--units", type=int, default=12000,
+                        help="Units per mapped facility (default: %(default)s)")
+    parser.add_argument("--floors", type=int, default=6,
+                        help="Floors per mapped facility (default: %(default)s)")
+    parser.add_argument("--mix", default=None, metavar="TYPE=WEIGHT,...",
+                        help="Unit mix by share of units; types left out are not generated "
+                             "(default: " + ",".join(f"{t}={w}" for t, w in UNIT_MIX.items()) + ")")
+    parser.add_argument("--features", default="", metavar="FLAG=RATE,...",
+                        help="Replace or add mock feature rates, e.g. climate=0.5,alarm=0.1 "
+                             "(default: build-facility-json.py's)")
+    parser.add_argument("--occupancy", default="0.5-0.9", metavar="RATE|LOW-HIGH",
+                        help="Occupancy rate, or a range each facility draws its rate from "
+                             "(default: %(default)s)")
+    parser.add_argument("--format", choices=jsonstream.FORMATS, default="min",
+                        help="Facility JSON format (default: %(default)s). ndjson writes a "
+                             "facility-<id>.ndjson beside the minified facility-<id>.json the "
+                             "manifest points to")
+    parser.add_argument("--feed", action="store_true",
+                        help="Also publish each mapped facility as an occupancy feed in --out "
+                             "and point the manifest at it (feedUrl)")
+    parser.add_argument("--portfolio-index", action="store_true",
+                        help="Also write a unit ID index across the mapped facilities "
+                             "(<out>/search-index.json)")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed (default: %(default)s)")
+    args = parser.parse_args()
+
+    if not 0 <= args.mapped <= args.locations:
+        parser.error("--mapped must be between 0 and --locations")
+    if args.units < args.floors or args.floors < 1:
+        parser.error("need at least one floor and one unit per floor")
+    try:
+        mix = UNIT_MIX if args.mix is None else _parse_weights(args.mix, list(UNIT_PX), "--mix")
+        features = parse_features(args.features)
+        occupancy_range = parse_occupancy(args.occupancy)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    kinds = row_kinds(mix)
+    if not kinds:
+        print("Error: --mix has no unit types with a positive weight")
+        sys.exit(1)
+
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    prefix = args.url_prefix.rstrip("/")
+    rng = random.Random(args.seed)
+    entries = manifest_entries(args.locations, rng)
+
+    print(f"Generating {args.mapped} facilities of {args.units:,} units on {args.floors} floors "
+          f"({args.locations} locations)...")
+    t0 = time.perf_counter()
+    total_units = total_bytes = 0
+    index_facilities = []
+    for entry in entries[:args.mapped]:
+        t = time.perf_counter()
+        rate = rng.uniform(*occupancy_range)
+        facility = build_facility(entry, args.units, args.floors, kinds, args.seed, rate, features)
+        units = [u for floor in facility["floors"] for u in floor["units"]]
+
+        # dataUrl is fetched with res.json(), so it is always JSON; NDJSON is
+        # written beside it
+        path = out_dir / f"facility-{entry['id']}.json"
+        outputs = [(path, "min" if args.format == "ndjson" else args.format)]
+        if args.format == "ndjson":
+            outputs.append((path.with_suffix(".ndjson"), "ndjson"))
+        for out, fmt in outputs:
+            jsonstream.dump({**facility, "floors": [{**floor, "units": iter(floor["units"])}
+                                                    for floor in facility["floors"]]},
+                            out, fmt)
+        entry.update(hasMap=True, dataUrl=f"{prefix}/{path.name}")
+        if args.feed:
+            occupancy.Feed(out_dir, entry["id"]).publish(facility)
+            entry["feedUrl"] = prefix
+        entry["features"] = [name for name, present in (
+            ("Elevator", args.floors > 1),
+            ("Climate Controlled", any(u.get("climate") for u in units)),
+            ("Drive Up", any(u.get("driveup") for u in units))) if present]
+        if args.portfolio_index:
+            index_facilities.append({"id": entry["id"], "floors": [
+                {"units": [{"id": u["id"]} for u in floor["units"]]}
+                for floor in facility["floors"]]})
+
+        total_units += len(units)
+        total_bytes += path.stat().st_size
+        sizes = sorted((floor["width"], floor["height"]) for floor in facility["floors"])
+        print(f"  {entry['id']}: {len(units):,} units, {sum(u['occ'] for u in units):,} occupied, "
+              f"floors {'x'.join(map(str, sizes[0]))} to {'x'.join(map(str, sizes[-1]))}px, "
+              f"{path.stat().st_size / 1e6:.1f} MB ({time.perf_counter() - t:.2f}s)")
+
+    for entry in entries[args.mapped:]:
+        entry.update(hasMap=False, dataUrl="")
+    manifest_path = out_dir / "facilities.json"
+    with open(manifest_path, "w") as f:
+        json.dump(entries, f, indent=2, ensure_ascii=False)
+
+    if args.portfolio_index:
+        index = search_index.portfolio_index(index_facilities)
+        with open(out_dir / "search-index.json", "w") as f:
+            json.dump(index, f, separators=(",", ":"))
+        print(f"  Portfolio index: {len(index['ids']):,} units -> {out_dir / 'search-index.json'}")
+
+    print(f"\n{total_units:,} units in {args.mapped} facilities ({total_bytes / 1e6:.1f} MB), "
+          f"{len(entries)} locations -> {manifest_path} in {time.perf_counter() - t0:.1f}s")
+    print(f"Open the app with ?manifest={prefix}/facilities.json")
+
+
+if __name__ == "__main__":
+    main()
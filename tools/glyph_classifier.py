@@ -0,0 +1,184 @@
+"""
+Glyph Classifier
+================
+Fast first-tier unit ID recognizer for extract-floorplan.py.
+
+Unit IDs on a site map are all printed in the same bold sans-serif digits,
+so once a few units have been read by Tesseract, every other digit on the
+floor is a near-copy of one already seen. This module:
+
+  1. Segments the digit glyphs inside a unit crop (Otsu + connected
+     components, keeping the components that line up as one text row).
+  2. Normalizes each glyph to a small fixed-size bitmap (height-scaled,
+     aspect preserved, centered).
+  3. Classifies glyphs by nearest template per digit class, bootstrapped
+     from confident Tesseract reads on the same floor.
+
+Each glyph gets a margin: how much closer its best digit class is than the
+runner-up (0 = tie, 1 = unambiguous). Callers fall through to Tesseract
+when any glyph's margin is low or it looks like nothing seen so far.
+
+Templates whose labels disagree with a near-identical glyph (the typical
+Tesseract 5/9 and 6/8 flips) are relabeled per shape cluster, preferring
+labels confirmed by expected-range correction. See GlyphClassifier.fit.
+"""
+
+import cv2
+import numpy as np
+
+
+GLYPH_W = 16
+GLYPH_H = 20
+
+# Glyphs closer than this (RMS over the normalized bitmap, 0-1) are
+# renderings of the same digit
+SAME_GLYPH_DISTANCE = 0.12
+
+# Glyphs farther than this from every template are treated as unseen
+MAX_GLYPH_DISTANCE = 0.30
+
+
+def segment_digits(gray):
+    """Find the digit glyphs in a grayscale unit crop.
+
+    Returns (binary, boxes): the inverted Otsu binary of the crop and a list
+    of (x, y, w, h) glyph boxes sorted left to right. Components touching
+    the crop border (walls, neighbouring units) and components off the main
+    text row are dropped.
+    """
+    if gray.size == 0:
+        return None, []
+
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    crop_h, crop_w = gray.shape[:2]
+
+    comps = []
+    for x, y, w, h, area in stats[1:].tolist():
+        if x == 0 or y == 0 or x + w >= crop_w or y + h >= crop_h:
+            continue
+        if h < 8 or area < 20 or w > 2 * h:
+            continue
+        comps.append((x, y, w, h))
+    if not comps:
+        return binary, []
+
+    # Digits share one baseline and height: keep the components matching
+    # the median glyph's height and vertical center
+    heights = np.array([c[3] for c in comps])
+    centers = np.array([c[1] + c[3] / 2 for c in comps])
+    med_h = np.median(heights)
+    med_c = np.median(centers)
+    boxes = [c for c, h, cy in zip(comps, heights, centers)
+             if abs(h - med_h) <= 0.25 * med_h and abs(cy - med_c) <= 0.5 * med_h]
+
+    return binary, sorted(boxes)
+
+
+def glyph_vectors(binary, boxes):
+    """Normalize glyph boxes to GLYPH_W x GLYPH_H bitmaps, one row each."""
+    vectors = np.zeros((len(boxes), GLYPH_H * GLYPH_W), dtype=np.float32)
+    for i, (x, y, w, h) in enumerate(boxes):
+        glyph = binary[y:y+h, x:x+w]
+        new_w = max(1, min(GLYPH_W, round(w * GLYPH_H / h)))
+        scaled = cv2.resize(glyph, (new_w, GLYPH_H), interpolation=cv2.INTER_AREA)
+        canvas = np.zeros((GLYPH_H, GLYPH_W), dtype=np.float32)
+        left = (GLYPH_W - new_w) // 2
+        canvas[:, left:left + new_w] = scaled / 255.0
+        vectors[i] = canvas.ravel()
+    return vectors
+
+
+class GlyphClassifier:
+    """Nearest-template digit classifier with a per-glyph margin."""
+
+    def __init__(self, min_margin=0.25):
+        self.min_margin = min_margin
+        self.templates = np.zeros((0, GLYPH_H * GLYPH_W), dtype=np.float32)
+        self.labels = np.zeros(0, dtype="U1")
+        self.trusted = np.zeros(0, dtype=bool)
+        # Labels as read, before cluster voting, and each template's cluster:
+        # the index of its leader in self.leaders
+        self.read_labels = np.zeros(0, dtype="U1")
+        self.clusters = np.zeros(0, dtype=int)
+        self.leaders = np.zeros((0, GLYPH_H * GLYPH_W), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def fit(self, vectors, labels, trusted=None):
+        """Add templates, then make labels consistent per glyph shape.
+
+        `trusted` marks labels confirmed independently of Tesseract's glyph
+        reading (e.g. a leading digit fixed by expected-range correction).
+        Templates are grouped into clusters of near-identical glyphs: each
+        joins the first cluster whose leader (its first template) is within
+        SAME_GLYPH_DISTANCE, or leads a new one. A cluster takes the majority
+        trusted label of its reads if it has one, otherwise its plain
+        majority label.
+
+        Only the new templates are compared, and only with the leaders, and
+        only the clusters they join are relabeled, so learning one read at a
+        time stays cheap however many templates there are; it clusters and
+        labels the same as fitting every read at once.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        labels = np.asarray(labels, dtype="U1")
+        if trusted is None:
+            trusted = np.zeros(len(labels), dtype=bool)
+        clusters = np.empty(len(labels), dtype=int)
+        for j, vector in enumerate(vectors):
+            near = np.flatnonzero(self._distances(vector[None], self.leaders)[0]
+                                  <= SAME_GLYPH_DISTANCE)
+            if len(near):
+                clusters[j] = near[0]
+            else:
+                clusters[j] = len(self.leaders)
+                self.leaders = np.vstack([self.leaders, vector])
+
+        self.templates = np.vstack([self.templates, vectors])
+        self.labels = np.concatenate([self.labels, labels])
+        self.read_labels = np.concatenate([self.read_labels, labels])
+        self.trusted = np.concatenate([self.trusted, np.asarray(trusted, dtype=bool)])
+        self.clusters = np.concatenate([self.clusters, clusters])
+
+        for cluster in np.unique(clusters):
+            members = self.clusters == cluster
+            votes = self.read_labels[members & self.trusted]
+            if not len(votes):
+                votes = self.read_labels[members]
+            values, counts = np.unique(votes, return_counts=True)
+            self.labels[members] = values[np.argmax(counts)]
+
+    def classify(self, vectors):
+        """Label glyph vectors. Returns (labels, margins).
+
+        A glyph's margin is 0 when it is farther than MAX_GLYPH_DISTANCE
+        from every template, or when fewer than two digit classes are known.
+        """
+        n = len(vectors)
+        if not len(self.labels) or not n:
+            return [""] * n, np.zeros(n, dtype=np.float32)
+
+        dist = self._distances(vectors, self.templates)
+        classes = np.unique(self.labels)
+        per_class = np.stack([dist[:, self.labels == c].min(axis=1) for c in classes], axis=1)
+
+        order = np.argsort(per_class, axis=1)
+        best = per_class[np.arange(n), order[:, 0]]
+        labels = classes[order[:, 0]].tolist()
+        if len(classes) < 2:
+            return labels, np.zeros(n, dtype=np.float32)
+
+        second = per_class[np.arange(n), order[:, 1]]
+        margins = np.where(second > 0, (second - best) / np.maximum(second, 1e-6), 0.0)
+        margins[best > MAX_GLYPH_DISTANCE] = 0.0
+        return labels, margins.astype(np.float32)
+
+    @staticmethod
+    def _distances(a, b=None):
+        """RMS distance between every row of a and every row of b."""
+        if b is None:
+            b = a
+        sq = (a * a).sum(axis=1)[:, None] + (b * b).sum(axis=1)[None, :] - 2 * a @ b.T
+        return np.sqrt(np.maximum(sq, 0) / a.shape[1])
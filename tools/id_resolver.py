@@ -0,0 +1,384 @@
+"""
+ID Resolver
+===========
+Floor-wide unit ID assignment for extract-floorplan.py.
+
+Per-unit correction (substitute confusable digits until the ID lands in the
+expected range, take the first hit) can't see the rest of the floor: two
+units end up with the same ID while the real one goes missing. This module
+resolves every ID on the floor at once:
+
+  1. A confusion-neighborhood index over the expected range maps each ID's
+     confusion signature (digits folded into confusable classes, e.g. 5/9)
+     to the in-range IDs sharing it, so an OCR read's correction candidates
+     are one dict lookup — no enumeration of substitution combinations.
+  2. Overlapping boxes of one unit are resolved together. Unique, exact
+     in-range reads are anchors and keep their IDs.
+  3. Every other unit (duplicate, out-of-range or empty read) gets
+     candidates: confusion substitutions, a dropped leading digit, and IDs
+     continuing the numbering of touching neighbors along the aisle. Costs
+     grow with the number of digits changed, scaled by OCR confidence, and
+     shrink for each neighbor whose ID is one or two away.
+  4. Units and candidate IDs form a sparse bipartite graph. Each connected
+     component is solved as a min-cost assignment (Hungarian), with a
+     per-unit "no ID" option, so no in-range ID is assigned twice.
+
+Building the index is O(range size); everything else is linear in the
+number of units apart from the assignment, which only sees the small
+contested components.
+"""
+
+from collections import defaultdict
+
+import numpy as np
+
+import adjacency
+
+
+# Common OCR digit confusions (bidirectional)
+OCR_CONFUSIONS = {
+    '5': ['9'], '9': ['5'],
+    '6': ['8'], '8': ['6', '3'],
+    '3': ['8'], '1': ['7'], '7': ['1'],
+}
+
+# Assignment costs (lower is better)
+SUBSTITUTION_COST = 0.5    # per changed digit, plus the read's confidence
+DROPPED_DIGIT_COST = 1.0   # read lost its leading digit ("77" -> "477")
+SEQUENCE_ONLY_COST = 4.0   # ID suggested only by neighbors' numbering
+UNASSIGNED_COST = 8.0      # unit keeps no in-range ID
+SEQUENCE_BONUS = 0.75      # per touching neighbor whose ID is 1-2 away
+
+# Components larger than this are assigned greedily instead of exactly
+MAX_EXACT_COMPONENT = 400
+
+
+class ConfusionIndex:
+    """Confusion-neighborhood index over an expected ID range."""
+
+    def __init__(self, range_start, range_end, confusions=OCR_CONFUSIONS):
+        self.range_start = range_start
+        self.range_end = range_end
+        self.confusions = {d: set(alts) for d, alts in confusions.items()}
+
+        # Fold each group of mutually confusable digits onto one character
+        classes = {d: d for d in "0123456789"}
+        for digit, alts in confusions.items():
+            for alt in alts:
+                a, b = classes[digit], classes[alt]
+                for d, c in classes.items():
+                    if c == b:
+                        classes[d] = a
+        self._fold = str.maketrans(classes)
+
+        self.by_signature = defaultdict(list)
+        # (uid, suffix) per read a dropped leading digit leaves: the rest of
+        # the ID, and without its zeros too ("7" for 407, as OCR reads "07")
+        self.by_suffix = defaultdict(list)
+        for num in range(range_start, range_end + 1):
+            uid = str(num)
+            self.by_signature[self._signature(uid)].append(uid)
+            for suffix in {uid[1:], uid[1:].lstrip("0")} - {""}:
+                self.by_suffix[self._signature(suffix)].append((uid, suffix))
+
+    def _signature(self, uid):
+        return (len(uid), uid.translate(self._fold))
+
+    def in_range(self, uid):
+        # IDs are canonical integers: "002" is not unit 2
+        return uid.isdigit() and uid == str(int(uid)) and self.range_start <= int(uid) <= self.range_end
+
+    def substitutions(self, read, uid):
+        """Digits changed to turn `read` into `uid`, or None if not confusable."""
+        changed = 0
+        for a, b in zip(read, uid):
+            if a != b:
+                if b not in self.confusions.get(a, ()):
+                    return None
+                changed += 1
+        return changed
+
+    def candidates(self, read):
+        """In-range IDs `read` could be a misread of.
+
+        Returns (uid, substitutions, dropped_leading_digit) tuples, the read
+        itself included (0 substitutions) when it is in range.
+        """
+        found = []
+        for uid in self.by_signature.get(self._signature(read), ()):
+            n = self.substitutions(read, uid)
+            if n is not None:
+                found.append((uid, n, False))
+        for uid, suffix in self.by_suffix.get(self._signature(read), ()):
+            n = self.substitutions(read, suffix)
+            if n is not None:
+                found.append((uid, n, True))
+        return found
+
+    def best_fix(self, read):
+        """The single cheapest in-range candidate for `read`, if unambiguous."""
+        scored = sorted((n + (DROPPED_DIGIT_COST if dropped else 0), uid)
+                        for uid, n, dropped in self.candidates(read))
+        if not scored or (len(scored) > 1 and scored[0][0] == scored[1][0]):
+            return None
+        return scored[0][1]
+
+
+def _nearby_pairs(xs, ys, ws, hs, gap):
+    """Candidate box pairs (i, j, gap_x, gap_y), each pair once.
+
+    Boxes are hashed into a grid of cells about twice the typical box size,
+    so each box is only compared with boxes in the cells it touches.
+    gap_x/gap_y are the distances between the boxes on each axis (negative
+    when they overlap on that axis).
+    """
+    if not xs:
+        return
+    cell = max(1, int(2 * np.median(np.maximum(ws, hs))))
+
+    grid = defaultdict(list)
+    for i in range(len(xs)):
+        for cx in range((xs[i] - gap) // cell, (xs[i] + ws[i] + gap) // cell + 1):
+            for cy in range((ys[i] - gap) // cell, (ys[i] + hs[i] + gap) // cell + 1):
+                grid[cx, cy].append(i)
+
+    seen = set()
+    for members in grid.values():
+        for a, i in enumerate(members):
+            for j in members[a + 1:]:
+                if (i, j) in seen:
+                    continue
+                seen.add((i, j))
+                gap_x = max(xs[i], xs[j]) - min(xs[i] + ws[i], xs[j] + ws[j])
+                gap_y = max(ys[i], ys[j]) - min(ys[i] + hs[i], ys[j] + hs[j])
+                yield i, j, gap_x, gap_y
+
+
+def duplicate_groups(xs, ys, ws, hs):
+    """Group boxes that are detections of the same unit.
+
+    Two boxes are the same unit when their intersection covers at least
+    half the smaller box (e.g. a rescue-pass box a few pixels off a
+    detected one). Returns a group label per box.
+    """
+    xs, ys, ws, hs = (np.asarray(a).tolist() for a in (xs, ys, ws, hs))
+    group = list(range(len(xs)))
+
+    def find(i):
+        while group[i] != i:
+            group[i] = group[group[i]]
+            i = group[i]
+        return i
+
+    for i, j, gap_x, gap_y in _nearby_pairs(xs, ys, ws, hs, 0):
+        if gap_x < 0 and gap_y < 0 and gap_x * gap_y >= min(ws[i] * hs[i], ws[j] * hs[j]) / 2:
+            group[find(i)] = find(j)
+    return [find(i) for i in range(len(xs))]
+
+
+def resolve_ids(reads, confidences, boxes, index, fixed=None):
+    """Assign unique in-range IDs to a floor's units.
+
+    reads: OCR'd ID per unit; confidences: matching values in [0, 1];
+    boxes: (xs, ys, ws, hs) columns; index: ConfusionIndex for the range.
+    fixed: optional mask of units whose IDs are final (e.g. carried over
+    from a previous extraction); they keep their IDs and other units can't
+    take them.
+
+    Overlapping boxes of the same unit (see duplicate_groups) are resolved
+    as one unit, from the most confident in-range read among them, and all
+    get its ID.
+
+    Returns (ids, stats). ids[i] is the resolved ID: an in-range ID used by
+    no other unit, "" when the unit's in-range read went to a better
+    supported unit and no alternative was found, or the unchanged read when
+    it is out of range with no candidates at all. stats counts the units
+    "kept", "corrected", "sequenced" (recovered from neighbor numbering),
+    "cleared" and "unresolved".
+    """
+    n = len(reads)
+    xs, ys, ws, hs = boxes
+    fixed = np.zeros(n, dtype=bool) if fixed is None else np.asarray(fixed, dtype=bool)
+    ids = list(reads)
+    stats = {"kept": 0, "corrected": 0, "sequenced": 0, "cleared": 0, "unresolved": 0}
+    if not n:
+        return ids, stats
+
+    # One representative box per physical unit
+    members = defaultdict(list)
+    for i, g in enumerate(duplicate_groups(xs, ys, ws, hs)):
+        members[g].append(i)
+    rep_of = {}
+    for group in members.values():
+        rep = max(group, key=lambda i: (fixed[i], index.in_range(reads[i]), float(confidences[i])))
+        for i in group:
+            rep_of[i] = rep
+    reps = sorted(set(rep_of.values()))
+
+    # Anchors: fixed IDs, and exact in-range reads no other unit shares
+    read_count = defaultdict(int)
+    for i in reps:
+        read_count[reads[i]] += 1
+    anchored = {i for i in reps if index.in_range(reads[i]) and
+                (fixed[i] or read_count[reads[i]] == 1)}
+    taken = {reads[i] for i in anchored}
+    stats["kept"] = len(anchored)
+
+    neighbors = defaultdict(set)
+    for i, j in adjacency.wall_pairs(xs, ys, ws, hs, adjacency.default_gap(ws, hs)):
+        a, b = rep_of[i], rep_of[j]
+        if a != b:
+            neighbors[a].add(b)
+            neighbors[b].add(a)
+
+    # Candidate edges for every contested unit: unit -> {uid: cost}
+    edges = {}
+    for i in reps:
+        if i in anchored or fixed[i]:
+            continue
+        read, conf = reads[i], float(confidences[i])
+        options = {}
+        if read.isdigit():
+            for uid, subs, dropped in index.candidates(read):
+                cost = subs * (SUBSTITUTION_COST + conf) + (DROPPED_DIGIT_COST + conf if dropped else 0)
+                options[uid] = min(cost, options.get(uid, cost))
+        near = [int(reads[j]) for j in neighbors[i] if j in anchored]
+        for num in near:
+            for uid in (str(num - 1), str(num + 1)):
+                if index.in_range(uid) and uid not in options:
+                    options[uid] = SEQUENCE_ONLY_COST
+        for uid in list(options):
+            if uid in taken:
+                del options[uid]
+                continue
+            num = int(uid)
+            options[uid] -= SEQUENCE_BONUS * sum(1 for m in near if 0 < abs(m - num) <= 2)
+        edges[i] = options
+
+    # Connected components of the contested unit <-> candidate ID graph
+    parent = {}
+
+    def find(node):
+        while parent.setdefault(node, node) != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for i, options in edges.items():
+        find(("unit", i))
+        for uid in options:
+            parent[find(("id", uid))] = find(("unit", i))
+    components = defaultdict(list)
+    for i in edges:
+        components[find(("unit", i))].append(i)
+
+    resolved = {i: reads[i] for i in anchored}
+    for units in components.values():
+        for i, uid in _assign_component(units, edges).items():
+            read = reads[i]
+            if uid is not None:
+                resolved[i] = uid
+                if uid == read:
+                    stats["kept"] += 1
+                elif read.isdigit() and any(c[0] == uid for c in index.candidates(read)):
+                    stats["corrected"] += 1
+                else:
+                    stats["sequenced"] += 1
+            elif index.in_range(read):
+                resolved[i] = ""
+                stats["cleared"] += 1
+            else:
+                stats["unresolved"] += 1
+
+    for i in range(n):
+        ids[i] = resolved.get(rep_of[i], reads[i])
+    return ids, stats
+
+
+def _assign_component(units, edges):
+    """Min-cost unique assignment of candidate IDs to one component's units.
+
+    Returns {unit: uid or None}.
+    """
+    uids = sorted({uid for i in units for uid in edges[i]})
+    if not uids:
+        return {i: None for i in units}
+
+    if len(units) > MAX_EXACT_COMPONENT:
+        # Greedy: cheapest edges first
+        result = {i: None for i in units}
+        used = set()
+        for cost, i, uid in sorted((c, i, u) for i in units for u, c in edges[i].items()):
+            if cost < UNASSIGNED_COST and result[i] is None and uid not in used:
+                result[i] = uid
+                used.add(uid)
+        return result
+
+    # Columns: candidate IDs, then one "no ID" column per unit
+    big = 1e9
+    col = {uid: c for c, uid in enumerate(uids)}
+    width = len(uids) + len(units)
+    cost = np.full((len(units), width), big)
+    for r, i in enumerate(units):
+        for uid, c in edges[i].items():
+            cost[r, col[uid]] = c
+        cost[r, len(uids) + r] = UNASSIGNED_COST
+
+    assignment = _hungarian(cost.tolist())
+    return {i: (uids[c] if c < len(uids) else None)
+            for i, c in zip(units, assignment)}
+
+
+def _hungarian(cost):
+    """Min-cost assignment of n rows to distinct columns (n <= m).
+
+    Classic O(n^2 m) shortest augmenting path algorithm with potentials.
+    Returns the column chosen for each row.
+    """
+    n, m = len(cost), len(cost[0])
+    inf = float("inf")
+    u = [0.0] * (n + 1)
+    v = [0.0] * (m + 1)
+    p = [0] * (m + 1)
+    way = [0] * (m + 1)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = [inf] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            row = cost[i0 - 1]
+            delta = inf
+            j1 = 0
+            for j in range(1, m + 1):
+                if not used[j]:
+                    cur = row[j - 1] - u[i0] - v[j]
+                    if cur < minv[j]:
+                        minv[j] = cur
+                        way[j] = j0
+                    if minv[j] < delta:
+                        delta = minv[j]
+                        j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while True:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+            if j0 == 0:
+                break
+
+    assignment = [0] * n
+    for j in range(1, m + 1):
+        if p[j]:
+            assignment[p[j] - 1] = j - 1
+    return assignment
@@ -0,0 +1,254 @@
+"""
+Streaming JSON
+==============
+Reads and writes floor, facility and portfolio documents a unit at a time,
+so memory stays flat however many units a document holds
+(build-facility-json.py, validate-unit-mix.py, bench-json-stream.py).
+
+Reading: items(path, split) walks a document and yields (path, value)
+pairs. `split` lists the paths whose values are yielded one by one, with
+None matching any key or index; ("floors", None, "units", None) yields
+every unit of every floor separately. Containers on the way to a split
+path are walked; any other value is yielded whole. A floor document read
+with split [("units", None)] yields ("floor",), then ("units", 0), ...,
+then ("siteFeatures",) and so on. Empty containers on the way to a split
+path yield nothing.
+
+Writing: dump(doc, path, fmt) writes a document in which any list may be
+an iterator (a generator, iter(units), ...), written element by element
+as it's consumed.
+
+  pretty   indent=2, byte-identical to json.dump(doc, f, indent=2)
+  min      no whitespace; elements go through the C encoder, about twice
+           as fast as pretty
+  ndjson   line 1 is the document with every iterator written as [];
+           each later line is [path, element] for one element of the
+           iterator at `path` (["floors", 0, "units"], {...})
+
+items() reads all three formats; NDJSON is recognised by its .ndjson or
+.jsonl extension.
+"""
+
+import json
+import re
+from collections.abc import Iterator
+
+
+FORMATS = ("pretty", "min", "ndjson")
+
+CHUNK = 1 << 16  # characters read at a time
+
+_decoder = json.JSONDecoder()
+_whitespace = re.compile(r"[ \t\n\r]*")
+_number_tail = re.compile(r"[0-9.eE+-]*")
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+
+def _is_prefix(path, pattern):
+    return len(path) < len(pattern) and all(p is None or p == k for k, p in zip(path, pattern))
+
+
+def _matches(path, pattern):
+    return len(path) == len(pattern) and all(p is None or p == k for k, p in zip(path, pattern))
+
+
+def _descend(path, split):
+    """Walk into the value at `path` (rather than yield it whole)?"""
+    return (any(_is_prefix(path, p) for p in split) and
+            not any(_matches(path, p) for p in split))
+
+
+class _Scanner:
+    """Buffered reader handing out whole JSON values and single tokens."""
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        # Grow geometrically, so a large value isn't re-parsed chunk by chunk
+        data = self.f.read(max(CHUNK, len(self.buf) - self.pos))
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        self.eof = not data
+
+    def peek(self):
+        """Next non-whitespace character ("" at the end of input)."""
+        while True:
+            self.pos = _whitespace.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if self.eof:
+                return ""
+            self._fill()
+
+    def take(self, expected):
+        ch = self.peek()
+        if ch not in expected:
+            raise ValueError(f"Expected {' or '.join(map(repr, expected))} at "
+                             f"{ch!r} in {self.f.name}")
+        self.pos += 1
+        return ch
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self._fill()
+                continue
+            # A number running up to the end of the buffer ("12", "12.", "1e")
+            # may go on in the next chunk
+            if (not self.eof and isinstance(value, (int, float)) and
+                    _number_tail.match(self.buf, end).end() == len(self.buf)):
+                self._fill()
+                continue
+            self.pos = end
+            return value
+
+
+def _walk(scanner, path, split):
+    if not _descend(path, split):
+        yield path, scanner.value()
+        return
+    ch = scanner.peek()
+    if ch == "{":
+        scanner.take("{")
+        if scanner.peek() == "}":
+            scanner.take("}")
+            return
+        while True:
+            key = scanner.value()
+            scanner.take(":")
+            yield from _walk(scanner, path + (key,), split)
+            if scanner.take(",}") == "}":
+                return
+    elif ch == "[":
+        scanner.take("[")
+        if scanner.peek() == "]":
+            scanner.take("]")
+            return
+        index = 0
+        while True:
+            yield from _walk(scanner, path + (index,), split)
+            index += 1
+            if scanner.take(",]") == "]":
+                return
+    else:
+        yield path, scanner.value()
+
+
+def _flatten(value, path, split):
+    """items() over a value already in memory."""
+    if not _descend(path, split) or not isinstance(value, (dict, list)):
+        yield path, value
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            yield from _flatten(item, path + (key,), split)
+    else:
+        for index, item in enumerate(value):
+            yield from _flatten(item, path + (index,), split)
+
+
+def items(path, split=()):
+    """(path, value) pairs of a JSON or NDJSON document (see module docstring)."""
+    split = [tuple(p) for p in split]
+    with open(path, encoding="utf-8") as f:
+        if str(path).endswith((".ndjson", ".jsonl")):
+            yield from _flatten(json.loads(f.readline()), (), split)
+            counts = {}
+            for line in f:
+                if not line.strip():
+                    continue
+                where, item = json.loads(line)
+                where = tuple(where)
+                index = counts.get(where, 0)
+                counts[where] = index + 1
+                yield from _flatten(item, where + (index,), split)
+        else:
+            scanner = _Scanner(f)
+            yield from _walk(scanner, (), split)
+            if scanner.peek():
+                raise ValueError(f"Extra data after the document in {path}")
+
+
+# ---------------------------------------------------------------------------
+# Writing
+# ---------------------------------------------------------------------------
+
+_SCALARS = (str, int, float, type(None))
+
+
+def _streams(value):
+    """Does `value` hold an iterator anywhere?"""
+    if isinstance(value, _SCALARS):
+        return False
+    if isinstance(value, dict):
+        return any(_streams(v) for v in value.values())
+    if isinstance(value, list):
+        return any(_streams(v) for v in value)
+    return isinstance(value, Iterator)
+
+
+def _leaf(value, level, pretty):
+    if not pretty:
+        return json.dumps(value, separators=(",", ":"))
+    # Strings can't hold a raw newline, so every "\n" is a line break
+    return json.dumps(value, indent=2).replace("\n", "\n" + "  " * level)
+
+
+def _write(write, value, level, pretty):
+    if not _streams(value):
+        write(_leaf(value, level, pretty))
+        return
+    inner = "\n" + "  " * (level + 1) if pretty else ""
+    close = "\n" + "  " * level if pretty else ""
+    colon = ": " if pretty else ":"
+    if isinstance(value, dict):
+        opening, ending = "{", "}"
+        entries = ((json.dumps(k) + colon, v) for k, v in value.items())
+    else:
+        opening, ending = "[", "]"
+        entries = (("", v) for v in value)
+    write(opening)
+    first = True
+    for prefix, item in entries:
+        write(inner + prefix if first else "," + inner + prefix)
+        first = False
+        _write(write, item, level + 1, pretty)
+    write(ending if first else close + ending)
+
+
+def _header(value, path, streams):
+    """`value` with its iterators replaced by [], collected into `streams`."""
+    if isinstance(value, Iterator):
+        streams.append((path, value))
+        return []
+    if not _streams(value):
+        return value
+    if isinstance(value, dict):
+        return {k: _header(v, path + [k], streams) for k, v in value.items()}
+    return [_header(v, path + [i], streams) for i, v in enumerate(value)]
+
+
+def dump(doc, path, fmt="pretty"):
+    """Write `doc` to `path` in one of FORMATS, consuming its iterators."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown JSON format: {fmt} (expected one of {', '.join(FORMATS)})")
+    with open(path, "w", encoding="utf-8") as f:
+        if fmt == "ndjson":
+            streams = []
+            f.write(json.dumps(_header(doc, [], streams), separators=(",", ":")) + "\n")
+            for where, elements in streams:
+                for item in elements:
+                    f.write(json.dumps([where, item], separators=(",", ":")) + "\n")
+        else:
+            _write(f.write, doc, 0, fmt == "pretty")
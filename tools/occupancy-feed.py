@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Occupancy Feed Tool
+===================
+Inspects, updates and serves the occupancy feeds published by
+build-facility-json.py --feed (format: see occupancy.py).
+
+Usage:
+  python tools/occupancy-feed.py status  public/data --facility richland
+  python tools/occupancy-feed.py update  public/data --facility richland \\
+      --floor floor-1 --occupied 101,102 --vacated 205
+  python tools/occupancy-feed.py apply   public/data --facility richland -o facility.json
+  python tools/occupancy-feed.py compact public/data --facility richland
+  python tools/occupancy-feed.py serve   public/data --port 8765
+
+serve is a local stand-in for the occupancy service: it serves the feed
+directory as static files (geometry marked immutable, everything else
+no-cache) plus GET /<facility>/occupancy?since=V, which answers with just
+the deltas after V, or the snapshot and its deltas when V is too old.
+"""
+
+import argparse
+import json
+import sys
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import occupancy
+
+
+def cmd_status(feed, args):
+    latest = feed.latest()
+    version, bits = feed.occupancy()
+    geometry = feed.geometry(latest)
+    print(f"{feed.facility_id}: version {version}, geometry {latest['geometry']}")
+    print(f"  Snapshot: {latest['snapshot']}, deltas: {len(latest['deltas'])}")
+    for floor in geometry['floors']:
+        occ = bits[floor['id']]
+        print(f"  {floor['id']}: {len(occ)} units, {sum(occ)} occupied, "
+              f"{len(occ) - sum(occ)} vacant")
+    size = sum(p.stat().st_size for p in feed.dir.glob('*.json'))
+    print(f"  Occupancy files: {size:,} bytes "
+          f"(geometry: {feed.geometry_path(latest['geometry']).stat().st_size:,} bytes)")
+
+
+def cmd_update(feed, args):
+    latest = feed.latest()
+    geometry = feed.geometry(latest)
+    floor = next((f for f in geometry['floors'] if f['id'] == args.floor), None)
+    if floor is None:
+        print(f"Error: no floor {args.floor} in {feed.facility_id}")
+        sys.exit(1)
+
+    index = {u['id']: i for i, u in enumerate(floor['units'])}
+    change = {}
+    for key in ('occupied', 'vacated'):
+        ids = [uid for uid in (getattr(args, key) or '').split(',') if uid]
+        unknown = [uid for uid in ids if uid not in index]
+        if unknown:
+            print(f"Error: unknown units on {args.floor}: {', '.join(unknown)}")
+            sys.exit(1)
+        change[key] = sorted(index[uid] for uid in ids)
+
+    # Drop no-op entries so a delta only lists real changes
+    _, bits = feed.occupancy()
+    occ = bits[args.floor]
+    change['occupied'] = [i for i in change['occupied'] if not occ[i]]
+    change['vacated'] = [i for i in change['vacated'] if occ[i]]
+    if not change['occupied'] and not change['vacated']:
+        print(f"No change; feed stays at version {latest['version']}")
+        return
+    version = feed.append({args.floor: change})
+    print(f"Version {version}: {len(change['occupied'])} occupied, "
+          f"{len(change['vacated'])} vacated on {args.floor}")
+
+
+def cmd_apply(feed, args):
+    version, bits = feed.occupancy(args.version)
+    facility = occupancy.merge_facility(feed.geometry(), bits)
+    output_path = Path(args.output)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump(facility, f, indent=2)
+    print(f"Facility at version {version} saved to: {output_path}")
+
+
+def cmd_compact(feed, args):
+    latest = feed.latest()
+    removed = feed.compact()
+    print(f"Compacted {len(latest['deltas'])} deltas into snapshot {latest['version']}; "
+          f"removed {removed} files")
+
+
+def occupancy_response(feed, since):
+    """Body for GET /<facility>/occupancy?since=V.
+
+    Clients at a version the deltas still cover get only those deltas;
+    anyone else (no version, compacted away, other geometry) gets the
+    snapshot too.
+    """
+    latest = feed.latest()
+    deltas_from = latest['snapshot']
+    response = {'version': latest['version'], 'geometry': latest['geometry']}
+    if since is not None and latest['snapshot'] <= since <= latest['version']:
+        deltas_from = since
+    else:
+        response['snapshot'] = feed.snapshot(latest['snapshot'])
+    response['deltas'] = [feed.delta(v) for v in range(deltas_from + 1, latest['version'] + 1)]
+    return response
+
+
+def make_handler(feed_dir):
+    class FeedHandler(SimpleHTTPRequestHandler):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, directory=str(feed_dir), **kwargs)
+
+        def end_headers(self):
+            # The Vite dev server runs on another port
+            self.send_header('Access-Control-Allow-Origin', '*')
+            if '.geometry.' in self.path:
+                self.send_header('Cache-Control', 'public, max-age=31536000, immutable')
+            else:
+                self.send_header('Cache-Control', 'no-cache')
+            super().end_headers()
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = url.path.strip('/').split('/')
+            if len(parts) != 2 or parts[1] != 'occupancy':
+                return super().do_GET()
+
+            feed = occupancy.Feed(feed_dir, parts[0])
+            if feed.latest() is None:
+                return self.send_error(404, f"No occupancy feed for {parts[0]}")
+            since = parse_qs(url.query).get('since', [None])[0]
+            try:
+                since = int(since) if since is not None else None
+            except ValueError:
+                return self.send_error(400, f"Bad version: {since}")
+            body = json.dumps(occupancy_response(feed, since)).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return FeedHandler
+
+
+def cmd_serve(args):
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(Path(args.feed)))
+    print(f"Serving {args.feed} on http://{args.host}:{args.port}/ (Ctrl+C to stop)")
+    print(f"  GET /<facility>/occupancy?since=<version>")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect, update and serve occupancy feeds')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def add(name, help_text):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument('feed', help='Feed directory (build-facility-json.py --feed)')
+        if name != 'serve':
+            p.add_argument('--facility', default='richland', help='Facility ID (default: richland)')
+        return p
+
+    add('status', 'Show the current version, snapshot/delta counts and occupancy per floor')
+    p = add('update', 'Append a delta marking units occupied/vacated')
+    p.add_argument('--floor', required=True, help='Floor ID (e.g. floor-1)')
+    p.add_argument('--occupied', help='Comma-separated unit IDs that became occupied')
+    p.add_argument('--vacated', help='Comma-separated unit IDs that became vacant')
+    p = add('apply', 'Write the combined facility JSON at a version (snapshot + deltas)')
+    p.add_argument('--output', '-o', required=True, help='Output facility JSON')
+    p.add_argument('--version', type=int, default=None, help='Feed version (default: latest)')
+    add('compact', 'Fold all deltas into a new snapshot and delete unreferenced files')
+    p = add('serve', 'Serve the feed over HTTP as a local stand-in for the occupancy service')
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        cmd_serve(args)
+        return
+
+    feed = occupancy.Feed(args.feed, args.facility)
+    if feed.latest() is None:
+        print(f"Error: no occupancy feed for {args.facility} in {args.feed}")
+        sys.exit(1)
+    commands = {'status': cmd_status, 'update': cmd_update, 'apply': cmd_apply,
+                'compact': cmd_compact}
+    try:
+        commands[args.command](feed, args)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+"""
+Occupancy Feed
+==============
+Splits a facility document into immutable geometry and a versioned
+occupancy feed, so an availability change ships a few bytes instead of
+the whole facility JSON (build-facility-json.py --feed, occupancy-feed.py).
+
+Layout of a feed directory, for facility <id>:
+
+  <id>.geometry.<hash>.json     floors, units (without "occ") and site
+                                features; named by a hash of its content,
+                                so it can be cached forever
+  <id>.occupancy/latest.json    current version, the snapshot it builds on
+                                and the deltas since; short-lived
+  <id>.occupancy/snapshot-<v>.json
+                                {"version", "geometry", "floors": {floor
+                                id: bitset}}
+  <id>.occupancy/delta-<v>.json {"from": v-1, "to": v, "floors": {floor id:
+                                {"occupied": [...], "vacated": [...]}}}
+
+A bitset is base64 of one bit per unit, bit i = floors[f].units[i] of the
+geometry file (LSB first within each byte). Delta entries are unit indexes
+too. A delta never crosses a geometry change: new geometry always starts
+from a fresh snapshot.
+"""
+
+import base64
+import hashlib
+import json
+import os
+from pathlib import Path
+
+
+# ---------------------------------------------------------------------------
+# Bitsets
+# ---------------------------------------------------------------------------
+
+def pack_bits(bits):
+    """Base64 bitset of a sequence of 0/1 (or bool) values."""
+    data = bytearray((len(bits) + 7) // 8)
+    for i, bit in enumerate(bits):
+        if bit:
+            data[i >> 3] |= 1 << (i & 7)
+    return base64.b64encode(bytes(data)).decode("ascii")
+
+
+def unpack_bits(text, count):
+    """List of `count` 0/1 values from a base64 bitset."""
+    data = base64.b64decode(text)
+    if len(data) != (count + 7) // 8:
+        raise ValueError(f"Bitset holds {len(data) * 8} bits, expected {count}")
+    return [(data[i >> 3] >> (i & 7)) & 1 for i in range(count)]
+
+
+# ---------------------------------------------------------------------------
+# Geometry / occupancy split
+# ---------------------------------------------------------------------------
+
+def split_facility(facility):
+    """(geometry document, {floor id: [occ per unit]}) of a facility document."""
+    geometry = dict(facility)
+    geometry["floors"] = []
+    occupancy = {}
+    for floor in facility["floors"]:
+        units = [{k: v for k, v in u.items() if k != "occ"} for u in floor["units"]]
+        geometry["floors"].append({**floor, "units": units})
+        occupancy[floor["id"]] = [1 if u.get("occ") else 0 for u in floor["units"]]
+    return geometry, occupancy
+
+
+def merge_facility(geometry, occupancy):
+    """The combined facility document: geometry with "occ" on every unit."""
+    facility = dict(geometry)
+    facility["floors"] = []
+    for floor in geometry["floors"]:
+        bits = occupancy[floor["id"]]
+        units = []
+        for unit, occ in zip(floor["units"], bits):
+            # Keep "occ" where the builder puts it, right after "type"
+            entry = {}
+            for key, value in unit.items():
+                entry[key] = value
+                if key == "type":
+                    entry["occ"] = occ
+            entry.setdefault("occ", occ)
+            units.append(entry)
+        facility["floors"].append({**floor, "units": units})
+    return facility
+
+
+def geometry_hash(geometry):
+    """Short content hash of a geometry document (key order independent)."""
+    text = json.dumps(geometry, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+
+def diff(old, new):
+    """Delta floors turning occupancy `old` into `new` (same geometry)."""
+    floors = {}
+    for floor_id, bits in new.items():
+        before = old[floor_id]
+        occupied = [i for i, (a, b) in enumerate(zip(before, bits)) if b and not a]
+        vacated = [i for i, (a, b) in enumerate(zip(before, bits)) if a and not b]
+        if occupied or vacated:
+            floors[floor_id] = {"occupied": occupied, "vacated": vacated}
+    return floors
+
+
+def apply_delta(occupancy, delta):
+    """New occupancy with a delta's floors applied (the input is not modified)."""
+    result = {floor_id: list(bits) for floor_id, bits in occupancy.items()}
+    for floor_id, change in delta["floors"].items():
+        bits = result[floor_id]
+        for i in change.get("occupied", []):
+            bits[i] = 1
+        for i in change.get("vacated", []):
+            bits[i] = 0
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Feed directory
+# ---------------------------------------------------------------------------
+
+class Feed:
+    """One facility's files in a feed directory."""
+
+    def __init__(self, feed_dir, facility_id):
+        self.root = Path(feed_dir)
+        self.facility_id = facility_id
+        self.dir = self.root / f"{facility_id}.occupancy"
+
+    def geometry_path(self, geometry_id):
+        return self.root / f"{self.facility_id}.geometry.{geometry_id}.json"
+
+    def snapshot_path(self, version):
+        return self.dir / f"snapshot-{version}.json"
+
+    def delta_path(self, version):
+        return self.dir / f"delta-{version}.json"
+
+    def latest(self):
+        """The latest.json index, or None for a feed that doesn't exist yet."""
+        path = self.dir / "latest.json"
+        if not path.exists():
+            return None
+        return _read(path)
+
+    def geometry(self, latest=None):
+        latest = latest or self.latest()
+        return _read(self.geometry_path(latest["geometry"]))
+
+    def snapshot(self, version):
+        return _read(self.snapshot_path(version))
+
+    def delta(self, version):
+        return _read(self.delta_path(version))
+
+    def occupancy(self, version=None):
+        """(version, {floor id: bits}) at `version` (default: latest).
+
+        Raises ValueError for a version the feed no longer (or never) had.
+        """
+        latest = self.latest()
+        if latest is None:
+            raise ValueError(f"No occupancy feed for {self.facility_id} in {self.root}")
+        version = latest["version"] if version is None else version
+        if not latest["snapshot"] <= version <= latest["version"]:
+            raise ValueError(f"Version {version} is not in the feed "
+                             f"(available: {latest['snapshot']}-{latest['version']})")
+
+        geometry = self.geometry(latest)
+        counts = {floor["id"]: len(floor["units"]) for floor in geometry["floors"]}
+        snapshot = self.snapshot(latest["snapshot"])
+        occupancy = {floor_id: unpack_bits(bits, counts[floor_id])
+                     for floor_id, bits in snapshot["floors"].items()}
+        for v in range(latest["snapshot"] + 1, version + 1):
+            occupancy = apply_delta(occupancy, self.delta(v))
+        return version, occupancy
+
+    def publish(self, facility):
+        """Publish a facility document; returns the new version (or the
+        current one when nothing changed).
+
+        Unchanged geometry with changed occupancy appends a delta; new
+        geometry writes its file and starts over from a snapshot.
+        """
+        geometry, occupancy = split_facility(facility)
+        geometry_id = geometry_hash(geometry)
+        path = self.geometry_path(geometry_id)
+        if not path.exists():
+            _write(path, geometry)
+
+        latest = self.latest()
+        if latest is None or latest["geometry"] != geometry_id:
+            version = latest["version"] + 1 if latest else 1
+            self._write_snapshot(version, geometry_id, occupancy)
+            return version
+
+        version, current = self.occupancy()
+        floors = diff(current, occupancy)
+        if not floors:
+            return version
+        return self.append(floors)
+
+    def append(self, floors):
+        """Append a delta ({floor id: {"occupied", "vacated"}}); returns its version."""
+        latest = self.latest()
+        version = latest["version"] + 1
+        _write(self.delta_path(version), {"from": version - 1, "to": version, "floors": floors})
+        latest["version"] = version
+        latest["deltas"].append(version)
+        _write(self.dir / "latest.json", latest)
+        return version
+
+    def compact(self):
+        """Fold every delta into a snapshot at the latest version.
+
+        Snapshots, deltas and geometry files the new index no longer
+        references are deleted. Returns the number of files removed.
+        """
+        latest = self.latest()
+        version, occupancy = self.occupancy()
+        if latest["deltas"]:
+            self._write_snapshot(version, latest["geometry"], occupancy)
+
+        keep = {self.snapshot_path(version).name, "latest.json"}
+        removed = 0
+        for path in self.dir.glob("*.json"):
+            if path.name not in keep:
+                path.unlink()
+                removed += 1
+        for path in self.root.glob(f"{self.facility_id}.geometry.*.json"):
+            if path != self.geometry_path(latest["geometry"]):
+                path.unlink()
+                removed += 1
+        return removed
+
+    def _write_snapshot(self, version, geometry_id, occupancy):
+        _write(self.snapshot_path(version), {
+            "version": version,
+            "geometry": geometry_id,
+            "floors": {floor_id: pack_bits(bits) for floor_id, bits in occupancy.items()},
+        })
+        _write(self.dir / "latest.json", {
+            "facility": self.facility_id,
+            "geometry": geometry_id,
+            "version": version,
+            "snapshot": version,
+            "deltas": [],
+        })
+
+
+def _read(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write(path, data):
+    # Write-then-rename, so the service never serves a partial file
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp, path)
@@ -0,0 +1,128 @@
+"""
+OCR Backends
+============
+Pluggable Tesseract engines for extract-floorplan.py.
+
+  pytesseract  Shells out to the `tesseract` binary for every image: each
+               call writes a temp file, forks a process and reloads the
+               LSTM model. Always available when tesseract is installed.
+  tesserocr    In-process binding to the Tesseract C++ API. Keeps one
+               initialized TessBaseAPI per (OEM, PSM, whitelist) config, so
+               the model loads once per worker. Optional:
+                 pip install tesserocr
+
+Both return (text, confidence) where confidence is Tesseract's mean word
+confidence scaled to [0, 1] (0 when nothing was recognized).
+
+Backends are not thread-safe; create one per worker process or thread.
+"""
+
+import numpy as np
+
+
+DIGIT_WHITELIST = "0123456789"
+
+
+class PytesseractBackend:
+    """Tesseract via the pytesseract subprocess wrapper."""
+
+    name = "pytesseract"
+
+    def __init__(self):
+        import pytesseract
+        self._tess = pytesseract
+
+    def read(self, image, psm=7, oem=None, whitelist=None):
+        """OCR a grayscale/RGB array as a single block of text."""
+        config = f"--psm {psm}"
+        if oem is not None:
+            config = f"--oem {oem} " + config
+        if whitelist:
+            config += f" -c tessedit_char_whitelist={whitelist}"
+
+        data = self._tess.image_to_data(image, config=config,
+                                        output_type=self._tess.Output.DICT)
+        words = []
+        confs = []
+        for text, conf in zip(data["text"], data["conf"]):
+            conf = float(conf)
+            if text.strip():
+                words.append(text.strip())
+            if conf >= 0 and text.strip():
+                confs.append(conf)
+        text = " ".join(words)
+        return text, (sum(confs) / len(confs) / 100.0 if confs else 0.0)
+
+    def close(self):
+        pass
+
+
+class TesserocrBackend:
+    """Tesseract in-process via tesserocr, one warm TessBaseAPI per config."""
+
+    name = "tesserocr"
+
+    def __init__(self):
+        import tesserocr
+        from PIL import Image
+        self._tesserocr = tesserocr
+        self._image = Image
+        self._apis = {}
+
+    def _api(self, psm, oem, whitelist):
+        key = (psm, oem, whitelist)
+        api = self._apis.get(key)
+        if api is None:
+            tr = self._tesserocr
+            api = tr.PyTessBaseAPI(psm=psm, oem=oem if oem is not None else tr.OEM.DEFAULT)
+            if whitelist:
+                api.SetVariable("tessedit_char_whitelist", whitelist)
+            self._apis[key] = api
+        return api
+
+    def read(self, image, psm=7, oem=None, whitelist=None):
+        """OCR a grayscale/RGB array as a single block of text."""
+        api = self._api(psm, oem, whitelist)
+        api.SetImage(self._image.fromarray(np.ascontiguousarray(image)))
+        text = api.GetUTF8Text().strip()
+        conf = api.MeanTextConf() if text else 0
+        return text, max(conf, 0) / 100.0
+
+    def close(self):
+        for api in self._apis.values():
+            api.End()
+        self._apis.clear()
+
+
+BACKENDS = {
+    PytesseractBackend.name: PytesseractBackend,
+    TesserocrBackend.name: TesserocrBackend,
+}
+
+
+def available_backends():
+    """Names of the backends whose dependencies import cleanly."""
+    names = []
+    for name, cls in BACKENDS.items():
+        try:
+            cls().close()
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def get_backend(name="auto"):
+    """Create an OCR backend by name.
+
+    "auto" prefers the in-process tesserocr engine and falls back to
+    pytesseract when tesserocr isn't installed.
+    """
+    if name == "auto":
+        try:
+            return TesserocrBackend()
+        except ImportError:
+            return PytesseractBackend()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown OCR backend '{name}' (choose from: auto, {', '.join(BACKENDS)})")
+    return BACKENDS[name]()
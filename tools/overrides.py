@@ -0,0 +1,164 @@
+"""
+Overrides
+=========
+Hand corrections to an extracted floor, kept in a small JSON file and
+applied at the end of every extraction (extract-floorplan.py) and facility
+build (build-facility-json.py), so fixing one bad ID is an edit to this
+file instead of a full rerun, and the fix survives later reruns.
+
+  {"units": [
+    {"id": "477", "at": [2215, 3490], "set": {"id": "478"}},
+    {"id": "228", "set": {"x": 1204, "w": 160}},
+    {"at": [905, 410], "delete": true},
+    {"add": {"id": "418", "x": 1500, "y": 2200, "w": 75, "h": 159}}
+  ]}
+
+Coordinates are floor JSON coordinates (after --target-width). An entry
+selects the one unit with ID "id" whose box contains the point "at"
+(either may be left out); "set" changes its ID and/or box, "delete"
+removes it. "add" adds a unit. An entry that selects several units is
+skipped with a warning (add "at" to pick one).
+
+Entries are idempotent: one whose change is already in place counts as
+unchanged rather than failing to match (for a set with "at", the point
+must lie inside the unit's new box too), so the same file can be applied
+to a fresh extraction, to a floor JSON that already has it applied (the
+build after an extraction), and again after every rerun.
+
+By default a floor JSON's overrides live next to it, in
+<floor>.overrides.json (default_path).
+"""
+
+import json
+from pathlib import Path
+
+
+FIELDS = ("id", "x", "y", "w", "h")
+
+
+def default_path(floor_json):
+    """richland-floor1.json -> richland-floor1.overrides.json"""
+    return Path(floor_json).with_suffix(".overrides.json")
+
+
+def _check(entry, n):
+    if not isinstance(entry, dict):
+        raise ValueError(f"Override {n}: expected an object, got {entry!r}")
+    actions = [key for key in ("set", "delete", "add") if key in entry]
+    if len(actions) != 1:
+        raise ValueError(f"Override {n}: needs exactly one of set, delete, add")
+    if "at" in entry and (not isinstance(entry["at"], list) or len(entry["at"]) != 2):
+        raise ValueError(f"Override {n}: \"at\" must be [x, y]")
+    if actions[0] == "add":
+        unit = entry["add"]
+        if not isinstance(unit, dict) or any(k not in unit for k in FIELDS[1:]):
+            raise ValueError(f"Override {n}: \"add\" needs x, y, w and h")
+    elif "id" not in entry and "at" not in entry:
+        raise ValueError(f"Override {n}: needs \"id\" and/or \"at\" to select a unit")
+    if actions[0] == "set":
+        unknown = sorted(set(entry["set"]) - set(FIELDS))
+        if unknown or not entry["set"]:
+            raise ValueError(f"Override {n}: \"set\" takes {', '.join(FIELDS)}"
+                             + (f", not {', '.join(unknown)}" if unknown else ""))
+
+
+def load(path):
+    """The entries of an overrides file; ValueError if one is malformed."""
+    with open(path) as f:
+        entries = json.load(f).get("units", [])
+    for n, entry in enumerate(entries, 1):
+        _check(entry, n)
+    return entries
+
+
+def _contains(unit, point):
+    px, py = point
+    return unit["x"] <= px < unit["x"] + unit["w"] and unit["y"] <= py < unit["y"] + unit["h"]
+
+
+def _in_place(unit, entry):
+    """Whether `unit` is what a set entry's selection looks like once applied:
+    it has the new values, the ID the entry leaves it with, and (with "at")
+    still contains the point."""
+    changes = entry["set"]
+    return (all(unit[k] == v for k, v in changes.items())
+            and unit["id"] == changes.get("id", entry.get("id", unit["id"]))
+            and ("at" not in entry or _contains(unit, entry["at"])))
+
+
+def plan(entries, units):
+    """Resolve entries against `units` (dicts with id/x/y/w/h).
+
+    Every entry is matched against the units as given, so entries don't
+    depend on each other's order. Returns a dict:
+
+      set        {unit index: {field: new value}}
+      delete     sorted unit indexes to remove
+      add        unit dicts to add
+      applied    entries that changed something
+      unchanged  entries already in place
+      skipped    warnings for entries that matched no unit or several
+    """
+    result = {"set": {}, "delete": set(), "add": [], "applied": 0, "unchanged": 0, "skipped": []}
+    for n, entry in enumerate(entries, 1):
+        if "add" in entry:
+            unit = {k: entry["add"].get(k, "") for k in FIELDS}
+            if any(all(u[k] == unit[k] for k in FIELDS) for u in units):
+                result["unchanged"] += 1
+            else:
+                result["add"].append(unit)
+                result["applied"] += 1
+            continue
+
+        matches = [i for i, u in enumerate(units)
+                   if ("id" not in entry or u["id"] == entry["id"])
+                   and ("at" not in entry or _contains(u, entry["at"]))]
+        if len(matches) > 1:
+            result["skipped"].append(f"override {n} matches {len(matches)} units; "
+                                     f"add \"at\" to pick one")
+            continue
+
+        if "delete" in entry:
+            # Nothing left to match: deleted by an earlier run
+            if matches:
+                result["delete"].add(matches[0])
+                result["applied"] += 1
+            else:
+                result["unchanged"] += 1
+            continue
+
+        changes = entry["set"]
+        if matches:
+            unit = units[matches[0]]
+            changed = {k: v for k, v in changes.items() if unit[k] != v}
+            if changed:
+                result["set"].setdefault(matches[0], {}).update(changed)
+                result["applied"] += 1
+            else:
+                result["unchanged"] += 1
+        elif any(_in_place(u, entry) for u in units):
+            # The selected ID or box is gone because the change is in place
+            result["unchanged"] += 1
+        else:
+            result["skipped"].append(f"override {n} matches no unit")
+    result["delete"] = sorted(result["delete"])
+    return result
+
+
+def apply(units, entries):
+    """Apply entries to a list of unit dicts; returns (units, plan)."""
+    result = plan(entries, units)
+    deleted = set(result["delete"])
+    out = []
+    for i, unit in enumerate(units):
+        if i in deleted:
+            continue
+        out.append({**unit, **result["set"][i]} if i in result["set"] else unit)
+    out.extend(result["add"])
+    return out, result
+
+
+def summary(result):
+    """One-line summary of a plan, for the tools' logs."""
+    return (f"{result['applied']} applied, {result['unchanged']} already in place, "
+            f"{len(result['skipped'])} skipped")
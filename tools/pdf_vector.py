@@ -0,0 +1,117 @@
+"""
+PDF Vector Source
+=================
+Reads site plans that are still vector PDFs for extract-floorplan.py.
+
+Unit rectangles in a CAD/Illustrator export are filled paths and unit IDs
+are text runs, so there is nothing to detect or OCR: this module lists a
+page's filled axis-aligned rectangles (with their fill color) and its text
+words straight from the drawing operators, in output-pixel coordinates
+(page points scaled by dpi / 72, page rotation applied). It can also
+render the page, for debug overlays and for the raster fallback when a
+page has no vector units (e.g. a scanned plan).
+
+Requires PyMuPDF, imported only when a PDF is opened:
+  pip install pymupdf
+"""
+
+import cv2
+import numpy as np
+
+
+def _fitz():
+    try:
+        import pymupdf as fitz
+    except ImportError:
+        import fitz
+    return fitz
+
+
+def _fills_bbox(lines):
+    """Whether connected line segments outline a polygon whose area is its
+    bounding box's (a rectangle, however many segments it's drawn with,
+    rather than an L or U); the path is closed back to its start."""
+    points = [lines[0][1]]
+    for _, p, q in lines:
+        if p != points[-1]:
+            return False  # several subpaths
+        points.append(q)
+    xs = [p.x for p in points]
+    ys = [p.y for p in points]
+    area = abs(sum(x0 * y1 - x1 * y0 for x0, y0, x1, y1 in
+                   zip(xs, ys, xs[1:] + xs[:1], ys[1:] + ys[:1]))) / 2
+    box = (max(xs) - min(xs)) * (max(ys) - min(ys))
+    return box > 0 and abs(area - box) <= 1e-6 * box
+
+
+class PdfPage:
+    """One page of a vector site plan."""
+
+    def __init__(self, path, page_number=1, dpi=288):
+        fitz = _fitz()
+        self._fitz = fitz
+        self.doc = fitz.open(str(path))
+        if not 1 <= page_number <= self.doc.page_count:
+            count = self.doc.page_count
+            self.doc.close()
+            raise ValueError(f"{path} has {count} page(s), no page {page_number}")
+        self.page = self.doc[page_number - 1]
+        self.scale = dpi / 72
+        # Unrotated page space -> rotated, scaled output pixels
+        self.matrix = self.page.rotation_matrix * fitz.Matrix(self.scale, self.scale)
+
+    @property
+    def size(self):
+        """(width, height) of the page in output pixels."""
+        rect = self.page.rect
+        return round(rect.width * self.scale), round(rect.height * self.scale)
+
+    def filled_rects(self):
+        """Filled axis-aligned rectangles as (x, y, w, h, (r, g, b)).
+
+        Colors are 0-255 RGB. Covers `re` operators, rectangular quads, and
+        closed paths made only of horizontal/vertical lines that fill their
+        bounding box (how many CAD exports draw rectangles). Curved or
+        slanted shapes are skipped.
+        """
+        rects = []
+        for drawing in self.page.get_drawings():
+            fill = drawing.get("fill")
+            if fill is None:
+                continue
+            if len(fill) == 1:
+                fill = fill * 3
+            color = tuple(round(c * 255) for c in fill[:3])
+            for rect in self._drawing_rects(drawing):
+                r = rect * self.matrix
+                if r.width >= 1 and r.height >= 1:
+                    rects.append((round(r.x0), round(r.y0), round(r.width), round(r.height), color))
+        return rects
+
+    def _drawing_rects(self, drawing):
+        items = drawing["items"]
+        if all(item[0] == "re" for item in items):
+            return [item[1] for item in items]
+        if all(item[0] == "qu" for item in items):
+            return [item[1].rect for item in items if item[1].is_rectangular]
+        if all(item[0] == "l" for item in items):
+            if all(p.x == q.x or p.y == q.y for _, p, q in items) and _fills_bbox(items):
+                return [drawing["rect"]]
+        return []
+
+    def words(self):
+        """Text words as (x, y, w, h, text)."""
+        words = []
+        for x0, y0, x1, y1, text, *_ in self.page.get_text("words"):
+            r = self._fitz.Rect(x0, y0, x1, y1) * self.matrix
+            words.append((round(r.x0), round(r.y0), round(r.width), round(r.height), text))
+        return words
+
+    def render(self):
+        """Rasterize the page to a BGR image of `size`."""
+        pix = self.page.get_pixmap(matrix=self._fitz.Matrix(self.scale, self.scale), alpha=False)
+        rgb = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+        return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+
+    def close(self):
+        self.doc.close()
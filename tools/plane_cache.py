@@ -0,0 +1,148 @@
+"""
+Plane Cache
+===========
+Decoded-image cache shared by extract-floorplan.py and validate-render.py.
+
+Decoding a 4800x5200 site map PNG and converting it to HSV/RGB/gray takes
+longer than several pipeline stages, and every tool run used to repeat it.
+With a cache directory, each plane is saved once as an uncompressed .npy
+file and later runs memory-map it read-only (np.load(mmap_mode="r")):
+pages are shared through the OS page cache, so loading is ~free and
+nothing is copied until a tool writes to a plane (none do).
+
+Layout, keyed by the SHA-1 of the source file's bytes (not its path or
+mtime, so a copied or touched file still hits):
+
+  <cache_dir>/<source hash>/img.npy, hsv.npy, rgb.npy, gray.npy
+  <cache_dir>/<source hash>/masks-<threshold hash>/green.npy, blue.npy, ...
+  <cache_dir>/<source hash>/masks-<threshold hash>/<name>.json
+
+Color masks depend on the HSV thresholds as well, so they are keyed by
+those values too; changing a threshold only rebuilds the masks. Small
+per-image results derived from the masks (e.g. site features) are saved
+beside them as JSON with save_result().
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+
+PLANES = ("img", "hsv", "rgb", "gray")
+
+_CONVERSIONS = {
+    "hsv": cv2.COLOR_BGR2HSV,
+    "rgb": cv2.COLOR_BGR2RGB,
+    "gray": cv2.COLOR_BGR2GRAY,
+}
+
+
+def convert(img, masks=None, keys=PLANES, hsv=None):
+    """Compute planes in memory, without a cache.
+
+    `masks` maps a mask name to (lower, upper) HSV bounds; they are
+    thresholded on `hsv` if given, else on the HSV plane.
+    """
+    planes = {"img": img} if "img" in keys else {}
+    for key in keys:
+        if key in _CONVERSIONS:
+            planes[key] = cv2.cvtColor(img, _CONVERSIONS[key])
+    if masks and hsv is None:
+        hsv = planes["hsv"] if "hsv" in planes else cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    for name, (lower, upper) in (masks or {}).items():
+        planes[name] = cv2.inRange(hsv, lower, upper)
+    return planes
+
+
+def source_hash(path):
+    """SHA-1 of a file's contents (first 20 hex digits)."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:20]
+
+
+def thresholds_key(masks):
+    """Stable short hash of mask thresholds ({name: (lower, upper)})."""
+    values = {name: [np.asarray(bound).tolist() for bound in bounds]
+              for name, bounds in sorted(masks.items())}
+    return hashlib.sha1(json.dumps(values).encode()).hexdigest()[:12]
+
+
+def load_planes(path, cache_dir, masks=None, keys=PLANES):
+    """Planes for the image at `path`, memory-mapped from `cache_dir`.
+
+    Missing planes are decoded/converted once and written to the cache.
+    Returns a dict with `keys` plus one entry per mask name; arrays are
+    read-only memmaps. Raises ValueError if the image can't be decoded.
+    """
+    path = Path(path)
+    root = Path(cache_dir) / source_hash(path)
+    files = {key: root / f"{key}.npy" for key in keys}
+    if masks:
+        mask_dir = root / f"masks-{thresholds_key(masks)}"
+        files.update({name: mask_dir / f"{name}.npy" for name in masks})
+
+    missing = [key for key, file in files.items() if not file.exists()]
+    if missing:
+        cached = {key: np.load(root / f"{key}.npy", mmap_mode="r")
+                  for key in ("img", "hsv") if (root / f"{key}.npy").exists()}
+        img = cached.get("img")
+        if img is None:
+            img = cv2.imread(str(path))
+            if img is None:
+                raise ValueError(f"Could not read image: {path}")
+        built = convert(img, {name: masks[name] for name in missing if name not in PLANES},
+                        [key for key in PLANES if key in missing], cached.get("hsv"))
+        for key in missing:
+            _save(files[key], built[key])
+        _write_meta(root, {"source": str(path), "shape": list(img.shape)})
+        if masks:
+            _write_meta(mask_dir, {name: [np.asarray(bound).tolist() for bound in bounds]
+                                   for name, bounds in masks.items()})
+
+    return {key: np.load(file, mmap_mode="r") for key, file in files.items()}
+
+
+def load_result(path, cache_dir, name, masks):
+    """A result saved by save_result() for this image and thresholds, or None."""
+    file = _result_file(path, cache_dir, name, masks)
+    if not file.exists():
+        return None
+    with open(file) as f:
+        return json.load(f)
+
+
+def save_result(path, cache_dir, name, masks, result):
+    """Save a JSON-serializable result for this image and thresholds."""
+    file = _result_file(path, cache_dir, name, masks)
+    file.parent.mkdir(parents=True, exist_ok=True)
+    tmp = file.with_name(f"{file.stem}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(result, f, indent=2)
+    os.replace(tmp, file)
+
+
+def _result_file(path, cache_dir, name, masks):
+    root = Path(cache_dir) / source_hash(path)
+    return root / f"masks-{thresholds_key(masks)}" / f"{name}.json"
+
+
+def _save(file, array):
+    # Write-then-rename, so a concurrent reader never maps a partial file
+    file.parent.mkdir(parents=True, exist_ok=True)
+    tmp = file.with_name(f"{file.stem}.{os.getpid()}.tmp.npy")
+    np.save(tmp, np.ascontiguousarray(array))
+    os.replace(tmp, file)
+
+
+def _write_meta(directory, meta):
+    meta_path = directory / "meta.json"
+    if not meta_path.exists():
+        with open(meta_path, "w") as f:
+            json.dump(meta, f, indent=2)
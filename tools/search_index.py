@@ -0,0 +1,71 @@
+"""
+Search Index
+============
+Prebuilt unit ID lookup for a facility (build-facility-json.py) or a
+whole portfolio (--portfolio-index), so searching or deep-linking a unit
+is a binary search instead of a scan of every floor's unit list.
+
+  ids        every unit ID, sorted case-insensitively
+  floor      floor index (into the facility's "floors") per ID
+  offset     unit index (into that floor's "units") per ID
+  facility   facility index (into "facilities") per ID, portfolio only
+  prefixes   {prefix: [start, end)} over ids for every case-folded prefix
+             up to PREFIX_DEPTH characters, for type-ahead
+
+An exact or prefix query looks up its first PREFIX_DEPTH characters in
+`prefixes` and binary-searches the rest within that range. Duplicate IDs
+(the same number on two floors) are adjacent entries.
+"""
+
+from bisect import bisect_left, bisect_right
+
+
+PREFIX_DEPTH = 2
+
+
+def build(entries, columns):
+    """Index (uid, (column values...)) entries; `columns` names the values."""
+    rows = sorted(entries, key=lambda e: (e[0].casefold(), e[1]))
+    index = {"ids": [uid for uid, _ in rows]}
+    for k, name in enumerate(columns):
+        index[name] = [values[k] for _, values in rows]
+    index["prefixes"] = prefix_table([uid.casefold() for uid, _ in rows])
+    return index
+
+
+def prefix_table(keys, depth=PREFIX_DEPTH):
+    """{prefix: [start, end)} of sorted keys, for prefixes up to `depth` long."""
+    table = {}
+    for i, key in enumerate(keys):
+        for n in range(1, min(depth, len(key)) + 1):
+            span = table.setdefault(key[:n], [i, i])
+            span[1] = i + 1
+    return table
+
+
+def facility_index(floors):
+    """Index over every unit of a facility's floors."""
+    return build(((u["id"], (f, i)) for f, floor in enumerate(floors)
+                  for i, u in enumerate(floor["units"])), ("floor", "offset"))
+
+
+def portfolio_index(facilities):
+    """Index over several facilities; adds the facility IDs it refers to."""
+    index = build(((u["id"], (k, f, i)) for k, facility in enumerate(facilities)
+                   for f, floor in enumerate(facility["floors"])
+                   for i, u in enumerate(floor["units"])), ("facility", "floor", "offset"))
+    return {"facilities": [facility["id"] for facility in facilities], **index}
+
+
+def search(index, query):
+    """[start, end) range of the entries whose ID starts with `query`."""
+    query = query.casefold()
+    if not query:
+        return 0, len(index["ids"])
+    start, end = index["prefixes"].get(query[:PREFIX_DEPTH], (0, 0))
+    if len(query) <= PREFIX_DEPTH:
+        return start, end
+    ids = index["ids"]
+    # Every key after the last match compares greater than query + max char
+    return (bisect_left(ids, query, start, end, key=str.casefold),
+            bisect_right(ids, query + "\U0010ffff", start, end, key=str.casefold))
@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+"""
+Parameter Sweep
+===============
+Searches the detection thresholds of extract-floorplan.py (Canny, min area,
+aspect, dilation passes, merge cell size, rescue constants, HSV bounds) over
+a process pool and writes a ranked leaderboard.
+
+The decoded image planes (BGR, HSV, RGB, gray) are loaded once into
+multiprocessing.shared_memory; workers map them read-only instead of each
+decoding or receiving its own copy. Each worker loads its own copy of the
+extractor module and sets the parameter set's module constants before
+running the pipeline.
+
+Usage:
+  python tools/sweep-params.py richland-1.png --truth tools/validation/richland-floor1-v5.json
+  python tools/sweep-params.py richland-2.png --trials 200 --workers 8 --expected-count 190
+  python tools/sweep-params.py richland-2.png --grid --set CANNY_LOW=30,50,70 \
+    --set DILATION_PASSES=1:2,1:3 --ocr --expected-range 400-589
+
+Search: random sampling of --trials sets from SEARCH_SPACE (default), or
+--grid for every combination. --set NAME=v1,v2,... replaces a parameter's
+candidate values (tuples as 1:2 or 45:100:40); --vary limits which
+parameters change (the rest stay at their current values).
+
+Scoring (higher is better):
+  --truth floor.json   F1 of predicted vs true boxes (IoU >= 0.5, greedy
+                       one-to-one); with --ocr, averaged with the fraction of
+                       true units whose ID was read correctly. The truth JSON
+                       must be in source-image pixels.
+  otherwise            fraction of boxes with a valid unit size x fraction
+                       not duplicating another box x closeness to
+                       --expected-count (if given); with --ocr, x the
+                       fraction of units with a unique in-range ID.
+
+Geometry-only runs (the default) skip OCR entirely.
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import itertools
+import json
+import multiprocessing as mp
+import os
+import random
+import sys
+import time
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+import id_resolver
+
+
+# Candidate values per extractor constant, centred on the current ones
+SEARCH_SPACE = {
+    "CANNY_LOW": [30, 40, 50, 60, 70],
+    "CANNY_HIGH": [120, 150, 180, 220],
+    "DILATION_PASSES": [(1, 2), (1, 3), (2, 3), (1, 1)],
+    "MIN_UNIT_AREA": [1000, 1250, 1500, 2000, 2500],
+    "MAX_ASPECT": [6, 8, 10, 12],
+    "MERGE_CELL_SIZE": [150, 200, 250, 300],
+    "UNIT_5x5_MIN": [45, 50, 55],
+    "UNIT_5x5_MAX": [90, 95, 100],
+    "RESCUE_INSET": [3, 5, 8],
+    "RESCUE_MIN_AREA": [600, 800, 1000],
+    "GREEN_LOWER": [(45, 100, 40), (43, 90, 35), (47, 110, 45)],
+    "GREEN_UPPER": [(58, 255, 230), (60, 255, 240), (56, 255, 220)],
+}
+
+
+def _load_extractor():
+    """Import extract-floorplan.py (not importable by name: it has a hyphen)."""
+    path = Path(__file__).with_name("extract-floorplan.py")
+    spec = importlib.util.spec_from_file_location("extract_floorplan", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _parse_value(token):
+    if ":" in token:
+        return tuple(int(v) for v in token.split(":"))
+    try:
+        return int(token)
+    except ValueError:
+        return float(token)
+
+
+def _arity(value):
+    """Length of a tuple value, 0 for a scalar."""
+    return len(value) if isinstance(value, (tuple, list)) else 0
+
+
+def _format_value(value):
+    return ":".join(str(v) for v in value) if isinstance(value, (tuple, list)) else str(value)
+
+
+# ---------------------------------------------------------------------------
+# Shared image planes
+# ---------------------------------------------------------------------------
+def share_planes(planes):
+    """Copy each plane into a new shared memory block.
+
+    Returns (blocks, specs): the SharedMemory objects (close + unlink when
+    done) and picklable (name, shape, dtype) specs for attach_planes().
+    """
+    blocks, specs = [], {}
+    for key, arr in planes.items():
+        shm = shared_memory.SharedMemory(create=True, size=arr.nbytes)
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+        blocks.append(shm)
+        specs[key] = (shm.name, arr.shape, arr.dtype.str)
+    return blocks, specs
+
+
+def attach_planes(specs):
+    """Map shared planes as read-only arrays. Returns (blocks, planes)."""
+    blocks, planes = [], {}
+    for key, (name, shape, dtype) in specs.items():
+        shm = shared_memory.SharedMemory(name=name)
+        arr = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        arr.flags.writeable = False
+        blocks.append(shm)
+        planes[key] = arr
+    return blocks, planes
+
+
+# ---------------------------------------------------------------------------
+# Worker side
+# ---------------------------------------------------------------------------
+_worker = {}
+
+
+def _init_worker(specs, settings):
+    # One OpenCV thread per worker; the pool provides the parallelism
+    cv2.setNumThreads(1)
+    blocks, planes = attach_planes(specs)
+    extractor = _load_extractor()
+    _worker.update(
+        blocks=blocks,
+        planes=planes,
+        extractor=extractor,
+        settings=settings,
+        defaults={name: getattr(extractor, name) for name in SEARCH_SPACE},
+        ocr=None,
+    )
+
+
+def _apply(params):
+    extractor = _worker["extractor"]
+    for name, default in _worker["defaults"].items():
+        value = params.get(name, default)
+        if isinstance(default, np.ndarray):
+            value = np.array(value, dtype=default.dtype)
+        setattr(extractor, name, value)
+
+
+def evaluate(trial):
+    """Run the pipeline for one parameter set and score it."""
+    number, params = trial
+    extractor = _worker["extractor"]
+    settings = _worker["settings"]
+    planes = _worker["planes"]
+    _apply(params)
+
+    start = time.perf_counter()
+    try:
+        # The pipeline narrates every step; keep worker output to the leaderboard
+        with open(os.devnull, "w") as quiet, contextlib.redirect_stdout(quiet):
+            units, _ = extractor.detect_units(planes, settings["pyramid"])
+            if settings["ocr"]:
+                if _worker["ocr"] is None:
+                    _worker["ocr"] = extractor.ocr_backends.get_backend(settings["ocr_backend"])
+                units = extractor.read_unit_ids(planes, units, _worker["ocr"])
+                units = extractor.fix_ocr_errors(units, settings["expected_range"])
+    except Exception as e:
+        return {"trial": number, "params": params, "score": float("-inf"), "error": str(e)}
+    elapsed = time.perf_counter() - start
+
+    result = {"trial": number, "params": params, "units": len(units), "seconds": elapsed}
+    result.update(score(extractor, units, settings))
+    return result
+
+
+def score(extractor, units, settings):
+    """Score a unit table against ground truth or the heuristics."""
+    truth = settings["truth"]
+    if truth is not None:
+        matches, ious = match_boxes(units, truth)
+        tp = len(matches)
+        precision = tp / len(units) if len(units) else 0.0
+        recall = tp / len(truth["x"]) if len(truth["x"]) else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if tp else 0.0
+        metrics = {"precision": precision, "recall": recall, "f1": f1,
+                   "meanIoU": float(np.mean(ious)) if tp else 0.0}
+        result = f1
+        if settings["ocr"]:
+            correct = sum(1 for p, t in matches if units["id"][p] and units["id"][p] == truth["id"][t])
+            metrics["idAccuracy"] = correct / len(truth["x"])
+            result = (f1 + metrics["idAccuracy"]) / 2
+        return {"score": result, **metrics}
+
+    n = len(units)
+    if not n:
+        return {"score": 0.0}
+    valid = float(extractor._valid_size_mask(units["w"], units["h"]).mean())
+    groups = id_resolver.duplicate_groups(units["x"], units["y"], units["w"], units["h"])
+    duplicates = 1 - len(set(groups)) / n
+    metrics = {"validSize": valid, "duplicates": duplicates}
+    result = valid * (1 - duplicates)
+    if settings["expected_count"]:
+        expected = settings["expected_count"]
+        metrics["countMatch"] = max(0.0, 1 - abs(n - expected) / expected)
+        result *= metrics["countMatch"]
+    if settings["ocr"]:
+        bounds = extractor._parse_expected_range(settings["expected_range"])
+        ids = [uid for uid in units["id"].tolist()
+               if uid and (bounds is None or (uid.isdigit() and bounds[0] <= int(uid) <= bounds[1]))]
+        metrics["uniqueIds"] = len(set(ids)) / n
+        result *= metrics["uniqueIds"]
+    return {"score": result, **metrics}
+
+
+def match_boxes(units, truth, min_iou=0.5):
+    """Greedy one-to-one matching by IoU. Returns ([(pred, true)], ious)."""
+    px, py = units["x"][:, None].astype(np.int64), units["y"][:, None].astype(np.int64)
+    pw, ph = units["w"][:, None].astype(np.int64), units["h"][:, None].astype(np.int64)
+    tx, ty, tw, th = truth["x"][None], truth["y"][None], truth["w"][None], truth["h"][None]
+    iw = np.clip(np.minimum(px + pw, tx + tw) - np.maximum(px, tx), 0, None)
+    ih = np.clip(np.minimum(py + ph, ty + th) - np.maximum(py, ty), 0, None)
+    inter = iw * ih
+    iou = inter / (pw * ph + tw * th - inter)
+
+    pairs = np.argwhere(iou >= min_iou)
+    order = np.argsort(-iou[pairs[:, 0], pairs[:, 1]], kind="stable")
+    used_p, used_t = set(), set()
+    matches, ious = [], []
+    for p, t in pairs[order].tolist():
+        if p in used_p or t in used_t:
+            continue
+        used_p.add(p)
+        used_t.add(t)
+        matches.append((p, t))
+        ious.append(iou[p, t])
+    return matches, ious
+
+
+# ---------------------------------------------------------------------------
+# Driver
+# ---------------------------------------------------------------------------
+def build_trials(space, vary, grid, count, seed):
+    """Parameter sets to evaluate; trial 0 is always the current defaults."""
+    names = [name for name in space if vary is None or name in vary]
+    trials = [{}]
+    if grid:
+        for combo in itertools.product(*(space[name] for name in names)):
+            trials.append(dict(zip(names, combo)))
+    else:
+        rng = random.Random(seed)
+        seen = set()
+        attempts = 0
+        while len(trials) <= count and attempts < count * 20:
+            attempts += 1
+            params = {name: rng.choice(space[name]) for name in names}
+            key = tuple(_format_value(v) for v in params.values())
+            if key not in seen:
+                seen.add(key)
+                trials.append(params)
+    return list(enumerate(trials))
+
+
+def load_truth(path):
+    with open(path) as f:
+        records = json.load(f)["units"]
+    return {
+        "x": np.array([u["x"] for u in records], dtype=np.int64),
+        "y": np.array([u["y"] for u in records], dtype=np.int64),
+        "w": np.array([u["w"] for u in records], dtype=np.int64),
+        "h": np.array([u["h"] for u in records], dtype=np.int64),
+        "id": [u["id"] for u in records],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep extract-floorplan.py detection thresholds")
+    parser.add_argument("input", help="Site map PNG")
+    parser.add_argument("--truth", default=None,
+                        help="Ground-truth floor JSON in source pixels (default: heuristic scoring)")
+    parser.add_argument("--trials", type=int, default=64,
+                        help="Random parameter sets to evaluate (default: 64)")
+    parser.add_argument("--grid", action="store_true",
+                        help="Evaluate every combination instead of random sampling")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=V1,V2",
+                        help="Candidate values for a parameter (repeatable)")
+    parser.add_argument("--vary", default=None,
+                        help="Comma-separated parameters to vary (default: all)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: CPU count)")
+    parser.add_argument("--ocr", action="store_true",
+                        help="Also OCR IDs and score them (much slower)")
+    parser.add_argument("--ocr-backend", default="auto", help="OCR backend for --ocr")
+    parser.add_argument("--expected-range", default=None,
+                        help="Expected unit ID range, for --ocr correction and scoring")
+    parser.add_argument("--expected-count", type=int, default=None,
+                        help="Expected number of units (heuristic scoring)")
+    parser.add_argument("--pyramid", type=int, default=0, help="Pyramid levels (see extract-floorplan.py)")
+    parser.add_argument("--seed", type=int, default=0, help="Random search seed")
+    parser.add_argument("--top", type=int, default=15, help="Leaderboard rows to print")
+    parser.add_argument("--output", "-o", default=None,
+                        help="Leaderboard JSON path (default: <input>.sweep.json)")
+    args = parser.parse_args()
+
+    space = {name: list(values) for name, values in SEARCH_SPACE.items()}
+    for item in args.set:
+        name, _, values = item.partition("=")
+        if name not in space:
+            print(f"Error: Unknown parameter '{name}' (choose from: {', '.join(space)})")
+            sys.exit(1)
+        space[name] = [_parse_value(v) for v in values.split(",")]
+        # Tuple constants are unpacked by the extractor: keep their arity
+        arity = _arity(SEARCH_SPACE[name][0])
+        bad = [_format_value(v) for v in space[name] if _arity(v) != arity]
+        if bad:
+            shape = ":".join(["N"] * arity) if arity else "a number"
+            print(f"Error: {name} takes {shape}, got {', '.join(bad)}")
+            sys.exit(1)
+    vary = set(args.vary.split(",")) if args.vary else None
+    if vary and vary - set(space):
+        print(f"Error: Unknown parameters in --vary: {', '.join(sorted(vary - set(space)))}")
+        sys.exit(1)
+
+    img = cv2.imread(args.input)
+    if img is None:
+        print(f"Error: Could not read image: {args.input}")
+        sys.exit(1)
+    planes = {
+        "img": img,
+        "hsv": cv2.cvtColor(img, cv2.COLOR_BGR2HSV),
+        "rgb": cv2.cvtColor(img, cv2.COLOR_BGR2RGB),
+        "gray": cv2.cvtColor(img, cv2.COLOR_BGR2GRAY),
+    }
+
+    settings = {
+        "truth": load_truth(args.truth) if args.truth else None,
+        "ocr": args.ocr,
+        "ocr_backend": args.ocr_backend,
+        "expected_range": args.expected_range,
+        "expected_count": args.expected_count,
+        "pyramid": args.pyramid,
+    }
+    trials = build_trials(space, vary, args.grid, args.trials, args.seed)
+    workers = args.workers or mp.cpu_count()
+    shared_mb = sum(p.nbytes for p in planes.values()) / 1e6
+    print(f"Sweeping {len(trials)} parameter sets on {args.input} with {workers} workers "
+          f"({'geometry + OCR' if args.ocr else 'geometry only'}, {shared_mb:.0f} MB shared)")
+
+    blocks, specs = share_planes(planes)
+    del planes, img
+    start = time.perf_counter()
+    results = []
+    try:
+        with mp.Pool(workers, initializer=_init_worker, initargs=(specs, settings)) as pool:
+            for result in pool.imap_unordered(evaluate, trials):
+                results.append(result)
+                if len(results) % 10 == 0 or len(results) == len(trials):
+                    print(f"  {len(results)}/{len(trials)} evaluated...")
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+    elapsed = time.perf_counter() - start
+
+    results.sort(key=lambda r: r["score"], reverse=True)
+    for rank, result in enumerate(results, 1):
+        result["rank"] = rank
+        result["params"] = {k: _format_value(v) for k, v in result["params"].items()}
+        if "error" in result:
+            # Ranked last; -inf isn't valid JSON
+            result["score"] = None
+    baseline = next(r for r in results if r["trial"] == 0)
+
+    output_path = Path(args.output) if args.output else Path(args.input).with_suffix(".sweep.json")
+    with open(output_path, "w") as f:
+        json.dump({
+            "input": args.input,
+            "truth": args.truth,
+            "ocr": args.ocr,
+            "seconds": elapsed,
+            "baseline": baseline,
+            "leaderboard": results,
+        }, f, indent=2)
+
+    print(f"\nEvaluated {len(results)} sets in {elapsed:.1f}s "
+          f"({elapsed / len(results):.2f}s per set, wall clock)")
+    if "error" in baseline:
+        print(f"Baseline (current values): error: {baseline['error']}")
+    else:
+        print(f"Baseline (current values): score {baseline['score']:.4f}, rank {baseline['rank']}")
+    print(f"\n  {'Rank':>4s}  {'Score':>7s}  {'Units':>5s}  Parameters (changed from current)")
+    for result in results[:args.top]:
+        if "error" in result:
+            print(f"  {result['rank']:>4d}  {'error':>7s}  {'':>5s}  {result['error']}")
+            continue
+        changed = {k: v for k, v in result["params"].items()
+                   if v != _format_value(_default_value(k))}
+        desc = ", ".join(f"{k}={v}" for k, v in changed.items()) or "(current values)"
+        print(f"  {result['rank']:>4d}  {result['score']:>7.4f}  {result['units']:>5d}  {desc}")
+    print(f"\nLeaderboard saved to: {output_path}")
+
+
+_defaults = {}
+
+
+def _default_value(name):
+    if not _defaults:
+        extractor = _load_extractor()
+        _defaults.update({n: getattr(extractor, n) for n in SEARCH_SPACE})
+    value = _defaults[name]
+    return tuple(value.tolist()) if isinstance(value, np.ndarray) else value
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import importlib.util
+import json
+from pathlib import Path
+
+import jsonstream
+import search_index
+
+spec = importlib.util.spec_from_file_location(
+    "build_facility_json", Path(__file__).resolve().parent.parent / "build-facility-json.py")
+build_facility_json = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(build_facility_json)
+
+
+def test_dedup_keeps_the_most_confident_then_larger_box():
+    units = [
+        {"id": "101", "x": 0, "y": 0, "w": 160, "h": 160, "conf": 0.4},
+        {"id": "107", "x": 4, "y": 2, "w": 150, "h": 155, "conf": 0.9},  # same unit
+        {"id": "102", "x": 160, "y": 0, "w": 160, "h": 160},             # neighbor
+        {"id": "102", "x": 162, "y": 0, "w": 150, "h": 160},             # same, smaller
+    ]
+    kept = build_facility_json.deduplicate_units(units)
+    assert kept == [units[2], units[1]]
+
+
+def test_portfolio_index_streams_facility_files(tmp_path):
+    facility = {"id": "other", "name": "Other", "floors": [
+        {"id": "floor-1", "units": [{"id": "B2", "x": 0}, {"id": "a1", "x": 1}], "siteFeatures": []},
+        {"id": "floor-2", "units": [], "siteFeatures": []},
+        {"id": "floor-3", "units": [{"id": "A3", "x": 2}], "siteFeatures": []}]}
+    (tmp_path / "data").mkdir()
+    for name, fmt in (("facility-other.json", "pretty"), ("facility-other.ndjson", "ndjson")):
+        path = tmp_path / "data" / name
+        jsonstream.dump({**facility, "floors": [{**floor, "units": iter(floor["units"])}
+                                                for floor in facility["floors"]]}, path, fmt)
+        manifest = tmp_path / "data" / "facilities.json"
+        manifest.write_text(json.dumps([{"id": "other", "hasMap": True, "dataUrl": f"/data/{name}"},
+                                        {"id": "built", "hasMap": True, "dataUrl": "/data/x.json"}]))
+        built = {"id": "built", "floors": [{"units": [{"id": "a2"}]}]}
+
+        build_facility_json.write_portfolio_index(built, manifest, tmp_path / "index.json")
+        index = json.loads((tmp_path / "index.json").read_text())
+        assert index == search_index.portfolio_index([facility, built])
@@ -0,0 +1,44 @@
+import numpy as np
+
+from glyph_classifier import GLYPH_H, GLYPH_W, GlyphClassifier
+
+
+def glyphs(rng, shapes, n):
+    """n noisy renderings, cycling through the base shapes."""
+    base = shapes[np.arange(n) % len(shapes)]
+    return np.clip(base + rng.normal(0, 0.02, base.shape), 0, 1).astype(np.float32)
+
+
+def test_fitting_one_read_at_a_time_matches_fitting_all_at_once():
+    rng = np.random.default_rng(7)
+    shapes = (rng.random((4, GLYPH_H * GLYPH_W)) > 0.5).astype(np.float32)
+    vectors = glyphs(rng, shapes, 40)
+    # Shape 0 is mostly read as 5 but is a 9 by range correction
+    labels = np.array(["5", "1", "2", "3"] * 10)
+    labels[[4, 20]] = "9"
+    trusted = np.zeros(40, dtype=bool)
+    trusted[20] = True
+
+    batch = GlyphClassifier()
+    batch.fit(vectors, labels, trusted)
+    single = GlyphClassifier()
+    for i in range(40):
+        single.fit(vectors[i:i+1], labels[i:i+1], trusted[i:i+1])
+
+    assert single.labels.tolist() == batch.labels.tolist()
+    assert single.clusters.tolist() == batch.clusters.tolist()
+    assert set(batch.labels[::4]) == {"9"}
+    assert set(batch.labels[1::4]) == {"1"}
+
+
+def test_votes_count_reads_not_earlier_relabels():
+    rng = np.random.default_rng(3)
+    shape = (rng.random((1, GLYPH_H * GLYPH_W)) > 0.5).astype(np.float32)
+    classifier = GlyphClassifier()
+    # Two 8s read first, then three 6s: the cluster is a 6 once they're in,
+    # even though the earlier fits had relabeled everything to 8
+    classifier.fit(glyphs(rng, shape, 2), ["8", "8"])
+    for _ in range(3):
+        classifier.fit(glyphs(rng, shape, 1), ["6"])
+    assert classifier.labels.tolist() == ["6"] * 5
+    assert classifier.read_labels.tolist() == ["8", "8", "6", "6", "6"]
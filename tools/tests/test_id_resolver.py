@@ -0,0 +1,13 @@
+import id_resolver
+
+
+def test_lone_digit_read_gets_its_dropped_digits_back():
+    index = id_resolver.ConfusionIndex(400, 589)
+    assert {uid for uid, _, dropped in index.candidates("7") if dropped} >= {"407", "507"}
+
+    # A row of 10x10 units numbered 405-408, the third read as just "7"
+    reads = ["405", "406", "7", "408"]
+    boxes = ([0, 160, 320, 480], [0] * 4, [160] * 4, [160] * 4)
+    ids, stats = id_resolver.resolve_ids(reads, [0.9] * 4, boxes, index)
+    assert ids == ["405", "406", "407", "408"]
+    assert stats["corrected"] == 1
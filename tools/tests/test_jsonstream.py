@@ -0,0 +1,26 @@
+import json
+
+import pytest
+
+import jsonstream
+
+
+DOC = {"floor": {"id": "floor-1", "scale": 0.5},
+       "units": [{"id": "101", "x": 12.5, "y": -3e+10, "w": 1E-7, "h": 159},
+                 {"id": "102", "x": 0.25, "y": 12, "w": 1e3, "h": -0.0},
+                 [123456789.125, -42, 7E+2, True, None, False]]}
+
+
+@pytest.mark.parametrize("chunk", [1, 2, 3, 5, 8])
+def test_numbers_split_at_every_offset(tmp_path, monkeypatch, chunk):
+    monkeypatch.setattr(jsonstream, "CHUNK", chunk)
+    text = json.dumps(DOC, separators=(",", ":"))
+    for pad in range(2 * chunk + len(text) // 4):
+        # Leading whitespace shifts every chunk boundary along the document
+        path = tmp_path / "floor.json"
+        path.write_text(" " * pad + text)
+        # Split down to the scalars, so each number is decoded on its own
+        got = dict(jsonstream.items(path, [("floor", None), ("units", None, None)]))
+        assert got == {("floor", k): v for k, v in DOC["floor"].items()} | {
+            ("units", i, k): v for i, unit in enumerate(DOC["units"])
+            for k, v in (unit.items() if isinstance(unit, dict) else enumerate(unit))}
@@ -0,0 +1,40 @@
+import overrides
+
+
+def unit(uid, x, y, w=75, h=159):
+    return {"id": uid, "x": x, "y": y, "w": w, "h": h}
+
+
+def test_set_applies_then_is_in_place():
+    units = [unit("477", 690, 2550), unit("577", 3000, 400)]
+    entries = [{"id": "477", "at": [700, 2560], "set": {"id": "577"}}]
+
+    out, result = overrides.apply(units, entries)
+    assert out[0]["id"] == "577"
+    assert result["applied"] == 1
+
+    _, again = overrides.apply(out, entries)
+    assert (again["applied"], again["unchanged"], again["skipped"]) == (0, 1, [])
+
+
+def test_unrelated_unit_with_target_values_is_not_in_place():
+    # 471 is where the entry points; an unrelated 577 elsewhere must not
+    # make the entry look already applied
+    units = [unit("471", 690, 2550), unit("577", 3000, 400)]
+    entries = [{"id": "477", "at": [700, 2560], "set": {"id": "577"}}]
+
+    out, result = overrides.apply(units, entries)
+    assert out[0]["id"] == "471"
+    assert result["unchanged"] == 0
+    assert result["skipped"] == ["override 1 matches no unit"]
+
+
+def test_id_selector_box_change_is_in_place():
+    units = [unit("228", 1204, 800, w=160)]
+    entries = [{"id": "228", "set": {"x": 1204, "w": 160}}]
+
+    _, result = overrides.apply(units, entries)
+    assert (result["applied"], result["unchanged"]) == (0, 1)
+
+    _, result = overrides.apply([unit("229", 1204, 800, w=160)], entries)
+    assert result["skipped"] == ["override 1 matches no unit"]
@@ -0,0 +1,24 @@
+import importlib.util
+from pathlib import Path
+
+import numpy as np
+
+spec = importlib.util.spec_from_file_location(
+    "extract_floorplan", Path(__file__).resolve().parent.parent / "extract-floorplan.py")
+extract_floorplan = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(extract_floorplan)
+
+
+def test_partition_never_exceeds_max_parts():
+    # A 5-ft-wide strip with a certain wall every 5x5: ten parts, but it
+    # may only be cut into MAX_PARTS (e.g. with 5x10s spanning some walls)
+    part = 75
+    length = 10 * part
+    evidence = np.zeros(length, dtype=np.float32)
+    evidence[part::part] = 1
+
+    cost, parts = extract_floorplan._partition(length, part, evidence)
+
+    assert sum(parts) == length
+    assert len(parts) <= extract_floorplan.MAX_PARTS
+    assert all(extract_floorplan._is_valid_size(p, part) for p in parts)
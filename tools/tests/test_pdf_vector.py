@@ -0,0 +1,38 @@
+import pytest
+
+pymupdf = pytest.importorskip("pymupdf")
+
+import pdf_vector  # noqa: E402
+
+
+@pytest.fixture
+def plan_pdf(tmp_path):
+    """A page with rectangles drawn three ways, and orthogonal non-rectangles."""
+    doc = pymupdf.open()
+    page = doc.new_page(width=400, height=200)
+    shape = page.new_shape()
+    outlines = {
+        (255, 0, 0): [(10, 10), (60, 10), (60, 30), (30, 30), (30, 60), (10, 60)],       # L
+        (0, 255, 0): [(100, 10), (160, 10), (160, 60), (140, 60), (140, 30),
+                      (120, 30), (120, 60), (100, 60)],                                  # U
+        (0, 0, 255): [(200, 10), (230, 10), (250, 10), (250, 40), (200, 40)],            # rectangle, 5 corners
+    }
+    for color, points in outlines.items():
+        shape.draw_polyline(points)
+        shape.finish(fill=tuple(c / 255 for c in color), closePath=True)
+    shape.draw_rect(pymupdf.Rect(300, 100, 340, 120))
+    shape.finish(fill=(0, 0, 0))
+    shape.commit()
+    path = tmp_path / "plan.pdf"
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def test_filled_rects_skips_non_rectangular_outlines(plan_pdf):
+    page = pdf_vector.PdfPage(plan_pdf, dpi=144)
+    try:
+        rects = page.filled_rects()
+    finally:
+        page.close()
+    assert sorted(rects) == [(400, 20, 100, 60, (0, 0, 255)), (600, 200, 80, 40, (0, 0, 0))]
@@ -0,0 +1,66 @@
+import importlib.util
+import io
+import json
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+spec = importlib.util.spec_from_file_location(
+    "extract_floorplan", Path(__file__).resolve().parent.parent / "extract-floorplan.py")
+extract_floorplan = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(extract_floorplan)
+
+
+class FixedReads:
+    """OCR backend that reads every crop as the same ID."""
+
+    name = "fixed"
+
+    def read(self, image, psm=7, oem=None, whitelist=None):
+        return "405", 0.9
+
+    def close(self):
+        pass
+
+
+def site_map(path):
+    """A row of six 10x10 green units with dark walls, at site-map scale."""
+    img = np.full((800, 4800, 3), 255, dtype=np.uint8)
+    for k in range(6):
+        x = 200 + k * 164
+        cv2.rectangle(img, (x, 200), (x + 163, 363), (40, 40, 40), -1)
+        cv2.rectangle(img, (x + 2, 202), (x + 161, 361), (60, 200, 100), -1)
+    cv2.imwrite(str(path), img)
+
+
+def serve(session, requests, monkeypatch, capsys):
+    lines = [json.dumps({"jsonrpc": "2.0", "id": i, "method": "extract", "params": params})
+             for i, params in enumerate(requests)]
+    monkeypatch.setattr(sys, "stdin", io.StringIO("\n".join(lines) + "\n"))
+    extract_floorplan.serve(session, {})
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+def test_reocr_applies_to_its_own_request_only(tmp_path, monkeypatch, capsys):
+    site_map(tmp_path / "f1.png")
+    site_map(tmp_path / "f2.png")
+    session = extract_floorplan.ExtractionSession()
+    monkeypatch.setattr(session, "_ocr_backend", FixedReads)
+    f1 = {"input": str(tmp_path / "f1.png"), "output": str(tmp_path / "f1.json"),
+          "stages": "geometry,ocr"}
+
+    replies = serve(session, [
+        f1,
+        {"reocr": "0,0,800,800"},
+        {"expected_range": "400-589"},
+        {"input": str(tmp_path / "f2.png"), "output": str(tmp_path / "f2.json")},
+    ], monkeypatch, capsys)
+
+    assert all("result" in reply for reply in replies), replies
+    assert replies[0]["result"]["stats"]["totalUnits"] == 6
+    assert "reocr" in replies[1]["result"]["rerun"]
+    assert replies[2]["result"]["rerun"] == ["fix"]
+    assert "reocr" not in replies[3]["result"]["rerun"]
+    assert session.options["reocr"] is None
@@ -0,0 +1,231 @@
+"""
+Unit Table
+==========
+Compact columnar storage for units as they move through the extraction
+pipeline (extract-floorplan.py). A unit table is a NumPy structured array
+with one row per unit:
+
+  x, y, w, h      bounding box in source-image pixels
+  area            detected region area (w*h for synthesized boxes)
+  pass            edge-dilation pass that detected it (0 = not from a pass)
+  id              OCR'd unit ID ("" until OCR runs)
+  id_ocr          raw OCR reading when fix_ocr_errors() changed the ID
+  confidence      ID confidence in [0, 1] (0 until scored)
+  source_stage    STAGE_* code of the stage that produced the box
+  id_source       ID_* code of how the ID was read (ID_NONE until OCR runs)
+
+Rows are small fixed-size records, so stages can filter, split and rescale
+whole tables at once instead of looping over dicts.
+"""
+
+import numpy as np
+
+
+# ---------------------------------------------------------------------------
+# Source stages — which pipeline step produced a unit's box
+# ---------------------------------------------------------------------------
+STAGE_DETECT = 0       # two-pass edge/contour detection
+# 1 is reserved: the retired equal-part split, so saved tables keep their codes
+STAGE_WALL_SPLIT = 2   # split_by_internal_walls(): visible wall
+STAGE_RESCUE = 3       # rescue_small_units(): single missed 5x5
+STAGE_GRID = 4         # rescue_small_units(): 5x5 grid decomposition
+STAGE_VECTOR = 5       # read_vector_page(): filled rectangle in a vector PDF
+STAGE_PREVIOUS = 6     # carried over from a previous extraction (--previous)
+STAGE_PARTITION = 7    # split_oversized_units(): best partition into valid sizes
+STAGE_MANUAL = 8       # added or reshaped by an overrides file (overrides.py)
+
+STAGE_NAMES = {
+    STAGE_DETECT: "detect",
+    STAGE_WALL_SPLIT: "wall-split",
+    STAGE_RESCUE: "rescue",
+    STAGE_GRID: "grid",
+    STAGE_VECTOR: "vector",
+    STAGE_PREVIOUS: "previous",
+    STAGE_PARTITION: "partition",
+    STAGE_MANUAL: "manual",
+}
+
+# ---------------------------------------------------------------------------
+# ID sources — how a unit's ID was read
+# ---------------------------------------------------------------------------
+ID_NONE = 0      # no ID read (OCR hasn't run, or found no digits)
+ID_GRAY = 1      # Tesseract on the grayscale crop (primary strategy)
+ID_OTSU = 2      # Tesseract on the Otsu-thresholded crop (fallback strategy)
+ID_GLYPH = 3     # glyph classifier (--ocr-tier glyph)
+ID_VECTOR = 4    # text run of a vector PDF
+ID_PREVIOUS = 5  # carried over from a previous extraction (--previous)
+ID_MANUAL = 6    # set by an overrides file (overrides.py)
+
+# Provenance codes in the floor JSON ("src"): box stage letter, the
+# detection pass for detected boxes, ID source letter, and "*" when range
+# correction changed the read (the raw read is in "id_original_ocr").
+# "D2t" = detected in pass 2, ID read by Tesseract on the grayscale crop;
+# "Gg*" = from 5x5 grid decomposition, glyph-classified ID, corrected.
+STAGE_CODES = {
+    STAGE_DETECT: "D",
+    STAGE_WALL_SPLIT: "W",
+    STAGE_RESCUE: "R",
+    STAGE_GRID: "G",
+    STAGE_VECTOR: "V",
+    STAGE_PREVIOUS: "P",
+    STAGE_PARTITION: "A",
+    STAGE_MANUAL: "M",
+}
+
+ID_CODES = {
+    ID_NONE: "-",
+    ID_GRAY: "t",
+    ID_OTSU: "o",
+    ID_GLYPH: "g",
+    ID_VECTOR: "v",
+    ID_PREVIOUS: "p",
+    ID_MANUAL: "m",
+}
+
+ID_SOURCE_NAMES = {
+    ID_NONE: "none",
+    ID_GRAY: "tesseract",
+    ID_OTSU: "tesseract-otsu",
+    ID_GLYPH: "glyph",
+    ID_VECTOR: "vector",
+    ID_PREVIOUS: "previous",
+    ID_MANUAL: "manual",
+}
+
+# Units whose ID confidence is below this are counted (and worth a look)
+# as low confidence
+LOW_CONFIDENCE = 0.6
+
+UNIT_DTYPE = np.dtype([
+    ("x", np.int32), ("y", np.int32), ("w", np.int32), ("h", np.int32),
+    ("area", np.float64),
+    ("pass", np.int8),
+    ("id", "U12"),
+    ("id_ocr", "U12"),
+    ("confidence", np.float32),
+    ("source_stage", np.int8),
+    ("id_source", np.int8),
+])
+
+
+def empty(n=0):
+    """A zero-filled table of n units."""
+    return np.zeros(n, dtype=UNIT_DTYPE)
+
+
+def from_boxes(xs, ys, ws, hs, areas=None, pass_=0, stage=STAGE_DETECT):
+    """Build a table from bounding-box columns.
+
+    If areas is omitted, each unit's area is its box area.
+    """
+    table = empty(len(xs))
+    table["x"] = xs
+    table["y"] = ys
+    table["w"] = ws
+    table["h"] = hs
+    table["area"] = table["w"] * table["h"] if areas is None else areas
+    table["pass"] = pass_
+    table["source_stage"] = stage
+    return table
+
+
+def append(table, *others):
+    """Concatenate tables into a new one."""
+    return np.concatenate((table,) + others)
+
+
+def children(parents, xs, ys, ws, hs, stage):
+    """New units derived from parent rows, one child per parent row.
+
+    Children inherit every column (pass, id, ...) from their parent except
+    the box, area and source stage. Repeat a parent row to give it several
+    children.
+    """
+    table = parents.copy()
+    table["x"] = xs
+    table["y"] = ys
+    table["w"] = ws
+    table["h"] = hs
+    table["area"] = table["w"] * table["h"]
+    table["source_stage"] = stage
+    return table
+
+
+def split_rows(table, replacements):
+    """Replace rows by their parts, keeping table order.
+
+    replacements maps a row index to the table of units that replace it.
+    """
+    if not replacements:
+        return table
+
+    pieces = []
+    last = 0
+    for row in sorted(replacements):
+        pieces.append(table[last:row])
+        pieces.append(replacements[row])
+        last = row + 1
+    pieces.append(table[last:])
+    return np.concatenate(pieces)
+
+
+def rescale(table, scale):
+    """Scale every box by `scale` (rounded to whole pixels) in one step."""
+    scaled = table.copy()
+    for col in ("x", "y", "w", "h"):
+        scaled[col] = np.round(table[col] * scale)
+    scaled["area"] = table["area"] * scale * scale
+    return scaled
+
+
+def provenance(stage, pass_, id_source, corrected):
+    """Provenance code of one unit (see STAGE_CODES)."""
+    code = STAGE_CODES[stage]
+    if stage == STAGE_DETECT and pass_:
+        code += str(pass_)
+    return code + ID_CODES[id_source] + ("*" if corrected else "")
+
+
+def parse_provenance(code):
+    """(stage, pass, id_source, corrected) of a provenance code; the
+    inverse of provenance()."""
+    stages = {v: k for k, v in STAGE_CODES.items()}
+    sources = {v: k for k, v in ID_CODES.items()}
+    corrected = code.endswith("*")
+    if corrected:
+        code = code[:-1]
+    if len(code) < 2 or code[0] not in stages or code[-1] not in sources:
+        raise ValueError(f"Bad provenance code: {code!r}")
+    digits = code[1:-1]
+    return stages[code[0]], int(digits) if digits else 0, sources[code[-1]], corrected
+
+
+def to_records(table):
+    """Convert a table into the unit dicts written to the floor JSON."""
+    records = []
+    for uid, x, y, w, h, id_ocr, stage, pass_, source, conf in zip(
+            table["id"].tolist(), table["x"].tolist(), table["y"].tolist(),
+            table["w"].tolist(), table["h"].tolist(), table["id_ocr"].tolist(),
+            table["source_stage"].tolist(), table["pass"].tolist(),
+            table["id_source"].tolist(), table["confidence"].tolist()):
+        entry = {"id": uid, "x": x, "y": y, "w": w, "h": h,
+                 "src": provenance(stage, pass_, source, bool(id_ocr)),
+                 "conf": round(conf, 2)}
+        if id_ocr:
+            entry["id_original_ocr"] = id_ocr
+        records.append(entry)
+    return records
+
+
+def stage_counts(table):
+    """Units per box stage ("detect-1", "wall-split", ...) and per ID
+    source ("tesseract", "glyph", ...), for the floor JSON's stats."""
+    boxes, ids = {}, {}
+    for stage, pass_, source in zip(table["source_stage"].tolist(), table["pass"].tolist(),
+                                    table["id_source"].tolist()):
+        name = STAGE_NAMES[stage]
+        if stage == STAGE_DETECT and pass_:
+            name += f"-{pass_}"
+        boxes[name] = boxes.get(name, 0) + 1
+        ids[ID_SOURCE_NAMES[source]] = ids.get(ID_SOURCE_NAMES[source], 0) + 1
+    return {"boxSources": dict(sorted(boxes.items())), "idSources": dict(sorted(ids.items()))}
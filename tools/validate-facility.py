@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Facility Validation
+===================
+Validates every floor of one or more facility JSONs at once: each floor is
+checked for problem units, tallied by unit size (as validate-unit-mix.py
+does), rendered from its JSON and pixel-matched against its original site
+map (as validate-render.py does), with floors spread over a process pool.
+The results are one consolidated report with per-floor timings.
+
+Usage:
+  python tools/validate-facility.py public/data/facility-richland.json \
+    --original floor-1=richland-1.png --original floor-2=richland-2.png
+  python tools/validate-facility.py --manifest public/data/facilities.json --workers 8
+  python tools/validate-facility.py a.json b.json --report out/validation.json \
+    --render-dir out/render --min-match 95
+
+Floors are read one at a time from each facility file (jsonstream.py) and
+handed to the pool as they're read. A floor is scored on:
+
+  unknown sizes   units whose box maps to no standard size
+  duplicate IDs   IDs used more than once, counting the builder's
+                  "477-1" renames of a duplicate
+  missing IDs     units without an ID (or with the builder's U<x>_<y>)
+  overlaps        boxes covering at least half of another box
+  pixel match     % of pixels where the render matches the original
+                  (only for floors given an --original; an issue below
+                  --min-match)
+
+--original takes FLOOR=PNG, or FACILITY/FLOOR=PNG when validating several
+facilities. --render-dir writes each floor's render, side-by-side
+comparison and diff overlay as <facility>-<floor>.*.png. The exit status is
+1 if any floor has an issue.
+"""
+
+import argparse
+import importlib.util
+import json
+import multiprocessing as mp
+import os
+import re
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import cv2
+
+import id_resolver
+import jsonstream
+
+
+# The builder's fallback ID for a unit without one, and its suffix for the
+# later copies of a duplicate ID
+UNNAMED_ID = re.compile(r"U\d+_\d+")
+RENAMED_ID = re.compile(r"(.+)-\d+")
+
+
+def _load_script(name):
+    """Import a tools/ script (not importable by name: it has a hyphen)."""
+    path = Path(__file__).with_name(f"{name}.py")
+    spec = importlib.util.spec_from_file_location(name.replace("-", "_"), path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# ---------------------------------------------------------------------------
+# Worker side
+# ---------------------------------------------------------------------------
+_worker = {}
+
+
+def _init_worker(settings):
+    # One OpenCV thread per worker; the pool provides the parallelism
+    cv2.setNumThreads(1)
+    _worker.update(render=_load_script("validate-render"),
+                   unit_mix=_load_script("validate-unit-mix"),
+                   settings=settings)
+
+
+def check_units(units, unit_mix):
+    """Size tally and problem units of one floor's unit list."""
+    tally = unit_mix.FloorTally()
+    for u in units:
+        tally.add(u)
+    ids = Counter(u["id"] for u in units if u.get("id"))
+    duplicates = {uid for uid, n in ids.items() if n > 1}
+    for uid in ids:
+        match = RENAMED_ID.fullmatch(uid)
+        if match and match.group(1) in ids:
+            duplicates.add(match.group(1))
+    groups = id_resolver.duplicate_groups(*([u[k] for u in units] for k in "xywh"))
+    return {
+        "sizes": dict(sorted(tally.detected.items())),
+        "unknownSize": tally.detected.get("unknown", 0),
+        "duplicateIds": sorted(duplicates),
+        "missingIds": sum(1 for u in units if not u.get("id") or UNNAMED_ID.fullmatch(u["id"])),
+        "overlaps": len(units) - len(set(groups)),
+    }
+
+
+def validate_floor(task):
+    """Check, render and score one floor; returns its report entry."""
+    facility_id, order, floor, original_path = task
+    render, settings = _worker["render"], _worker["settings"]
+    seconds = {}
+    t0 = time.perf_counter()
+
+    result = {"facility": facility_id, "floor": floor["id"], "name": floor.get("name", ""),
+              "order": order, "units": len(floor["units"])}
+    result.update(check_units(floor["units"], _worker["unit_mix"]))
+    seconds["check"] = time.perf_counter() - t0
+
+    t = time.perf_counter()
+    rendered = render.render_floor(floor, floor["width"], floor["height"])
+    seconds["render"] = time.perf_counter() - t
+
+    result["pixelMatch"] = None
+    original = None
+    if original_path:
+        t = time.perf_counter()
+        original = render.load_original(original_path, settings["plane_cache"])
+        if original is None:
+            result["error"] = f"could not read original {original_path}"
+        else:
+            if rendered.shape != original.shape:
+                # Floors written with --target-width are smaller than their map
+                rendered = cv2.resize(rendered, (original.shape[1], original.shape[0]),
+                                      interpolation=cv2.INTER_NEAREST)
+            diff = render.diff_mask(original, rendered)
+            result["pixelMatch"] = round(render.pixel_match(diff), 2)
+        seconds["compare"] = time.perf_counter() - t
+
+    if settings["render_dir"]:
+        t = time.perf_counter()
+        out = Path(settings["render_dir"]) / f"{facility_id}-{floor['id']}"
+        cv2.imwrite(f"{out}.rendered.png", rendered)
+        if result["pixelMatch"] is not None:
+            scale = 1200 / (original.shape[1] * 2 + 10)
+            cv2.imwrite(f"{out}.comparison.png",
+                        render.create_comparison(original, rendered, scale=scale))
+            cv2.imwrite(f"{out}.diff.png", render.diff_overlay(original, diff))
+        seconds["write"] = time.perf_counter() - t
+
+    result["issues"] = floor_issues(result, settings["min_match"])
+    seconds["total"] = time.perf_counter() - t0
+    result["seconds"] = {k: round(v, 3) for k, v in seconds.items()}
+    result["worker"] = os.getpid()
+    return result
+
+
+def floor_issues(result, min_match):
+    issues = []
+    if result.get("error"):
+        issues.append(result["error"])
+    if result["unknownSize"]:
+        issues.append(f"{result['unknownSize']} units of unknown size")
+    if result["duplicateIds"]:
+        shown = ", ".join(result["duplicateIds"][:10])
+        more = len(result["duplicateIds"]) - 10
+        issues.append(f"duplicate IDs: {shown}" + (f" and {more} more" if more > 0 else ""))
+    if result["missingIds"]:
+        issues.append(f"{result['missingIds']} units without an ID")
+    if result["overlaps"]:
+        issues.append(f"{result['overlaps']} overlapping boxes")
+    if min_match is not None and result["pixelMatch"] is not None and result["pixelMatch"] < min_match:
+        issues.append(f"pixel match {result['pixelMatch']:.1f}% below {min_match:g}%")
+    return issues
+
+
+# ---------------------------------------------------------------------------
+# Main side
+# ---------------------------------------------------------------------------
+def manifest_facilities(manifest_path):
+    """Facility JSON paths of the mapped facilities in a facilities.json.
+
+    dataUrl paths ("/data/facility-x.json") are resolved against the public
+    directory the manifest is served from, as build-facility-json.py does.
+    """
+    manifest_path = Path(manifest_path)
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    public = manifest_path.parent.parent
+    return [public / entry["dataUrl"].lstrip("/") for entry in manifest
+            if entry.get("hasMap") and entry.get("dataUrl")]
+
+
+class FloorReader:
+    """Pool tasks, one per floor of every facility, read a floor at a time.
+
+    Records each facility's ID, name and path in `facilities` as it goes.
+    """
+
+    def __init__(self, paths, originals):
+        self.paths = paths
+        self.originals = originals
+        self.facilities = []
+
+    def __iter__(self):
+        for path in self.paths:
+            facility = {"id": Path(path).stem, "name": "", "path": str(path)}
+            self.facilities.append(facility)
+            for where, value in jsonstream.items(path, [("floors", None)]):
+                if where in (("id",), ("name",)):
+                    facility[where[0]] = value
+                elif where[0] == "floors":
+                    original = (self.originals.get(f"{facility['id']}/{value['id']}") or
+                                self.originals.get(value["id"]))
+                    yield facility["id"], where[1], value, original
+
+
+def parse_originals(pairs):
+    """{"floor-1" or "richland/floor-1": path} from --original values."""
+    originals = {}
+    for pair in pairs:
+        key, sep, path = pair.partition("=")
+        if not sep or not key or not path:
+            raise ValueError(f"--original takes FLOOR=PNG or FACILITY/FLOOR=PNG, not '{pair}'")
+        if not Path(path).exists():
+            raise ValueError(f"Original image not found: {path}")
+        originals[key] = path
+    return originals
+
+
+def print_report(report):
+    print(f"\n  {'Facility':<16s} {'Floor':<10s} {'Units':>6s} {'Unknown':>7s} {'DupIDs':>6s} "
+          f"{'NoID':>5s} {'Overlap':>7s} {'Match':>7s} {'Time':>7s}")
+    for facility in report["facilities"]:
+        for floor in facility["floors"]:
+            match = f"{floor['pixelMatch']:.1f}%" if floor["pixelMatch"] is not None else "-"
+            print(f"  {facility['id'][:16]:<16s} {floor['floor'][:10]:<10s} {floor['units']:>6d} "
+                  f"{floor['unknownSize']:>7d} {len(floor['duplicateIds']):>6d} "
+                  f"{floor['missingIds']:>5d} {floor['overlaps']:>7d} {match:>7s} "
+                  f"{floor['seconds']['total']:>6.2f}s")
+
+    issues = [(facility["id"], floor["floor"], issue) for facility in report["facilities"]
+              for floor in facility["floors"] for issue in floor["issues"]]
+    if issues:
+        print("\n  Issues:")
+        for facility_id, floor_id, issue in issues:
+            print(f"    - {facility_id}/{floor_id}: {issue}")
+
+    summary = report["summary"]
+    print(f"\n  {summary['facilities']} facilities, {summary['floors']} floors, "
+          f"{summary['units']} units, {summary['issues']} issues")
+    print(f"  {summary['seconds']:.2f}s on {report['workers']} workers "
+          f"({summary['floorSeconds']:.2f}s of floor work, {summary['speedup']:.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Validate and render every floor of one or more facilities in parallel")
+    parser.add_argument("facilities", nargs="*", help="Facility JSON files")
+    parser.add_argument("--manifest", default=None,
+                        help="Validate every mapped facility of a facilities.json instead")
+    parser.add_argument("--original", action="append", default=[], metavar="[FACILITY/]FLOOR=PNG",
+                        help="Original site map of a floor, for the pixel match (repeatable)")
+    parser.add_argument("--plane-cache", default=None, metavar="DIR",
+                        help="Memory-map originals from the decoded-plane cache shared with "
+                             "extract-floorplan.py --plane-cache")
+    parser.add_argument("--render-dir", default=None, metavar="DIR",
+                        help="Write each floor's render, comparison and diff images here")
+    parser.add_argument("--min-match", type=float, default=None, metavar="PCT",
+                        help="Report floors whose pixel match is below PCT as an issue")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: one per CPU)")
+    parser.add_argument("--report", default=None, metavar="PATH",
+                        help="Also write the consolidated report as JSON")
+    args = parser.parse_args()
+
+    paths = list(args.facilities)
+    if args.manifest:
+        if not Path(args.manifest).exists():
+            print(f"Error: manifest not found: {args.manifest}")
+            sys.exit(1)
+        paths += manifest_facilities(args.manifest)
+    if not paths:
+        parser.error("give facility JSON files and/or --manifest")
+    missing = [str(p) for p in paths if not Path(p).exists()]
+    if missing:
+        print(f"Error: facility JSON not found: {', '.join(missing)}")
+        sys.exit(1)
+    try:
+        originals = parse_originals(args.original)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if args.render_dir:
+        Path(args.render_dir).mkdir(parents=True, exist_ok=True)
+
+    settings = {"plane_cache": args.plane_cache, "render_dir": args.render_dir,
+                "min_match": args.min_match}
+    workers = args.workers or mp.cpu_count()
+    print(f"Validating {len(paths)} facilities with {workers} workers...")
+
+    t0 = time.perf_counter()
+    results = []
+    reader = FloorReader(paths, originals)
+    with mp.Pool(workers, initializer=_init_worker, initargs=(settings,)) as pool:
+        for result in pool.imap_unordered(validate_floor, reader):
+            results.append(result)
+            print(f"  {result['facility']}/{result['floor']}: {result['units']} units, "
+                  f"{len(result['issues'])} issues ({result['seconds']['total']:.2f}s)")
+    elapsed = time.perf_counter() - t0
+
+    facilities = []
+    for facility in reader.facilities:
+        floors = sorted((r for r in results if r["facility"] == facility["id"]),
+                        key=lambda r: r["order"])
+        for floor in floors:
+            del floor["order"]
+        facilities.append({**facility, "floors": floors})
+    floor_seconds = sum(r["seconds"]["total"] for r in results)
+    report = {
+        "workers": workers,
+        "facilities": facilities,
+        "summary": {
+            "facilities": len(facilities),
+            "floors": len(results),
+            "units": sum(r["units"] for r in results),
+            "issues": sum(len(r["issues"]) for r in results),
+            "seconds": round(elapsed, 3),
+            "floorSeconds": round(floor_seconds, 3),
+            "speedup": round(floor_seconds / elapsed, 2) if elapsed else 0,
+        },
+    }
+    print_report(report)
+
+    if args.report:
+        report_path = Path(args.report)
+        report_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport saved to: {report_path}")
+
+    return 1 if report["summary"]["issues"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
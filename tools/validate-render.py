@@ -8,8 +8,10 @@ that the extraction is 1:1 accurate.
 
 Usage:
   python validate-render.py <floor.json> --original <original.png> --output <rendered.png>
+  python validate-render.py <floor.json> --original <original.png> --plane-cache .plane-cache
 
-Also generates a side-by-side comparison image.
+Also generates a side-by-side comparison image. validate-facility.py runs
+the same render and pixel match for every floor of a facility at once.
 """
 
 import argparse
@@ -20,6 +22,8 @@ from pathlib import Path
 import cv2
 import numpy as np
 
+import plane_cache
+
 
 # Match the original map's visual style
 UNIT_GREEN = (87, 217, 126)   # BGR - the dominant green from the maps
@@ -74,6 +78,17 @@ def render_floor(data, img_width, img_height):
         elif ftype == "highlight":
             cv2.rectangle(img, (x, y), (x + w, y + h), HIGHLIGHT_YELLOW, -1)
             cv2.rectangle(img, (x, y), (x + w, y + h), UNIT_BORDER, 2)
+        elif ftype == "stairs":
+            cv2.rectangle(img, (x, y), (x + w, y + h), HIGHLIGHT_YELLOW, -1)
+            cv2.rectangle(img, (x, y), (x + w, y + h), UNIT_BORDER, 2)
+            # Three steps, up to the right
+            step = min(w, h) // 5
+            cx, cy = x + (w - 3 * step) // 2, y + (h + 3 * step) // 2
+            points = [(cx, cy)]
+            for _ in range(3):
+                points += [(points[-1][0], points[-1][1] - step),
+                           (points[-1][0] + step, points[-1][1] - step)]
+            cv2.polylines(img, [np.array(points)], False, TEXT_COLOR, 2, cv2.LINE_AA)
         elif ftype == "office":
             cv2.rectangle(img, (x, y), (x + w, y + h), BG_COLOR, -1)
             cv2.rectangle(img, (x, y), (x + w, y + h), UNIT_BORDER, 2)
@@ -89,7 +104,11 @@ def render_floor(data, img_width, img_height):
 
 
 def create_comparison(original, rendered, scale=None):
-    """Create a side-by-side comparison image."""
+    """Create a side-by-side comparison image.
+
+    `original` may be a read-only (memory-mapped) array: both images are
+    copied once, straight into the side-by-side canvas, and labeled there.
+    """
     h1, w1 = original.shape[:2]
     h2, w2 = rendered.shape[:2]
 
@@ -97,18 +116,20 @@ def create_comparison(original, rendered, scale=None):
     if h1 != h2 or w1 != w2:
         rendered = cv2.resize(rendered, (w1, h1), interpolation=cv2.INTER_AREA)
 
+    # Side by side with a divider
+    comparison = np.empty((h1, w1 * 2 + 10, 3), dtype=np.uint8)
+    labeled_orig = comparison[:, :w1]
+    labeled_rend = comparison[:, w1 + 10:]
+    labeled_orig[...] = original
+    comparison[:, w1:w1 + 10] = (0, 0, 200)
+    labeled_rend[...] = rendered
+
     # Add labels
-    labeled_orig = original.copy()
-    labeled_rend = rendered.copy()
     cv2.putText(labeled_orig, "ORIGINAL", (20, 60),
                 cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 255), 4, cv2.LINE_AA)
     cv2.putText(labeled_rend, "RENDERED FROM JSON", (20, 60),
                 cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 255), 4, cv2.LINE_AA)
 
-    # Side by side with a divider
-    divider = np.full((h1, 10, 3), (0, 0, 200), dtype=np.uint8)
-    comparison = np.hstack([labeled_orig, divider, labeled_rend])
-
     # Scale down if needed
     if scale:
         comparison = cv2.resize(comparison, None, fx=scale, fy=scale,
@@ -117,6 +138,40 @@ def create_comparison(original, rendered, scale=None):
     return comparison
 
 
+def load_original(path, cache_dir=None):
+    """The original site map (BGR), memory-mapped from the plane cache if
+    given; None if it can't be read."""
+    if cache_dir:
+        try:
+            return plane_cache.load_planes(path, cache_dir, keys=("img",))["img"]
+        except ValueError:
+            return None
+    return cv2.imread(str(path))
+
+
+def diff_mask(original, rendered):
+    """Mask (255) of the pixels where two same-size images differ visibly."""
+    diff = cv2.absdiff(original, rendered)
+    diff_gray = cv2.cvtColor(diff, cv2.COLOR_BGR2GRAY)
+    _, diff_thresh = cv2.threshold(diff_gray, 30, 255, cv2.THRESH_BINARY)
+    return diff_thresh
+
+
+def pixel_match(diff_thresh):
+    """Percentage of pixels a diff_mask() leaves unmarked."""
+    total_pixels = diff_thresh.shape[0] * diff_thresh.shape[1]
+    matching_pixels = total_pixels - cv2.countNonZero(diff_thresh)
+    return 100.0 * matching_pixels / total_pixels
+
+
+def diff_overlay(original, diff_thresh, width=1200):
+    """The original with differing pixels in red, scaled to `width`."""
+    overlay = original.copy()
+    overlay[diff_thresh > 0] = [0, 0, 255]  # Red where different
+    scale = width / original.shape[1]
+    return cv2.resize(overlay, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Render extracted floor plan JSON into an image for validation")
@@ -125,6 +180,9 @@ def main():
                         help="Path to the original site map PNG for comparison")
     parser.add_argument("--output", "-o", default=None,
                         help="Output rendered image path (default: <input>.rendered.png)")
+    parser.add_argument("--plane-cache", default=None, metavar="DIR",
+                        help="Memory-map the original from the decoded-plane cache shared "
+                             "with extract-floorplan.py --plane-cache instead of decoding it")
     args = parser.parse_args()
 
     input_path = Path(args.input)
@@ -158,7 +216,7 @@ def main():
     print(f"Rendered image saved to: {output_path}")
 
     # Load original for comparison
-    original = cv2.imread(str(original_path))
+    original = load_original(original_path, args.plane_cache)
     if original is None:
         print(f"Warning: Could not load original image for comparison")
         return
@@ -172,24 +230,15 @@ def main():
 
     # Also create a difference image (highlights misalignments)
     if original.shape == rendered.shape:
-        diff = cv2.absdiff(original, rendered)
-        # Amplify differences for visibility
-        diff_gray = cv2.cvtColor(diff, cv2.COLOR_BGR2GRAY)
-        _, diff_thresh = cv2.threshold(diff_gray, 30, 255, cv2.THRESH_BINARY)
-        # Color the differences red on the original
-        diff_overlay = original.copy()
-        diff_overlay[diff_thresh > 0] = [0, 0, 255]  # Red where different
-        diff_overlay_small = cv2.resize(diff_overlay, None, fx=1200/img_w, fy=1200/img_w,
-                                         interpolation=cv2.INTER_AREA)
+        # Amplify differences for visibility, colored red on the original
+        diff_thresh = diff_mask(original, rendered)
         diff_path = input_path.with_suffix(".diff.png")
-        cv2.imwrite(str(diff_path), diff_overlay_small)
+        cv2.imwrite(str(diff_path), diff_overlay(original, diff_thresh))
         print(f"Difference overlay saved to: {diff_path}")
         print(f"  (Red areas = misalignment between original and rendered)")
 
         # Calculate match percentage
-        total_pixels = diff_thresh.shape[0] * diff_thresh.shape[1]
-        matching_pixels = total_pixels - cv2.countNonZero(diff_thresh)
-        match_pct = 100.0 * matching_pixels / total_pixels
+        match_pct = pixel_match(diff_thresh)
         print(f"\n  Pixel match: {match_pct:.1f}%")
     else:
         print(f"Warning: Image dimensions don't match, skipping diff analysis")
@@ -10,11 +10,17 @@ Usage:
   python tools/validate-unit-mix.py                          # report only
   python tools/validate-unit-mix.py --floor1 output/f1.json  # single floor
   python tools/validate-unit-mix.py --expected-total 669     # with target
+
+Files are read a unit at a time (jsonstream.py), in any format
+build-facility-json.py --format writes. Floors other than Richland's two are
+listed without expected counts; validate-facility.py checks every floor of
+any number of facilities in parallel.
 """
 
-import json
 from collections import Counter
 
+import jsonstream
+
 # ---------------------------------------------------------------------------
 # Ground truth: currently unavailable (old unit mix was inaccurate).
 # When an accurate unit ID → size mapping is available, update this dict
@@ -33,6 +39,12 @@ EXPECTED_FLOOR2 = {}
 EXPECTED_FLOOR1_TOTAL = 0
 EXPECTED_FLOOR2_TOTAL = 0
 
+# Floor ID -> (expected counts per size, expected total, report label)
+FLOORS = {
+    'floor-1': (EXPECTED_FLOOR1, EXPECTED_FLOOR1_TOTAL, 'Ground Floor (richland-1.png)'),
+    'floor-2': (EXPECTED_FLOOR2, EXPECTED_FLOOR2_TOTAL, '2nd Floor (richland-2.png)'),
+}
+
 
 def px_to_feet(px):
     """Map a pixel dimension to the nearest standard foot measurement."""
@@ -76,18 +88,49 @@ def classify_unit_size(w_px, h_px):
         return f'{dims[0]}x{int(dims[1])}'
 
 
-def validate_floor(floor_data, expected, floor_label):
-    """Compare detected units against expected counts."""
-    units = floor_data['units']
+class FloorTally:
+    """Unit counts per size for one floor, built a unit at a time."""
+
+    SAMPLES = 15  # units kept per size, for the unexpected-sizes listing
+
+    def __init__(self):
+        self.total = 0
+        self.detected = Counter()
+        self.samples = {}
+
+    def add(self, unit):
+        size = classify_unit_size(unit['w'], unit['h'])
+        self.detected[size] += 1
+        examples = self.samples.setdefault(size, [])
+        if len(examples) < self.SAMPLES:
+            examples.append((self.total, unit['id'], unit['w'], unit['h'], size))
+        self.total += 1
+
+
+def read_floors(path, facility):
+    """[(floor id, FloorTally)] of a facility or single-floor file, streamed."""
+    split = [('floors', None, 'units', None)] if facility else [('units', None)]
+    ids, tallies = {}, {}
+    for where, value in jsonstream.items(path, split):
+        if facility:
+            if where[2:3] == ('units',):
+                tallies.setdefault(where[1], FloorTally()).add(value)
+            elif where[2:] == ('id',):
+                ids[where[1]] = value
+        elif where[0] == 'units':
+            tallies.setdefault(0, FloorTally()).add(value)
+        elif where == ('floor',):
+            # Individual floor file has {floor: {...}, units: [...], ...}
+            ids[0] = value['id']
+    return [(ids.get(k), tallies.get(k, FloorTally())) for k in sorted(ids.keys() | tallies.keys())]
 
-    # Classify each unit by real size
-    detected = Counter()
-    odd_sizes = []
-    for u in units:
-        size = classify_unit_size(u['w'], u['h'])
-        detected[size] += 1
-        if size not in expected and size != 'unknown':
-            odd_sizes.append((u['id'], u['w'], u['h'], size))
+
+def validate_floor(tally, expected, floor_label):
+    """Compare detected units against expected counts."""
+    detected = tally.detected
+    unexpected = sorted(size for size in detected if size not in expected and size != 'unknown')
+    odd_count = sum(detected[size] for size in unexpected)
+    odd_sizes = sorted(u for size in unexpected for u in tally.samples[size])[:15]
 
     # All known sizes
     all_sizes = sorted(set(list(expected.keys()) + list(detected.keys())),
@@ -97,7 +140,7 @@ def validate_floor(floor_data, expected, floor_label):
 
     print(f'\n{"="*60}')
     print(f' {floor_label}')
-    print(f' Detected: {len(units)} units | Expected: {sum(expected.values())} units')
+    print(f' Detected: {tally.total} units | Expected: {sum(expected.values())} units')
     print(f'{"="*60}')
     print(f'  {"Size":>10s}  {"Detected":>8s}  {"Expected":>8s}  {"Delta":>8s}  Status')
     print(f'  {"-"*10}  {"-"*8}  {"-"*8}  {"-"*8}  {"-"*8}')
@@ -132,11 +175,11 @@ def validate_floor(floor_data, expected, floor_label):
     print(f'  {"TOTAL":>10s}  {total_detected:>8d}  {total_expected:>8d}  {total_detected - total_expected:>+8d}')
 
     if odd_sizes:
-        print(f'\n  Unexpected sizes detected ({len(odd_sizes)} units):')
-        for uid, w, h, size in odd_sizes[:15]:
+        print(f'\n  Unexpected sizes detected ({odd_count} units):')
+        for _, uid, w, h, size in odd_sizes:
             print(f'    Unit {uid}: {w}x{h}px → {size}')
-        if len(odd_sizes) > 15:
-            print(f'    ... and {len(odd_sizes) - 15} more')
+        if odd_count > 15:
+            print(f'    ... and {odd_count - 15} more')
 
     if issues:
         print(f'\n  Issues:')
@@ -164,39 +207,21 @@ def main():
 
     if args.floor1 or args.floor2:
         # Read individual floor files
-        if args.floor1:
-            with open(args.floor1) as f:
-                data = json.load(f)
-            # Individual floor file has {floor: {...}, units: [...], ...}
-            floor_data = {'id': data['floor']['id'], 'units': data['units']}
-            floors.append(floor_data)
-        if args.floor2:
-            with open(args.floor2) as f:
-                data = json.load(f)
-            floor_data = {'id': data['floor']['id'], 'units': data['units']}
-            floors.append(floor_data)
+        for path in (args.floor1, args.floor2):
+            if path:
+                floors.extend(read_floors(path, facility=False))
     else:
         # Read combined facility file
-        with open(args.facility) as f:
-            facility = json.load(f)
-        floors = facility['floors']
-
-    for floor in floors:
-        if floor['id'] == 'floor-1':
-            _, issues = validate_floor(floor, EXPECTED_FLOOR1, 'Ground Floor (richland-1.png)')
-            all_issues.extend(issues)
-        elif floor['id'] == 'floor-2':
-            _, issues = validate_floor(floor, EXPECTED_FLOOR2, '2nd Floor (richland-2.png)')
-            all_issues.extend(issues)
+        floors = read_floors(args.facility, facility=True)
+
+    for floor_id, tally in floors:
+        expected, _, label = FLOORS.get(floor_id, ({}, 0, floor_id))
+        _, issues = validate_floor(tally, expected, label)
+        all_issues.extend(issues)
 
     # Summary
-    total_units = sum(len(f['units']) for f in floors)
-    total_expected = 0
-    for floor in floors:
-        if floor['id'] == 'floor-1':
-            total_expected += EXPECTED_FLOOR1_TOTAL
-        elif floor['id'] == 'floor-2':
-            total_expected += EXPECTED_FLOOR2_TOTAL
+    total_units = sum(tally.total for _, tally in floors)
+    total_expected = sum(FLOORS[floor_id][1] for floor_id, _ in floors if floor_id in FLOORS)
 
     print(f'\n{"="*60}')
     print(f' SUMMARY')
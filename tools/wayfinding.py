@@ -0,0 +1,207 @@
+"""
+Wayfinding
+==========
+Walking distances and routes from a floor's site features (elevator,
+stairs, office) to every unit, for build-facility-json.py --floorN-image.
+
+  1. Aisle raster: the site map is cut into CELL-pixel cells; a cell is
+     walkable when at least WALKABLE_MIN_WHITE of it is white (so a wall
+     line through it blocks it) and it's outside every unit box.
+  2. One BFS per feature over the 4-connected raster, seeded from the
+     walkable cells within RING cells of the feature's box.
+  3. Each unit's door is its nearest walkable cell within RING cells of
+     its box; its distance is that cell's BFS distance. The route walks
+     back down the distance field, preferring to keep its direction so
+     routes come out as few straight legs, and keeps only the corners.
+
+Distances and route points are in floor coordinates (the floor JSON's
+x/y space). Routes are stored as encoded polylines (the Google Maps
+format, integer precision): compact strings that clients decode with any
+polyline library or a dozen lines of code.
+"""
+
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+CELL = 10                  # source pixels per raster cell
+WALKABLE_MIN_WHITE = 0.75  # white share of a walkable cell
+WHITE_LEVEL = 240          # gray at or above this is aisle/background
+RING = 2                   # cells around a box searched for its door
+
+# Features people walk from, in the order they're listed
+SOURCE_TYPES = ("elevator", "stairs", "office")
+
+UNREACHABLE = -1
+
+
+def aisle_raster(gray, boxes):
+    """Walkable cells (bool grid) of a grayscale site map.
+
+    `boxes` are (x, y, w, h) in source pixels; their cells aren't walkable.
+    """
+    img_h, img_w = gray.shape[:2]
+    rows, cols = -(-img_h // CELL), -(-img_w // CELL)
+    white = np.zeros((rows * CELL, cols * CELL), np.float32)
+    white[:img_h, :img_w] = gray >= WHITE_LEVEL
+    share = white.reshape(rows, CELL, cols, CELL).mean(axis=(1, 3))
+    walkable = share >= WALKABLE_MIN_WHITE
+    for x, y, w, h in boxes:
+        walkable[y // CELL:-(-(y + h) // CELL), x // CELL:-(-(x + w) // CELL)] = False
+    return walkable
+
+
+def _ring(walkable, box):
+    """Walkable cells (flat indexes) within RING cells of a source-pixel box."""
+    x, y, w, h = box
+    rows, cols = walkable.shape
+    r0, r1 = max(0, y // CELL - RING), min(rows, -(-(y + h) // CELL) + RING)
+    c0, c1 = max(0, x // CELL - RING), min(cols, -(-(x + w) // CELL) + RING)
+    rr, cc = np.nonzero(walkable[r0:r1, c0:c1])
+    return (rr + r0) * cols + (cc + c0)
+
+
+def distance_field(walkable, seeds):
+    """BFS step counts from `seeds` (flat indexes); UNREACHABLE elsewhere."""
+    rows, cols = walkable.shape
+    open_cells = walkable.ravel()
+    dist = np.full(rows * cols, UNREACHABLE, np.int32)
+    queue = deque()
+    for i in seeds.tolist():
+        dist[i] = 0
+        queue.append(i)
+    while queue:
+        i = queue.popleft()
+        d = dist[i] + 1
+        r, c = divmod(i, cols)
+        for j, ok in ((i - cols, r > 0), (i + cols, r < rows - 1),
+                      (i - 1, c > 0), (i + 1, c < cols - 1)):
+            if ok and open_cells[j] and dist[j] == UNREACHABLE:
+                dist[j] = d
+                queue.append(j)
+    return dist.reshape(rows, cols)
+
+
+def _route(dist, start):
+    """Corner cells (row, col) of a descent from `start` to distance 0."""
+    rows, cols = dist.shape
+    r, c = start
+    corners = [(r, c)]
+    heading = None
+    while dist[r, c] > 0:
+        want = dist[r, c] - 1
+        steps = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+        if heading in steps:
+            steps.remove(heading)
+            steps.insert(0, heading)
+        for dr, dc in steps:
+            nr, nc = r + dr, c + dc
+            if 0 <= nr < rows and 0 <= nc < cols and dist[nr, nc] == want:
+                break
+        if heading is not None and (dr, dc) != heading:
+            corners.append((r, c))
+        heading = (dr, dc)
+        r, c = nr, nc
+    if corners[-1] != (r, c):
+        corners.append((r, c))
+    return corners
+
+
+def encode_polyline(points):
+    """Encoded polyline string of integer (x, y) points."""
+    out = []
+    px = py = 0
+    for x, y in points:
+        # The format stores latitude (y) first
+        for delta in (y - py, x - px):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                out.append(chr((0x20 | (value & 0x1F)) + 63))
+                value >>= 5
+            out.append(chr(value + 63))
+        px, py = x, y
+    return "".join(out)
+
+
+def decode_polyline(text):
+    """(x, y) points of an encode_polyline() string."""
+    points, values = [], []
+    value = shift = 0
+    for ch in text:
+        b = ord(ch) - 63
+        value |= (b & 0x1F) << shift
+        shift += 5
+        if b < 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value = shift = 0
+    x = y = 0
+    for dy, dx in zip(values[::2], values[1::2]):
+        x, y = x + dx, y + dy
+        points.append((x, y))
+    return points
+
+
+def floor_wayfinding(gray, units, features, scale=1.0):
+    """The "wayfinding" block of a facility floor.
+
+    `units` and `features` are floor-JSON dicts in floor coordinates,
+    `scale` is source pixels per floor unit (sourceImageWidth / width).
+    Returns None when the floor has no source features.
+
+      sources   [{"type", "feature": index into siteFeatures}]
+      distance  per source: walking distance to each unit (floor units),
+                -1 when unreachable
+      nearest   per source: reachable unit indexes, nearest first
+      routes    per source: encoded polyline per unit, feature to door
+                ("" when unreachable)
+    """
+    def to_source(item):
+        return tuple(int(round(item[k] * scale)) for k in ("x", "y", "w", "h"))
+
+    sources = [(i, f) for t in SOURCE_TYPES for i, f in enumerate(features) if f["type"] == t]
+    if not sources:
+        return None
+
+    unit_boxes = [to_source(u) for u in units]
+    walkable = aisle_raster(gray, unit_boxes + [to_source(f) for _, f in sources])
+    doors = [_ring(walkable, box) for box in unit_boxes]
+    step = CELL / scale
+
+    def to_floor(cell):
+        r, c = cell
+        return int(round((c + 0.5) * step)), int(round((r + 0.5) * step))
+
+    block = {"sources": [], "distance": [], "nearest": [], "routes": []}
+    for index, feature in sources:
+        dist = distance_field(walkable, _ring(walkable, to_source(feature)))
+        flat = dist.ravel()
+        distance, routes = [], []
+        for door in doors:
+            reach = door[flat[door] != UNREACHABLE] if len(door) else door
+            if not len(reach):
+                distance.append(UNREACHABLE)
+                routes.append("")
+                continue
+            cell = int(reach[np.argmin(flat[reach])])
+            distance.append(int(round(flat[cell] * step)))
+            # Stored feature -> unit, the direction people walk
+            corners = _route(dist, divmod(cell, dist.shape[1]))[::-1]
+            routes.append(encode_polyline([to_floor(p) for p in corners]))
+
+        order = sorted((i for i, d in enumerate(distance) if d != UNREACHABLE),
+                       key=lambda i: (distance[i], i))
+        block["sources"].append({"type": feature["type"], "feature": index})
+        block["distance"].append(distance)
+        block["nearest"].append(order)
+        block["routes"].append(routes)
+    return block
+
+
+def load_gray(image_path):
+    """Grayscale site map, or ValueError if it can't be read."""
+    gray = cv2.imread(str(image_path), cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        raise ValueError(f"Could not read image: {image_path}")
+    return gray